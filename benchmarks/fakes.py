@@ -0,0 +1,267 @@
+"""Network-free stand-ins for yt-dlp, ffmpeg and Discord used by the benchmarks."""
+import asyncio
+import contextlib
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import discord
+from yt_dlp.extractor.common import InfoExtractor
+
+from src.core import music_player
+from src.core.extraction import install_extraction_backend
+
+OPUS_SILENCE = b'\xf8\xff\xfe'
+"""A valid 20 ms Opus frame of silence, returned by the fake audio source."""
+
+PACKET_INTERVAL = 0.02
+"""Seconds between packets read by the fake voice client, like discord.py's audio player."""
+
+PLAYLIST_REGEX = re.compile(r'list=BENCH(\d+)')
+"""Fake playlist URLs encode their size, e.g. `...playlist?list=BENCH5000`."""
+
+
+def video_url(index: int) -> str:
+    """Returns a YouTube-shaped watch URL with a unique 11-character video ID."""
+    return f'https://www.youtube.com/watch?v={index:011d}'
+
+
+def playlist_url(size: int) -> str:
+    """Returns a fake playlist URL holding `size` entries."""
+    return f'https://www.youtube.com/playlist?list=BENCH{size}'
+
+
+class FakePlaylistIE(InfoExtractor):
+    """Real yt-dlp extractor serving `benchplaylist:<size>` playlists locally.
+
+    Lets checks drive actual YoutubeDL instances (and so `ExtractorPool`) offline, where
+    `FakeExtractor` replaces the whole backend.
+    """
+    IE_NAME = 'benchplaylist'
+    _VALID_URL = r'benchplaylist:(?P<id>\d+)'
+
+    def _real_extract(self, url):
+        """Returns a playlist of `size` flat YouTube entries."""
+        size = int(self._match_id(url))
+        entries = [self.url_result(video_url(i), 'Youtube', f'{i:011d}', f'Track {i}') for i in range(size)]
+        return self.playlist_result(entries, f'bench{size}', f'Bench playlist {size}')
+
+
+class FakeExtractor:
+    """Extraction backend answering every profile from generated data after a fixed delay.
+
+    `latency` simulates the yt-dlp round trip and `payload_kb` pads playback info the way
+    real format lists do, so trimming and caching costs show up in the numbers.
+    """
+    def __init__(self, latency: float = 0.05, payload_kb: int = 64):
+        """Initializes the fake with its delay and playback info size."""
+        self.latency = latency
+        self.payload_kb = payload_kb
+        self.calls: Dict[str, int] = {}
+
+    def _formats(self, video_id: str) -> List[Dict[str, Any]]:
+        """Builds a format list of roughly `payload_kb` kilobytes ending with the Opus audio format."""
+        filler = 'x' * 512
+        formats = [
+            {'format_id': str(100 + i), 'acodec': 'none', 'vcodec': 'avc1', 'url': f'https://media.invalid/{video_id}/{i}', 'fragments': filler}
+            for i in range(max(self.payload_kb * 2, 1))
+        ]
+        formats.append({
+            'format_id': '251', 'acodec': 'opus', 'vcodec': 'none', 'abr': 128.0, 'asr': 48000,
+            'audio_channels': 2, 'url': f'https://media.invalid/{video_id}/audio?expire={int(time.time()) + 21600}'
+        })
+        return formats
+
+    def _info(self, url: str, profile: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Generates the info dict yt-dlp would return for a URL and profile."""
+        if url.startswith('ytsearch'):
+            count, _, query = url[len('ytsearch'):].partition(':')
+            return {'entries': [
+                {'title': f'{query} {i}', 'url': video_url(hash((query, i)) % 10 ** 11), 'duration': 180, 'channel': 'bench'}
+                for i in range(int(count or 1))
+            ]}
+
+        match = PLAYLIST_REGEX.search(url)
+        if match:
+            size = int(match.group(1))
+            start = params.get('playliststart') or 1
+            end = min(params.get('playlistend') or size, size)
+            return {'playlist_count': size, 'entries': [
+                {'url': video_url(i), 'title': f'Track {i}', 'duration': 180}
+                for i in range(start, end + 1)
+            ]}
+
+        video_id = url.rsplit('=', 1)[-1]
+        info = {'id': video_id, 'title': f'Track {video_id}', 'webpage_url': url, 'duration': 180}
+        if profile == 'playback':
+            info['formats'] = self._formats(video_id)
+        return info
+
+    async def extract_info(self, url: str, profile: str, **params) -> Dict[str, Any]:
+        """Waits `latency` seconds, then returns generated info."""
+        self.calls[profile] = self.calls.get(profile, 0) + 1
+        await asyncio.sleep(self.latency)
+        return self._info(url, profile, params)
+
+    def shutdown(self):
+        """Nothing to release."""
+
+
+class FakeOpusSource(discord.AudioSource):
+    """Replaces TrackedOpusAudio: serves `packets` Opus frames without spawning ffmpeg."""
+    packets = 10
+
+    def __init__(self, source, *, on_first_packet=None, admission=None, **kwargs):
+        """Accepts the same arguments the player passes to TrackedOpusAudio."""
+        self.source = source
+        self._remaining = self.packets
+        self._on_first_packet = on_first_packet
+        self._admission = admission
+
+    def read(self) -> bytes:
+        """Returns the next silent frame, or b'' once the track is over (freeing its scheduler slot)."""
+        if self._remaining <= 0:
+            if self._admission is not None:
+                self._admission.release()
+            return b''
+        self._remaining -= 1
+        if self._on_first_packet is not None:
+            callback, self._on_first_packet = self._on_first_packet, None
+            callback()
+        return OPUS_SILENCE
+
+    def is_opus(self) -> bool:
+        """Frames are already Opus encoded."""
+        return True
+
+
+async def fake_probe(source, *, method=None, executable=None):
+    """Replaces FFmpegOpusAudio.probe; Opus streams need no ffprobe round trip here."""
+    return 'opus', 128
+
+
+@contextlib.contextmanager
+def offline(extractor: FakeExtractor, packets: int = 10):
+    """Installs the fake extractor, audio source and probe for the duration of the block."""
+    saved_source, saved_probe = music_player.TrackedOpusAudio, discord.FFmpegOpusAudio.probe
+    saved_packets = FakeOpusSource.packets
+    install_extraction_backend(extractor)
+    music_player.TrackedOpusAudio = FakeOpusSource
+    discord.FFmpegOpusAudio.probe = staticmethod(fake_probe)
+    FakeOpusSource.packets = packets
+    try:
+        yield extractor
+    finally:
+        install_extraction_backend(None)
+        music_player.TrackedOpusAudio = saved_source
+        discord.FFmpegOpusAudio.probe = saved_probe
+        FakeOpusSource.packets = saved_packets
+
+
+class FakeVoiceClient:
+    """Voice client that reads packets on a thread at the real 20 ms cadence and records the first one."""
+    def __init__(self, loop: asyncio.AbstractEventLoop, autoplay: bool = True):
+        """With `autoplay=False` tracks never advance, which keeps the queue intact for enqueue benchmarks."""
+        self.loop = loop
+        self.autoplay = autoplay
+        self.source = None
+        self.first_packet: Optional[asyncio.Future] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._connected = True
+
+    def is_connected(self) -> bool:
+        """Always connected until `disconnect`."""
+        return self._connected
+
+    def is_playing(self) -> bool:
+        """True while the reader thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def is_paused(self) -> bool:
+        """The fake never pauses."""
+        return False
+
+    def expect_first_packet(self) -> asyncio.Future:
+        """Returns a future resolved with `perf_counter()` when the next track's first packet is read."""
+        self.first_packet = self.loop.create_future()
+        return self.first_packet
+
+    def _resolve_first_packet(self, at: float):
+        """Completes the pending first-packet future from the loop thread."""
+        if self.first_packet is not None and not self.first_packet.done():
+            self.first_packet.set_result(at)
+
+    def play(self, source, *, after=None):
+        """Starts reading `source` on a background thread, calling `after(None)` when it ends."""
+        self.source = source
+        self._stop = threading.Event()
+        stop = self._stop
+
+        def run():
+            data = source.read()
+            self.loop.call_soon_threadsafe(self._resolve_first_packet, time.perf_counter())
+            while self.autoplay and data and not stop.wait(PACKET_INTERVAL):
+                data = source.read()
+            if self.autoplay and after is not None:
+                after(None)
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the current track, which fires its `after` callback."""
+        self._stop.set()
+
+    async def disconnect(self):
+        """Stops playback and marks the client disconnected."""
+        self.stop()
+        self._connected = False
+
+
+class FakeMessage:
+    """Message returned by FakeContext.send."""
+    async def delete(self):
+        """Nothing to delete."""
+
+
+class FakeGuild:
+    """Guild with just an ID."""
+    def __init__(self, guild_id: int):
+        """Stores the guild ID."""
+        self.id = guild_id
+
+
+class FakeContext:
+    """Command context that records sent messages and cancels interactive views immediately."""
+    def __init__(self, bot, guild_id: int, voice_client: FakeVoiceClient):
+        """Binds the context to a guild and fake voice client."""
+        self.bot = bot
+        self.guild = FakeGuild(guild_id)
+        self.voice_client = voice_client
+        self.author = object()
+        self.sent: List[Dict[str, Any]] = []
+
+    async def send(self, content=None, *, embed=None, view=None, **kwargs):
+        """Records the message; a view (e.g. search buttons) is stopped as if the user cancelled."""
+        self.sent.append({'content': content, 'embed': embed})
+        if view is not None:
+            view.stop()
+        return FakeMessage()
+
+    def typing(self):
+        """No-op replacement for the typing indicator."""
+        return contextlib.nullcontext()
+
+
+class FakeBot:
+    """The bot attributes MusicPlayer and the command helpers read."""
+    def __init__(self):
+        """Initializes the player registry and default audio settings."""
+        self.players: Dict[int, music_player.MusicPlayer] = {}
+        self.voice_clients: List[FakeVoiceClient] = []
+        self.audio_bitrate = 128
+        self.audio_sampling_rate = 48000
+        self.audio_channels = 2
+        self.queue_limit = 10000  # Room for the largest benchmark playlists.
@@ -0,0 +1,335 @@
+"""Offline benchmarks for the queue and playback pipeline.
+
+Runs without network access or a Discord connection: yt-dlp, ffmpeg and the voice
+client are replaced by the fakes in `benchmarks.fakes`. Results are printed (or
+written with `--output`) as JSON so runs from different releases can be diffed.
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --quick --latency 0.02 --payload-kb 16
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from src.commands.music import MusicCommands
+from src.commands.utils import get_player, handle_url, handle_search
+from src.core.constants import YTDLP_OPTIONS_PLAYLIST_INFO
+from src.core.extraction import ExtractorPool
+from src.core.metrics import AUDIO_STREAMS
+from src.core.playlist_manager import PlaylistManager
+from src.core.search_cache import search_cache
+from src.core.stream_cache import stream_cache
+from src.core.track import Track
+from src.core.transcode_scheduler import transcode_scheduler
+
+from .fakes import FakeBot, FakeContext, FakeExtractor, FakePlaylistIE, FakeVoiceClient, offline, playlist_url, video_url
+
+logger = logging.getLogger(__name__)
+
+LAG_PROBE_INTERVAL = 0.01
+"""Seconds the event-loop lag probe sleeps between samples."""
+
+
+def summarize(samples: List[float], scale: float = 1000.0) -> Dict[str, float]:
+    """Returns count, mean, p50, p95 and max of a list of seconds, in milliseconds by default."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean': round(statistics.fmean(ordered) * scale, 3),
+        'p50': round(ordered[len(ordered) // 2] * scale, 3),
+        'p95': round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * scale, 3),
+        'max': round(ordered[-1] * scale, 3),
+    }
+
+
+def reset_caches():
+    """Clears the process-wide caches so each benchmark starts cold."""
+    stream_cache.clear()
+    search_cache.clear()
+
+
+def new_guild(bot: FakeBot, guild_id: int, autoplay: bool = True) -> FakeContext:
+    """Creates a context with its own fake voice client for a guild."""
+    voice_client = FakeVoiceClient(asyncio.get_running_loop(), autoplay=autoplay)
+    bot.voice_clients.append(voice_client)
+    return FakeContext(bot, guild_id, voice_client)
+
+
+async def bench_enqueue(sizes: List[int]) -> Dict[str, Any]:
+    """Measures queueing a playlist URL (first page) and draining all its pages, plus saved-playlist enqueue."""
+    results = {}
+    for size in sizes:
+        reset_caches()
+        bot = FakeBot()
+        ctx = new_guild(bot, size, autoplay=False)
+        player = get_player(ctx, bot)
+
+        started = time.perf_counter()
+        await handle_url(ctx, playlist_url(size), player)
+        first_page = time.perf_counter() - started
+        await player.queue.ensure_loaded(size)
+        total = time.perf_counter() - started
+
+        saved = [Track(video_url(i), f'Track {i}', 180) for i in range(size)]
+        other = new_guild(bot, size + 1, autoplay=False)
+        other_player = get_player(other, bot)
+        started = time.perf_counter()
+        await other_player.enqueue_many(other, saved)
+        saved_elapsed = time.perf_counter() - started
+
+        results[str(size)] = {
+            'handle_url_ms': round(first_page * 1000, 3),
+            'drain_all_pages_ms': round(total * 1000, 3),
+            'entries_per_s': round(size / total, 1),
+            'loaded': player.queue.loaded,
+            'enqueue_saved_ms': round(saved_elapsed * 1000, 3),
+            'saved_entries_per_s': round(size / saved_elapsed, 1),
+        }
+    return results
+
+
+async def bench_time_to_first_audio(runs: int) -> Dict[str, Any]:
+    """Measures `handle_url` to first packet for a single video, cold and with a warm stream cache."""
+    reset_caches()
+    cold, warm = [], []
+    for i in range(runs):
+        for samples in (cold, warm):
+            bot = FakeBot()
+            ctx = new_guild(bot, i)
+            first_packet = ctx.voice_client.expect_first_packet()
+            started = time.perf_counter()
+            await handle_url(ctx, video_url(i), get_player(ctx, bot))
+            samples.append(await first_packet - started)
+            ctx.voice_client.stop()
+    return {'cold_ms': summarize(cold), 'warm_stream_cache_ms': summarize(warm)}
+
+
+async def bench_search(queries: int) -> Dict[str, Any]:
+    """Measures `handle_search` until the results are shown, for new and repeated queries."""
+    reset_caches()
+    bot = FakeBot()
+    ctx = new_guild(bot, 1, autoplay=False)
+    player = get_player(ctx, bot)
+    cold, warm = [], []
+    for samples in (cold, warm):
+        for i in range(queries):
+            started = time.perf_counter()
+            await handle_search(ctx, f'benchmark query {i}', player)
+            samples.append(time.perf_counter() - started)
+    return {'cold_ms': summarize(cold), 'cached_ms': summarize(warm)}
+
+
+async def bench_queue_commands(sizes: List[int], repeats: int) -> Dict[str, Any]:
+    """Measures the queue, shuffle, remove and next commands on fully loaded queues."""
+    results = {}
+    for size in sizes:
+        bot = FakeBot()
+        cog = MusicCommands(bot)
+        ctx = new_guild(bot, size, autoplay=False)
+        player = get_player(ctx, bot)
+        player.queue.extend(Track(video_url(i), f'Track {i}', 180) for i in range(size))
+
+        timings = {name: [] for name in ('queue', 'shuffle', 'remove', 'next')}
+        for _ in range(repeats):
+            for name, call in (
+                ('queue', lambda: cog.queue.callback(cog, ctx)),
+                ('shuffle', lambda: cog.shuffle.callback(cog, ctx)),
+                ('remove', lambda: cog.remove.callback(cog, ctx, size // 2)),
+                ('next', lambda: cog.next.callback(cog, ctx, size // 2)),
+            ):
+                started = time.perf_counter()
+                await call()
+                timings[name].append(time.perf_counter() - started)
+            player.queue.append(Track(video_url(size), 'Refill', 180))
+        results[str(size)] = {name: summarize(samples) for name, samples in timings.items()}
+    return results
+
+
+async def bench_loop_lag(guild_counts: List[int], tracks: int) -> Dict[str, Any]:
+    """Plays `tracks` short tracks in N guilds at once and samples event-loop scheduling lag."""
+    results = {}
+    for guilds in guild_counts:
+        reset_caches()
+        bot = FakeBot()
+        contexts = [new_guild(bot, g) for g in range(guilds)]
+        lags: List[float] = []
+        done = asyncio.Event()
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(LAG_PROBE_INTERVAL)
+                lags.append(time.perf_counter() - started - LAG_PROBE_INTERVAL)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        for g, ctx in enumerate(contexts):
+            player = get_player(ctx, bot)
+            player.queue.extend(
+                Track(video_url(g * tracks + t), f'Track {t}', 1)
+                for t in range(tracks)
+            )
+        await asyncio.gather(*(get_player(ctx, bot).start_playback(ctx) for ctx in contexts))
+        while any(player.is_playing or player.queue for player in bot.players.values()):
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+        results[str(guilds)] = {
+            'tracks_per_guild': tracks,
+            'wall_s': round(elapsed, 3),
+            'lag_ms': summarize(lags),
+        }
+    return results
+
+
+def bench_playlist_store(corpus_sizes: List[int], per_playlist: int = 100) -> Dict[str, Any]:
+    """Grows a playlist database and measures add/flush/read cost at each corpus size."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        manager = PlaylistManager(db_path=db_path, legacy_path=None, write_delay=3600)
+        added = 0
+        try:
+            for target in corpus_sizes:
+                adds = []
+                while added < target:
+                    name = f'list{added // per_playlist}'
+                    if added % per_playlist == 0:
+                        manager.create_playlist(1, name)
+                    started = time.perf_counter()
+                    manager.add_to_playlist(1, name, Track(video_url(added), f'Track {added}', 180))
+                    adds.append(time.perf_counter() - started)
+                    added += 1
+                flush_started = time.perf_counter()
+                manager.flush()
+                flush = time.perf_counter() - flush_started
+
+                started = time.perf_counter()
+                manager.get_playlist(1, 'list0')
+                read = time.perf_counter() - started
+                started = time.perf_counter()
+                manager.list_playlists(limit=50)
+                page = time.perf_counter() - started
+
+                results[str(target)] = {
+                    'add_us': summarize(adds, scale=1e6),
+                    'flush_ms': round(flush * 1000, 3),
+                    'get_playlist_ms': round(read * 1000, 3),
+                    'list_page_ms': round(page * 1000, 3),
+                    'db_bytes': sum(
+                        os.path.getsize(path) for path in (db_path, db_path + '-wal') if os.path.exists(path)
+                    ),
+                }
+        finally:
+            manager.close()
+    return results
+
+
+def check_extractor_pool() -> Dict[str, Any]:
+    """Runs paged and unpaged playlist extractions through one pooled YoutubeDL.
+
+    Guards against per-call options (e.g. `playliststart`) leaking into later calls on the
+    same extractor; raises RuntimeError if they do.
+    """
+    options = dict(YTDLP_OPTIONS_PLAYLIST_INFO, allowed_extractors=[FakePlaylistIE.IE_NAME])
+    pool = ExtractorPool(profiles={'playlist_info': options}, size=1)
+    with pool.checkout('playlist_info') as ydl:
+        ydl.add_info_extractor(FakePlaylistIE())
+        baseline = dict(ydl.params)
+    try:
+        paged = pool.extract_info('benchplaylist:120', 'playlist_info', playliststart=51, playlistend=100)
+        whole = pool.extract_info('benchplaylist:30', 'playlist_info')
+        with pool.checkout('playlist_info') as ydl:
+            missing = object()
+            leaked = sorted(
+                key for key in set(ydl.params) | set(baseline)
+                if ydl.params.get(key, missing) != baseline.get(key, missing)
+            )
+    finally:
+        pool.close()
+    result = {
+        'paged_entries': len((paged or {}).get('entries') or []),
+        'unpaged_entries': len((whole or {}).get('entries') or []),
+        'leaked_params': leaked,
+    }
+    if result != {'paged_entries': 50, 'unpaged_entries': 30, 'leaked_params': []}:
+        raise RuntimeError(f"ExtractorPool dejó opciones de una llamada en el extractor: {result}")
+    return result
+
+
+def git_revision() -> str:
+    """Returns the current commit hash, or 'unknown' outside a git checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+
+async def run(args) -> Dict[str, Any]:
+    """Runs every benchmark under the offline fakes and returns the report."""
+    extractor = FakeExtractor(latency=args.latency, payload_kb=args.payload_kb)
+    sizes = [200, 1000] if args.quick else [1000, 5000]
+    checks = {'extractor_pool': check_extractor_pool()}
+    report: Dict[str, Any] = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'latency_s': args.latency,
+            'payload_kb': args.payload_kb,
+            'quick': args.quick,
+        },
+    }
+    with offline(extractor, packets=args.packets):
+        report['enqueue'] = await bench_enqueue(sizes)
+        report['time_to_first_audio'] = await bench_time_to_first_audio(5 if args.quick else 20)
+        report['handle_search'] = await bench_search(5 if args.quick else 20)
+        report['queue_commands'] = await bench_queue_commands(sizes, 3 if args.quick else 10)
+        report['event_loop_lag'] = await bench_loop_lag([1, 10] if args.quick else args.guilds, 2 if args.quick else 3)
+    report['playlist_store'] = bench_playlist_store([1000, 5000] if args.quick else [1000, 10000, 50000])
+    report['checks'] = checks
+    report['extractor_calls'] = dict(extractor.calls)
+    report['audio_streams'] = {mode: AUDIO_STREAMS.get(mode=mode) for mode in ('copy', 'transcode', 'probe', 'local')}
+    report['transcoding'] = transcode_scheduler.get_stats()
+    return report
+
+
+def main(argv=None):
+    """Parses arguments, runs the suite and prints or writes the JSON report."""
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the queue and playback pipeline")
+    parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+    parser.add_argument('--quick', action='store_true', help="Smaller sizes for a fast smoke run")
+    parser.add_argument('--latency', type=float, default=0.05, help="Fake yt-dlp latency per call, in seconds")
+    parser.add_argument('--payload-kb', type=int, default=64, help="Approximate size of fake playback info")
+    parser.add_argument('--packets', type=int, default=10, help="Packets (20 ms each) per fake track")
+    parser.add_argument('--guilds', type=int, nargs='+', default=[1, 10, 50], help="Simultaneous guild counts for the lag test")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
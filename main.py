@@ -1,4 +1,5 @@
 import logging
+import multiprocessing
 import os
 import sys
 from src.core import MusicBot
@@ -29,10 +30,8 @@ def main():
         os.chdir(os.path.dirname(os.path.abspath(__file__)))
         bot = MusicBot()
         
-        # Iniciar la aplicación web en un hilo separado
-        logger.info("Iniciando aplicación web...")
+        # La aplicación web se sirve en el mismo event loop que el bot
         init_web(bot, host='0.0.0.0', port=8000)
-        logger.info("Aplicación web iniciada en http://0.0.0.0:8000")
         
         # Ejecutar el bot (esto bloqueará el hilo principal)
         bot.run(bot.discord_token)
@@ -42,4 +41,5 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
@@ -2,7 +2,7 @@ from discord.ext import commands
 import discord
 import logging
 from ..core.music_player import MusicPlayer
-from .utils import get_player, handle_url, handle_search, URL_REGEX
+from .utils import get_player, handle_url, handle_search, page_count, PaginatedView, PAGE_SIZE, URL_REGEX
 import time
 
 logger = logging.getLogger(__name__)
@@ -76,39 +76,45 @@ class MusicCommands(commands.Cog):
 
     @commands.command()
     async def queue(self, ctx):
-        """Displays the current song queue."""
+        """Displays the current song queue, one page at a time."""
         player = get_player(ctx, ctx.bot)
         
-        logger.info(f"Queue status - current: {player.current}, queue length: {len(player.queue)}")
+        logger.debug(f"Queue status - playing: {player.current is not None}, queue length: {len(player.queue)}")
         
         if not player.current and len(player.queue) == 0:
             await ctx.send("📪 La cola está vacía")
             return
-        
-        embed = discord.Embed(title="🎵 Cola de Reproducción", color=discord.Color.blue())
-        
-        if player.current:
-            current_duration = player.get_current_duration()
-            logger.info(f"Current song: {player.current['title']} [{current_duration}]")
-            embed.add_field(
-                name="▶️ Reproduciendo ahora:",
-                value=f"{player.current['title']} [{current_duration}]",
-                inline=False
-            )
-        
-        if player.queue:
-            queue_text = "\n".join(
-                f"{i+1}. {song['title']} [{player.format_duration(song.get('duration', 0))}]" 
-                for i, song in enumerate(player.queue)
-            )
-            logger.info(f"Queue contents: {queue_text}")
-            embed.add_field(
-                name="📋 Próximas canciones:",
-                value=queue_text[:1024] if len(queue_text) > 1024 else queue_text,
-                inline=False
+
+        def render(page: int):
+            """Builds the embed for one page from a slice of the live queue."""
+            embed = discord.Embed(title="🎵 Cola de Reproducción", color=discord.Color.blue())
+            if player.current:
+                embed.add_field(
+                    name="▶️ Reproduciendo ahora:",
+                    value=f"{player.current.title} [{player.get_current_duration()}]"[:1024],
+                    inline=False
+                )
+
+            pages = page_count(player.queue.loaded)
+            start = page * PAGE_SIZE
+            songs = player.queue[start:start + PAGE_SIZE]
+            if songs:
+                queue_text = "\n".join(
+                    f"{start + i + 1}. {song.title} [{player.format_duration(song.duration)}]"
+                    for i, song in enumerate(songs)
+                )
+                embed.add_field(name="📋 Próximas canciones:", value=queue_text[:1024], inline=False)
+
+            footer = (
+                f"Página {page + 1}/{pages} · {len(player.queue)} canciones · "
+                f"{player.format_duration(player.get_remaining_time())} restantes"
             )
-        
-        await ctx.send(embed=embed)
+            if player.queue.pending:
+                footer += "; el resto de la playlist se carga durante la reproducción"
+            embed.set_footer(text=footer)
+            return embed, pages
+
+        await PaginatedView(ctx.author, render).send(ctx)
 
     @commands.command()
     async def leave(self, ctx):
@@ -117,6 +123,7 @@ class MusicCommands(commands.Cog):
         
         if ctx.voice_client:
             player.queue.clear()
+            player.invalidate_prefetch()
             player.is_playing = False
             player.current = None
             await ctx.voice_client.disconnect()
@@ -138,9 +145,12 @@ class MusicCommands(commands.Cog):
         
         try:
             index = index - 1 
-            if 0 <= index < len(player.queue):
+            if index >= 0:
+                await player.queue.ensure_loaded(index + 1)
+            if 0 <= index < player.queue.loaded:
                 removed_song = player.queue.pop(index)
-                await ctx.send(f"🗑️ Eliminada: {removed_song['title']}")
+                player.prefetch_next()
+                await ctx.send(f"🗑️ Eliminada: {removed_song.title}")
             else:
                 await ctx.send("❌ Índice no válido")
         except ValueError:
@@ -157,14 +167,12 @@ class MusicCommands(commands.Cog):
         
         try:
             index = index - 1 
-            if 0 <= index < len(player.queue):
-
-                queue_list = list(player.queue)
-                song = queue_list.pop(index)
-                player.queue.clear()
-                player.queue.appendleft(song)
-                player.queue.extend(queue_list)
-                await ctx.send(f"⏭️ Movida a siguiente: {song['title']}")
+            if index >= 0:
+                await player.queue.ensure_loaded(index + 1)
+            if 0 <= index < player.queue.loaded:
+                song = player.queue.move(index, 0)
+                player.prefetch_next()
+                await ctx.send(f"⏭️ Movida a siguiente: {song.title}")
             else:
                 await ctx.send("❌ Índice no válido")
         except ValueError:
@@ -179,12 +187,8 @@ class MusicCommands(commands.Cog):
             await ctx.send("❌ No hay suficientes canciones en la cola para mezclar")
             return
 
-        queue_list = list(player.queue)
-        from random import shuffle
-        shuffle(queue_list)
-        
-        player.queue.clear()
-        player.queue.extend(queue_list)
+        player.queue.shuffle()
+        player.prefetch_next()
         
         await ctx.send("🔀 Cola mezclada")
 
@@ -205,8 +209,7 @@ class MusicCommands(commands.Cog):
                 await ctx.author.voice.channel.connect()
             
             async with ctx.typing():
-                current_queue = player.queue.copy()
-                player.queue.clear()
+                current_queue = player.queue.detach()
                 
                 if not URL_REGEX.match(query):
                     await handle_search(ctx, query, player)
@@ -218,6 +221,7 @@ class MusicCommands(commands.Cog):
                         ctx.voice_client.stop()
                     
                     player.queue.extend(current_queue)
+                    player.prefetch_next()
                 else:
                     player.queue.extend(current_queue)
                     await ctx.send("❌ No se pudo encontrar la canción")
@@ -232,6 +236,7 @@ class MusicCommands(commands.Cog):
         player = get_player(ctx, ctx.bot)
 
         player.queue.clear()
+        player.invalidate_prefetch()
         
         if ctx.voice_client and (ctx.voice_client.is_playing() or ctx.voice_client.is_paused()):
             ctx.voice_client.stop()
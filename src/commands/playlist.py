@@ -1,18 +1,17 @@
 from discord.ext import commands
 import discord
-from ..core.playlist_manager import PlaylistManager
+from ..core.playlist_manager import get_playlist_manager
 from ..core.music_player import MusicPlayer
-from .utils import get_player, URL_REGEX, handle_url
-from ..core.constants import YTDLP_OPTIONS_PLAYBACK
-import yt_dlp
-import asyncio
+from ..core.track import Track
+from .utils import get_player, page_count, PaginatedView, PAGE_SIZE, URL_REGEX
+from ..core.extraction import extract_info
 
 class PlaylistCommands(commands.Cog):
     """Cog containing commands for managing user playlists."""
     def __init__(self, bot):
-        """Initializes the PlaylistCommands cog and the PlaylistManager."""
+        """Initializes the PlaylistCommands cog with the shared PlaylistManager."""
         self.bot = bot
-        self.playlist_manager = PlaylistManager()
+        self.playlist_manager = get_playlist_manager()
 
     @commands.command()
     async def createlist(self, ctx, name: str):
@@ -26,26 +25,22 @@ class PlaylistCommands(commands.Cog):
     async def addtolist(self, ctx, name: str, *, query):
         """Adds a song (found via URL or search query) to a specified playlist."""
         try:
-            with yt_dlp.YoutubeDL(YTDLP_OPTIONS_PLAYBACK) as ydl:
-                if not URL_REGEX.match(query):
-                    query = f"ytsearch:{query}"
-                
-                info = await asyncio.to_thread(ydl.extract_info, query, download=False)
-                
-                if 'entries' in info:
-                    video = info['entries'][0]
-                else:
-                    video = info
-                    
-                song = {
-                    'webpage_url': video.get('webpage_url'),
-                    'title': video.get('title', 'No disponible')
-                }
+            if not URL_REGEX.match(query):
+                query = f"ytsearch:{query}"
+            
+            info = await extract_info(query, 'playback')
+            
+            if 'entries' in info:
+                video = info['entries'][0]
+            else:
+                video = info
                 
-                if self.playlist_manager.add_to_playlist(ctx.author.id, name, song):
-                    await ctx.send(f"✅ Añadida: {song['title']}")
-                else:
-                    await ctx.send("❌ Lista no encontrada")
+            song = Track(video.get('webpage_url'), video.get('title'), video.get('duration'))
+            
+            if self.playlist_manager.add_to_playlist(ctx.author.id, name, song):
+                await ctx.send(f"✅ Añadida: {song.title}")
+            else:
+                await ctx.send("❌ Lista no encontrada")
                     
         except Exception:
             await ctx.send("❌ Error añadiendo la canción")
@@ -60,30 +55,33 @@ class PlaylistCommands(commands.Cog):
 
     @commands.command()
     async def showlist(self, ctx, name: str):
-        """Displays the contents of a specified playlist."""
-        playlist = self.playlist_manager.get_playlist(ctx.author.id, name)
+        """Displays the contents of a specified playlist, one page at a time."""
+        summary = self.playlist_manager.get_playlist_summary(ctx.author.id, name)
         
-        if not playlist:
+        if not summary or not summary[0]:
             await ctx.send("❌ Lista no encontrada o vacía")
             return
-            
-        embed = discord.Embed(
-            title=f"📋 Lista de reproducción: {name}",
-            color=discord.Color.blue()
-        )
-        
-        songs_text = "\n".join(
-            f"{i+1}. {song['title']}" 
-            for i, song in enumerate(playlist)
-        )
-        
-        embed.add_field(
-            name="Canciones:",
-            value=songs_text[:1024] if len(songs_text) > 1024 else songs_text,
-            inline=False
-        )
-        
-        await ctx.send(embed=embed)
+
+        def render(page: int):
+            """Builds the embed for one page, reading only that page's songs from the database."""
+            count, duration = self.playlist_manager.get_playlist_summary(ctx.author.id, name) or (0, 0)
+            start = page * PAGE_SIZE
+            songs = self.playlist_manager.get_playlist(ctx.author.id, name, offset=start, limit=PAGE_SIZE)
+            embed = discord.Embed(
+                title=f"📋 Lista de reproducción: {name}",
+                color=discord.Color.blue()
+            )
+            songs_text = "\n".join(
+                f"{start + i + 1}. {song.title}"
+                for i, song in enumerate(songs)
+            )
+            embed.add_field(name="Canciones:", value=songs_text[:1024] or "—", inline=False)
+            embed.set_footer(
+                text=f"Página {page + 1}/{page_count(count)} · {count} canciones · {MusicPlayer.format_duration(duration)}"
+            )
+            return embed, page_count(count)
+
+        await PaginatedView(ctx.author, render).send(ctx)
 
     @commands.command()
     async def playlist(self, ctx, name: str):
@@ -101,29 +99,10 @@ class PlaylistCommands(commands.Cog):
                 return
             await ctx.author.voice.channel.connect()
         
-        processing_msg = await ctx.send("⏳ Procesando playlist...")
-        added_count = 0
-        
-        chunk_size = 5
-        for i in range(0, len(playlist), chunk_size):
-            chunk = playlist[i:i + chunk_size]
-            tasks = [handle_url(ctx, song['webpage_url'], player) for song in chunk]
-            
-            try:
-                await asyncio.gather(*tasks)
-                added_count += len(chunk)
-                await processing_msg.edit(
-                    content=f"⏳ Procesando playlist... ({added_count}/{len(playlist)} canciones)"
-                )
-            except:
-                continue
-        
-        await processing_msg.edit(
-            content=f"✅ Playlist añadida: {added_count} canciones en cola"
-        )
-        
-        if not player.is_playing:
-            await player.play_next(ctx)
+        added_count = await player.enqueue_many(ctx, playlist)
+        await ctx.send(f"✅ Playlist añadida: {added_count} canciones en cola")
+        if added_count < len(playlist) and not player.queue.free:
+            await ctx.send(f"⚠️ La cola está llena: {len(playlist) - added_count} canciones no se añadieron")
 
     @commands.command()
     async def mylists(self, ctx):
@@ -2,11 +2,12 @@ from discord.ext import commands
 import discord
 import re
 import logging
-import yt_dlp
 import asyncio
-import os
+import io
 from typing import Dict, Optional, List, Tuple
-import requests
+from ..core.media_download import media_downloader, MediaTooLarge
+from ..core.media_resolvers import media_resolver
+from ..core.media_cache import get_media_cache
 
 logger = logging.getLogger(__name__)
 
@@ -20,165 +21,132 @@ YOUTUBE_REGEX = re.compile(
 )
 
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50 MB en bytes
+DEFAULT_UPLOAD_LIMIT = 10 * 1024 * 1024  # Límite de subida fuera de servidores (DMs)
+MAX_LINKS_PER_CHANNEL = 2  # Links processed at once per channel
+MAX_CONCURRENT_LINKS = 6  # Links processed at once across the whole bot
+
+def media_key(url: str) -> str:
+    """Returns a cache key identifying the tweet or YouTube video behind a link."""
+    match = TWITTER_REGEX.search(url)
+    if match:
+        return f"tw:{match.group(2)}"
+    match = YOUTUBE_REGEX.search(url)
+    if match:
+        return f"yt:{match.group(1)}"
+    return url
+
+def upload_limit(guild: Optional[discord.Guild]) -> int:
+    """Returns the largest file the bot can upload in a guild (by boost tier), capped at MAX_FILE_SIZE."""
+    limit = guild.filesize_limit if guild is not None else DEFAULT_UPLOAD_LIMIT
+    return min(limit, MAX_FILE_SIZE)
 
 class TwitterCommands(commands.Cog):
     """Cog for handling Twitter/X link detection and media embedding."""
     def __init__(self, bot):
-        """Initializes the TwitterCommands cog and active channel tracking."""
+        """Initializes the TwitterCommands cog, active channel tracking and link concurrency limits."""
         self.bot = bot
         self.active_channels: Dict[int, bool] = {}
+        self._channel_limits: Dict[int, asyncio.Semaphore] = {}
+        self._global_limit = asyncio.Semaphore(MAX_CONCURRENT_LINKS)
         
-    async def download_tweet_media(self, url: str) -> List[Tuple[str, str]]:
-        """Attempts to extract direct media URLs (video) from a Twitter/X or YouTube link."""
+    async def download_tweet_media(self, url: str, max_bytes: int = MAX_FILE_SIZE) -> List[Tuple[str, str]]:
+        """Returns direct media URLs for a link, reusing a recent resolution of the same tweet/video and size limit."""
+        key = f"{media_key(url)}@{max_bytes}"
+        media_urls = get_media_cache().get_resolution(key)
+        if media_urls is not None:
+            logger.debug(f"⚡ Medios obtenidos de la caché: {key}")
+            return media_urls
+        media_urls = await self.resolve_media(url, max_bytes)
+        get_media_cache().put_resolution(key, media_urls)
+        return media_urls
+
+    async def resolve_media(self, url: str, max_bytes: int = MAX_FILE_SIZE) -> List[Tuple[str, str]]:
+        """Extracts direct media URLs (video) from a Twitter/X or YouTube link, preferring files under `max_bytes`."""
         try:
             logger.debug(f"URL original: {url}")
-            
-            # Convert Twitter URL to proper format
             if '@' in url:
                 url = url.replace('@', 'https://')
             elif not url.startswith(('http://', 'https://')):
                 url = 'https://' + url
-            
-            logger.debug(f"URL después de formato básico: {url}")
-            
-            # Extract tweet ID
-            tweet_id = None
-            if 'twitter.com' in url or 'x.com' in url:
-                # Extract ID from Twitter URL
-                parts = url.split('/status/')
-                if len(parts) > 1:
-                    tweet_id = parts[1].split('/')[0].split('?')[0]
-                    logger.debug(f"ID de tweet extraído: {tweet_id}")
-                    
-                    # Use TW-Down API for Twitter
-                    api_url = f"https://twdown.net/download.php?type=videos&url=https://twitter.com/i/status/{tweet_id}"
-                    logger.debug(f"Usando TW-Down API: {api_url}")
-                    
-                    # Get the page content
-                    response = await asyncio.to_thread(requests.get, api_url)
-                    
-                    if response.status_code == 200:
-                        html_content = response.text
-                        
-                        # Look for direct video URLs
-                        video_url_pattern = r'href=[\'"]?([^\'" >]+\.mp4)[\'"]?'
-                        video_matches = re.findall(video_url_pattern, html_content)
-                        
-                        if video_matches:
-                            best_url = video_matches[0]  # Get first match
-                            logger.debug(f"URL de video encontrado: {best_url}")
-                            return [('video', best_url)]
-                            
-            # If Twitter video extraction fails or URL is YouTube, try with yt-dlp
-            logger.debug(f"Usando yt-dlp para extraer video...")
-            # Configurar yt-dlp con opciones optimizadas
-            ydl_opts = {
-                'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-                'quiet': True,
-                'no_warnings': True,
-                'extract_flat': False,
-                'force_generic_extractor': False,
-                'ignoreerrors': True,
-                'nocheckcertificate': True,
-                'logtostderr': False,
-                'no_color': True,
-                'retries': 10,
-                'fragment_retries': 10,
-                'skip_download': True
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = await asyncio.to_thread(ydl.extract_info, url, download=False)
-                
-                if not info:
-                    logger.debug("No se encontró información para el URL proporcionado.")
-                    return []
-                
-                logger.debug(f"Información extraída: {info.get('title', 'Sin título')}")
-                
-                # Buscar el mejor formato de video
-                media_urls = []
-                
-                if 'formats' in info:
-                    formats = info['formats']
-                    logger.debug(f"Encontrados {len(formats)} formatos")
-                    
-                    # Filtrar por formatos de video MP4
-                    video_formats = [f for f in formats if 
-                                  f.get('ext') == 'mp4' and 
-                                  f.get('vcodec') != 'none']
-                    
-                    if video_formats:
-                        # Ordenar por calidad (tamaño, ancho, etc.)
-                        best_format = max(video_formats, 
-                                         key=lambda x: (
-                                             x.get('width', 0) * x.get('height', 0),
-                                             x.get('tbr', 0)
-                                         ))
-                        
-                        logger.debug(f"Mejor formato encontrado: {best_format.get('format_id')}, "
-                              f"resolución: {best_format.get('width')}x{best_format.get('height')}")
-                        
-                        media_urls.append(('video', best_format['url']))
-                
-                # Si no hay formatos, intentar obtener el URL directo
-                if not media_urls and 'url' in info:
-                    logger.debug(f"Usando URL directo del video")
-                    media_urls.append(('video', info['url']))
-                    
-                if not media_urls:
-                    logger.debug("No se encontraron videos en el contenido.")
-                    return []
-                    
-                return media_urls
-                
+
+            media_urls = await media_resolver.resolve(url, max_bytes)
+            if not media_urls:
+                logger.debug("No se encontraron videos en el contenido.")
+            return media_urls
         except Exception as e:
             logger.error(f"Error descargando medios: {e}, Tipo: {type(e)}")
             return []
 
-    async def download_video(self, url: str) -> Optional[str]:
-        """Downloads a video from a direct URL to a temporary file."""
+    async def download_video(self, url: str, max_bytes: int = MAX_FILE_SIZE) -> Optional[io.IOBase]:
+        """Streams a video from a direct URL into memory (or a temp file if large), within `max_bytes`.
+
+        Returns an open file object positioned at 0 that the caller must close, or None.
+        """
         try:
             logger.debug(f"Intentando descargar video desde URL: {url}")
-            # Crear directorio temporal si no existe
-            os.makedirs('temp', exist_ok=True)
-            
-            # Generar nombre único para el archivo
-            filename = f"temp/video_{hash(url)}.mp4"
-            
-            # Descargar el video usando requests
-            response = await asyncio.to_thread(requests.get, url, stream=True)
-            
-            if response.status_code != 200:
-                logger.error(f"Error descargando video: {response.status_code}")
-                return None
-            
-            # Guardar el video
-            with open(filename, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
-            # Verificar tamaño del archivo
-            file_size = os.path.getsize(filename)
-            if file_size > MAX_FILE_SIZE:
-                logger.warning(f"Video demasiado grande ({file_size / 1024 / 1024:.1f} MB)")
-                os.remove(filename)
-                return None
-            
-            return filename
-            
+            return await media_downloader.fetch(url, max_bytes)
+        except MediaTooLarge as e:
+            logger.warning(f"Video demasiado grande: {e}")
+            return None
         except Exception as e:
             logger.error(f"Error descargando video: {e}")
             return None
-        
-    async def cleanup_temp_file(self, filepath: str):
-        """Safely removes a temporary file if it exists."""
-        try:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-        except Exception as e:
-            logger.error(f"Error eliminando archivo temporal: {e}")
+
+    async def prepare_video(self, key: str, url: str, max_bytes: int = MAX_FILE_SIZE) -> Tuple[str, str]:
+        """Gets a video ready to post, reusing an earlier upload or cached file before downloading.
+
+        Returns ('attachment', cdn_url), ('file', path) or ('link', url) when it can't be uploaded.
+        """
+        attachment_url = get_media_cache().attachment_url(key)
+        if attachment_url:
+            return 'attachment', attachment_url
+
+        path = get_media_cache().lookup(key)
+        if path is None:
+            video = await self.download_video(url, max_bytes)
+            if not video:
+                return 'link', url
+            with video:
+                path = await get_media_cache().store(key, video)
+        return 'file', path
+
+    async def post_video(self, message, key: str, url: str, prepared: Tuple[str, str]):
+        """Posts a video prepared by `prepare_video` in the message's channel."""
+        kind, value = prepared
+        content = f"🎥 Compartido por {message.author.display_name}"
+        if kind == 'attachment':
+            await message.channel.send(f"{content}\n{value}")
+            return
+
+        if kind == 'file':
+            try:
+                sent = await message.channel.send(content=content, file=discord.File(value, filename="video.mp4"))
+                if sent.attachments:
+                    get_media_cache().remember_attachment(key, sent.attachments[0].url)
+                return
+            except discord.HTTPException as e:
+                logger.error(f"Error enviando video: {e}")
+
+        await message.channel.send(
+            f"⚠️ El video es demasiado grande para enviarlo directamente. "
+            f"Puedes verlo aquí: {url}"
+        )
+
+    async def process_link(self, channel_id: int, url: str, max_bytes: int = MAX_FILE_SIZE) -> List[Tuple[str, str, Tuple[str, str]]]:
+        """Resolves and downloads one link under the per-channel and global limits, sized for `max_bytes`.
+
+        Returns `(key, media_url, prepared)` for each video, ready for `post_video`.
+        """
+        channel_limit = self._channel_limits.setdefault(channel_id, asyncio.Semaphore(MAX_LINKS_PER_CHANNEL))
+        async with channel_limit, self._global_limit:
+            key = f"{media_key(url)}@{max_bytes}"
+            media_urls = await self.download_tweet_media(url, max_bytes)
+            results = []
+            for index, (media_type, media_url) in enumerate(media_urls):
+                if media_type == 'video':
+                    item_key = f"{key}#{index}"
+                    results.append((item_key, media_url, await self.prepare_video(item_key, media_url, max_bytes)))
+            return results
 
     @commands.command()
     async def twitter(self, ctx, option: str = None):
@@ -206,49 +174,36 @@ class TwitterCommands(commands.Cog):
         if not self.active_channels.get(message.channel.id, False):
             return
             
-        # Check for Twitter URLs
-        twitter_matches = TWITTER_REGEX.finditer(message.content)
-        youtube_matches = YOUTUBE_REGEX.finditer(message.content)
-        
-        matches = list(twitter_matches) + list(youtube_matches)
-        
+        # Check for Twitter/YouTube URLs, in message order and without repeats
+        matches = sorted(
+            list(TWITTER_REGEX.finditer(message.content)) + list(YOUTUBE_REGEX.finditer(message.content)),
+            key=lambda match: match.start()
+        )
+        urls, seen = [], set()
         for match in matches:
+            key = media_key(match.group(0))
+            if key not in seen:
+                seen.add(key)
+                urls.append(match.group(0))
+        if not urls:
+            return
+
+        # Links are fetched concurrently but posted in the order they were written.
+        max_bytes = upload_limit(message.guild)
+        tasks = [asyncio.create_task(self.process_link(message.channel.id, url, max_bytes)) for url in urls]
+        posted = False
+        async with message.channel.typing():
+            for task in tasks:
+                try:
+                    for key, media_url, prepared in await task:
+                        await self.post_video(message, key, media_url, prepared)
+                        posted = True
+                except Exception as e:
+                    logger.error(f"Error procesando video: {e}")
+                    await message.channel.send("❌ Error procesando el video")
+
+        if posted:
             try:
-                url = match.group(0)
-                async with message.channel.typing():
-                    media_urls = await self.download_tweet_media(url)
-                    
-                    if not media_urls:
-                        continue
-                    
-                    for media_type, url in media_urls:
-                        if media_type == 'video':
-                            video_path = await self.download_video(url)
-                            if video_path:
-                                try:
-                                    await message.channel.send(
-                                        content=f"🎥 Compartido por {message.author.display_name}",
-                                        file=discord.File(video_path, filename="video.mp4")
-                                    )
-                                except discord.HTTPException as e:
-                                    logger.error(f"Error enviando video: {e}")
-                                    await message.channel.send(
-                                        f"⚠️ El video es demasiado grande para enviarlo directamente. "
-                                        f"Puedes verlo aquí: {url}"
-                                    )
-                                finally:
-                                    await self.cleanup_temp_file(video_path)
-                            else:
-                                await message.channel.send(
-                                    f"⚠️ El video es demasiado grande para enviarlo directamente. "
-                                    f"Puedes verlo aquí: {url}"
-                                )
-                            
-                    try:
-                        await message.delete()
-                    except discord.errors.Forbidden:
-                        logger.warning("No se pudo borrar el mensaje original - Permisos insuficientes")
-                            
-            except Exception as e:
-                logger.error(f"Error procesando video: {e}")
-                await message.channel.send("❌ Error procesando el video")
\ No newline at end of file
+                await message.delete()
+            except discord.errors.Forbidden:
+                logger.warning("No se pudo borrar el mensaje original - Permisos insuficientes")
@@ -1,14 +1,22 @@
-from discord.ext import commands
 import discord
 import logging
-from ..core import MusicPlayer, URL_REGEX, YTDLP_OPTIONS_PLAYLIST_INFO, YTDLP_OPTIONS_PLAYBACK, YTDLP_SEARCH_OPTIONS
-import yt_dlp
-import asyncio
-from typing import Dict
+from ..core import MusicPlayer, URL_REGEX
+from ..core.extraction import extractor_pool, extract_info
+from ..core.search_cache import search_youtube
+from ..core.metrics import SEARCH_SECONDS
+from ..core.track import Track
+from ..core.track_queue import PlaylistCursor, PLAYLIST_PAGE_SIZE, QueueFull
+from typing import Callable, Tuple
 import time
 
 logger = logging.getLogger(__name__)
 
+PAGE_SIZE = 10
+"""Entries shown per page in the paginated queue and playlist views."""
+
+PAGINATION_TIMEOUT = 120.0
+"""Seconds of inactivity after which a paginated view drops its buttons."""
+
 def get_player(ctx, bot) -> MusicPlayer:
     """Gets or creates the MusicPlayer instance for the given guild."""
     guild_id = ctx.guild.id
@@ -18,104 +26,88 @@ def get_player(ctx, bot) -> MusicPlayer:
 
 async def handle_search(ctx, query: str, player):
     """Performs a YouTube search, displays results, and handles user selection."""
+    search_started = time.perf_counter()
     try:
-        with yt_dlp.YoutubeDL(YTDLP_SEARCH_OPTIONS) as ydl:
-            search_query = f"ytsearch5:{query}"
-            info = await asyncio.to_thread(
-                ydl.extract_info,
-                search_query,
-                download=False
-            )
-            
-            if not info or not info.get('entries'):
-                await ctx.send("❌ No se encontraron resultados")
-                return
+        results = await search_youtube(query)
+        logger.debug(f"Número de entradas de búsqueda encontradas: {len(results)}")
+
+        if not results:
+            await ctx.send("❌ No se encontraron resultados")
+            return
 
-            logger.debug(f"Número de entradas de búsqueda encontradas: {len(info.get('entries', []))}")
-            results = []
-            for entry in list(info['entries'])[:5]:
-                if entry:
-                    results.append({
-                        'title': entry.get('title', 'No disponible'),
-                        'webpage_url': entry.get('url')
-                    })
-
-            if not results:
-                await ctx.send("❌ No se encontraron resultados")
+        results_text = "\n".join(
+            f"{i+1}. {entry['title']}" 
+            for i, entry in enumerate(results)
+        )
+        
+        embed = discord.Embed(
+            title="🔍 Resultados de búsqueda",
+            description=results_text,
+            color=discord.Color.blue()
+        )
+
+        view = discord.ui.View(timeout=30.0)
+        selected_url = None
+
+        async def button_callback(interaction: discord.Interaction, url: str):
+            nonlocal selected_url
+            if interaction.user != ctx.author:
+                await interaction.response.send_message("No puedes usar esta interacción.", ephemeral=True)
                 return
+            selected_url = url
+            await interaction.response.defer() # Acknowledge interaction
+            view.stop() # Stop the view from listening to further interactions
+
+        async def cancel_callback(interaction: discord.Interaction):
+            nonlocal selected_url
+            if interaction.user != ctx.author:
+                await interaction.response.send_message("No puedes usar esta interacción.", ephemeral=True)
+                return
+            selected_url = "CANCEL"
+            await interaction.response.defer()
+            view.stop()
 
-            results_text = "\n".join(
-                f"{i+1}. {entry['title']}" 
-                for i, entry in enumerate(results)
-            )
-            
-            embed = discord.Embed(
-                title="🔍 Resultados de búsqueda",
-                description=results_text,
-                color=discord.Color.blue()
-            )
-
-            view = discord.ui.View(timeout=30.0)
-            selected_url = None
-
-            async def button_callback(interaction: discord.Interaction, url: str):
-                nonlocal selected_url
-                if interaction.user != ctx.author:
-                    await interaction.response.send_message("No puedes usar esta interacción.", ephemeral=True)
-                    return
-                selected_url = url
-                await interaction.response.defer() # Acknowledge interaction
-                view.stop() # Stop the view from listening to further interactions
-
-            async def cancel_callback(interaction: discord.Interaction):
-                nonlocal selected_url
-                if interaction.user != ctx.author:
-                    await interaction.response.send_message("No puedes usar esta interacción.", ephemeral=True)
-                    return
-                selected_url = "CANCEL"
-                await interaction.response.defer()
-                view.stop()
-
-            for i, result_entry in enumerate(results):
-                button = discord.ui.Button(label=f"{i+1}", style=discord.ButtonStyle.primary, custom_id=f"select_{i}")
-                
-                # Need to use a wrapper or lambda with default argument to capture current result_entry['webpage_url']
-                async def make_callback(url_to_select):
-                    async def callback(interaction: discord.Interaction):
-                        await button_callback(interaction, url_to_select)
-                    return callback
-
-                button.callback = await make_callback(result_entry['webpage_url'])
-                view.add_item(button)
-            
-            cancel_button = discord.ui.Button(label="Cancelar", style=discord.ButtonStyle.danger, custom_id="cancel_search")
-            cancel_button.callback = cancel_callback
-            view.add_item(cancel_button)
+        for i, result_entry in enumerate(results):
+            button = discord.ui.Button(label=f"{i+1}", style=discord.ButtonStyle.primary, custom_id=f"select_{i}")
             
-            embed.set_footer(text="Selecciona una canción usando los botones o cancela.")
-            message = await ctx.send(embed=embed, view=view)
-            
-            # Wait for the view to stop (either by interaction or timeout)
-            await view.wait()
+            # Need to use a wrapper or lambda with default argument to capture current result_entry['webpage_url']
+            async def make_callback(url_to_select):
+                async def callback(interaction: discord.Interaction):
+                    await button_callback(interaction, url_to_select)
+                return callback
+
+            button.callback = await make_callback(result_entry['webpage_url'])
+            view.add_item(button)
+        
+        cancel_button = discord.ui.Button(label="Cancelar", style=discord.ButtonStyle.danger, custom_id="cancel_search")
+        cancel_button.callback = cancel_callback
+        view.add_item(cancel_button)
+        
+        embed.set_footer(text="Selecciona una canción usando los botones o cancela.")
+        message = await ctx.send(embed=embed, view=view)
+        SEARCH_SECONDS.observe(time.perf_counter() - search_started)
+        
+        # Wait for the view to stop (either by interaction or timeout)
+        await view.wait()
 
-            if view.is_finished() and hasattr(message, 'delete'): # Check if message exists before deleting
-                try:
-                    await message.delete()
-                except discord.NotFound:
-                    logger.warn("Mensaje de búsqueda ya fue eliminado o no encontrado al intentar borrar.")
-                except Exception as e:
-                    logger.error(f"Error al eliminar mensaje de búsqueda: {e}")
+        if view.is_finished() and hasattr(message, 'delete'): # Check if message exists before deleting
+            try:
+                await message.delete()
+            except discord.NotFound:
+                logger.warn("Mensaje de búsqueda ya fue eliminado o no encontrado al intentar borrar.")
+            except Exception as e:
+                logger.error(f"Error al eliminar mensaje de búsqueda: {e}")
 
 
-            if selected_url and selected_url != "CANCEL":
-                await handle_url(ctx, selected_url, player)
-            # elif selected_url == "CANCEL" or (view.is_finished() and selected_url is None): # Timeout or explicit cancel
-            #     # Message already deleted or will be by finally block if interaction happened
-            #     # If it was a timeout, selected_url is None
-            #     pass # No action needed if cancelled or timed out, message is handled
+        if selected_url and selected_url != "CANCEL":
+            await handle_url(ctx, selected_url, player)
+        # elif selected_url == "CANCEL" or (view.is_finished() and selected_url is None): # Timeout or explicit cancel
+        #     # Message already deleted or will be by finally block if interaction happened
+        #     # If it was a timeout, selected_url is None
+        #     pass # No action needed if cancelled or timed out, message is handled
 
-            # No need for the old reaction logic or explicit finally delete for the message
-            # as the view handles timeout and button presses manage the message lifecycle or response.
+        # No need for the old reaction logic or explicit finally delete for the message
+        # as the view handles timeout and button presses manage the message lifecycle or response.
 
     except Exception as e:
         logger.error(f"Error en handle_search: {e}")
@@ -124,40 +116,38 @@ async def handle_search(ctx, query: str, player):
 async def handle_url(ctx, url, player):
     """Processes a URL (song or playlist), extracts info, and adds to the queue."""
     try:
-        with yt_dlp.YoutubeDL(YTDLP_OPTIONS_PLAYLIST_INFO) as ydl:
-            info = await asyncio.to_thread(ydl.extract_info, url, download=False)
+        info = await extract_info(url, 'playlist_info', playlistend=PLAYLIST_PAGE_SIZE)
+
+        if info is None:
+            logger.error(f"yt-dlp returned None for URL: {url}. This might be an authentication issue or invalid URL.")
+            await ctx.send("❌ No se pudo obtener la información del video. Puede ser un problema de autenticación o que el URL sea inválido.")
+            return
+        
+        if 'entries' in info:
+            entries = info['entries']
+            if not entries:
+                await ctx.send("❌ No se encontraron videos en la playlist")
+                return
 
-            if info is None:
-                logger.error(f"yt-dlp returned None for URL: {url}. This might be an authentication issue or invalid URL.")
-                await ctx.send("❌ No se pudo obtener la información del video. Puede ser un problema de autenticación o que el URL sea inválido.")
+            songs = [Track.from_entry(entry, url) for entry in entries if entry]
+            added = player.queue.extend(songs)
+            if added < len(songs):
+                await ctx.send(f"⚠️ La cola está llena: solo se añadieron {added} de {len(songs)} canciones")
+
+            # Only the first page was fetched; the rest is loaded as playback approaches it.
+            total = info.get('playlist_count')
+            if len(entries) >= PLAYLIST_PAGE_SIZE and (total is None or total > PLAYLIST_PAGE_SIZE):
+                player.queue.extend((PlaylistCursor(url, PLAYLIST_PAGE_SIZE + 1, total),))
+
+        else:
+            song = Track.from_entry(info, url)
+            try:
+                player.queue.append(song)
+            except QueueFull as e:
+                await ctx.send(f"❌ {e}")
                 return
-            
-            if 'entries' in info:
-                entries = info['entries']
-                if not entries:
-                    await ctx.send("❌ No se encontraron videos en la playlist")
-                    return
-
-                for entry in entries:
-                    if not entry:
-                        continue
-                    song_info = {
-                        'webpage_url': entry.get('webpage_url', url),
-                        'title': entry.get('title', 'No disponible'),
-                        'duration': entry.get('duration', 0)
-                    }
-                    player.queue.append(song_info)
-
-            else:
-                song_info = {
-                    'webpage_url': info.get('webpage_url', url),
-                    'title': info.get('title', 'No disponible'),
-                    'duration': info.get('duration', 0)
-                }
-                player.queue.append(song_info)
-
-            if not player.is_playing:
-                await player.play_next(ctx)
+
+        await player.start_playback(ctx)
 
     except Exception as e:
         logger.error(f"Error en handle_url: {e}")
@@ -172,10 +162,9 @@ def get_video_duration(video_info: dict) -> int:
             
             if '_type' in video_info and video_info['_type'] == 'url' and 'url' in video_info:
                 try:
-                    with yt_dlp.YoutubeDL(YTDLP_OPTIONS_PLAYBACK) as ydl:
-                        detailed_info = ydl.extract_info(video_info['url'], download=False)
-                        if detailed_info and 'duration' in detailed_info:
-                            return int(float(detailed_info['duration']))
+                    detailed_info = extractor_pool.extract_info(video_info['url'], 'playback')
+                    if detailed_info and 'duration' in detailed_info:
+                        return int(float(detailed_info['duration']))
                 except Exception as e:
                     logger.error(f"Error obteniendo info detallada: {e}")
             
@@ -190,3 +179,68 @@ def get_video_duration(video_info: dict) -> int:
     except Exception as e:
         logger.error(f"Error procesando duración: {e}")
         return 0
+
+def page_count(total: int, page_size: int = PAGE_SIZE) -> int:
+    """Number of pages needed for `total` entries (at least one, so empty lists still render)."""
+    return max((total + page_size - 1) // page_size, 1)
+
+class PaginatedView(discord.ui.View):
+    """Previous/next buttons that re-render an embed one page at a time.
+
+    `render(page)` builds the embed for a 0-based page and returns it with the current
+    page count, so only the visible entries are formatted and a list that changes while
+    the view is open (e.g. the queue during playback) is read fresh on every click.
+    """
+    def __init__(self, author, render: Callable[[int], Tuple[discord.Embed, int]], timeout: float = PAGINATION_TIMEOUT):
+        """Creates the view for the invoking user; call `send` to post the first page."""
+        super().__init__(timeout=timeout)
+        self.author = author
+        self.render = render
+        self.page = 0
+        self.pages = 1
+        self.message = None
+
+    def _refresh(self) -> discord.Embed:
+        """Renders the current page (clamped to the live page count) and updates the buttons."""
+        embed, self.pages = self.render(self.page)
+        if self.page >= self.pages:
+            self.page = self.pages - 1
+            embed, self.pages = self.render(self.page)
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.pages - 1
+        return embed
+
+    async def send(self, ctx):
+        """Posts the first page, with buttons only if there is more than one."""
+        embed = self._refresh()
+        if self.pages > 1:
+            self.message = await ctx.send(embed=embed, view=self)
+        else:
+            self.stop()
+            await ctx.send(embed=embed)
+
+    async def _turn(self, interaction: discord.Interaction, step: int):
+        """Moves `step` pages and edits the message in place."""
+        if interaction.user != self.author:
+            await interaction.response.send_message("No puedes usar esta interacción.", ephemeral=True)
+            return
+        self.page = max(self.page + step, 0)
+        await interaction.response.edit_message(embed=self._refresh(), view=self)
+
+    @discord.ui.button(label="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Shows the previous page."""
+        await self._turn(interaction, -1)
+
+    @discord.ui.button(label="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Shows the next page."""
+        await self._turn(interaction, 1)
+
+    async def on_timeout(self):
+        """Removes the buttons once nobody has paged for a while."""
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
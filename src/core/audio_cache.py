@@ -0,0 +1,444 @@
+"""Optional on-disk cache of frequently played tracks as Ogg/Opus, played back without ffmpeg."""
+import asyncio
+import hashlib
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import discord
+from discord.oggparse import OggStream
+
+from .metrics import FFMPEG_PROCESSES
+from .stream_cache import get_cache_key
+from .transcode_scheduler import transcode_scheduler
+
+logger = logging.getLogger(__name__)
+
+AUDIO_CACHE_DIR = 'audio_cache'
+"""Directory holding cached tracks, one `<video id>.opus` Ogg file each."""
+
+AUDIO_CACHE_BUDGET = 2 * 1024 * 1024 * 1024
+"""Total bytes of cached audio kept on disk before the coldest tracks are evicted."""
+
+AUDIO_CACHE_MIN_PLAYS = 2
+"""Plays after which a track is downloaded into the cache."""
+
+AUDIO_CACHE_INDEX = 'index.json'
+"""File in the cache directory persisting play counts and recency across restarts."""
+
+AUDIO_CACHE_MAX_TRACKED = 5000
+"""Uncached tracks whose play counts (and URLs) are remembered; the least played beyond this are forgotten."""
+
+MAX_CACHED_DURATION = 20 * 60
+"""Tracks longer than this many seconds (mixes, streams) are never cached."""
+
+WARM_INTERVAL = 10 * 60
+"""Seconds between background warming rounds."""
+
+WARM_BATCH = 10
+"""Maximum tracks downloaded per warming round."""
+
+DOWNLOAD_TIMEOUT = 10 * 60
+"""Seconds after which a single track download is abandoned."""
+
+OPUS_HEADER_PACKETS = (b'OpusHead', b'OpusTags')
+"""Ogg/Opus metadata packets that must not be sent to Discord as audio."""
+
+StreamResolver = Callable[[str], Awaitable[Dict[str, Any]]]
+
+_SAFE_NAME_REGEX = re.compile(r'[\w-]{1,64}')
+
+
+class LocalOpusAudio(discord.AudioSource):
+    """Reads Opus packets straight from a cached Ogg file: no ffmpeg process, no network."""
+    def __init__(self, path: str, *, on_first_packet=None, on_cleanup=None):
+        """Opens the file; `on_first_packet` and `on_cleanup` are called once each from the player thread."""
+        self._file = open(path, 'rb')
+        self._packets = OggStream(self._file).iter_packets()
+        self._on_first_packet = on_first_packet
+        self._on_cleanup = on_cleanup
+
+    def read(self) -> bytes:
+        """Returns the next Opus packet, or b'' at the end of the file."""
+        for packet in self._packets:
+            if packet.startswith(OPUS_HEADER_PACKETS):
+                continue
+            if self._on_first_packet is not None:
+                callback, self._on_first_packet = self._on_first_packet, None
+                callback()
+            return packet
+        return b''
+
+    def is_opus(self) -> bool:
+        """Packets are already Opus encoded."""
+        return True
+
+    def cleanup(self):
+        """Closes the file and releases the cache entry."""
+        self._file.close()
+        if self._on_cleanup is not None:
+            callback, self._on_cleanup = self._on_cleanup, None
+            callback()
+
+
+class AudioCache:
+    """Size-bounded cache of Ogg/Opus files keyed like the stream cache (video ID, else URL).
+
+    A track is downloaded in the background once it has been played `min_plays` times, and
+    warming rounds also fetch tracks that are popular in saved playlists. When over budget the
+    least frequently played track goes first, ties broken by least recent use (LFU + LRU).
+    Tracks being played are never evicted.
+    """
+    def __init__(self, directory: str = AUDIO_CACHE_DIR, budget: int = AUDIO_CACHE_BUDGET,
+                 min_plays: int = AUDIO_CACHE_MIN_PLAYS):
+        """Initializes the cache and loads the index and files left by a previous run."""
+        self.directory = directory
+        self.budget = budget
+        self.min_plays = min_plays
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[int, float]] = {}
+        self._plays: Dict[str, int] = {}
+        self._urls: Dict[str, str] = {}
+        self._pinned: Dict[str, int] = {}
+        self._size = 0
+        self._downloading: Dict[str, asyncio.Task] = {}
+        self._download_slot = asyncio.Semaphore(1)
+        self._warm_task: Optional[asyncio.Task] = None
+        self.stats = {'hits': 0, 'misses': 0, 'downloaded': 0, 'failed': 0, 'evicted': 0}
+        self._load()
+
+    def _name(self, key: str) -> str:
+        """Returns a filesystem-safe name for a cache key."""
+        if _SAFE_NAME_REGEX.fullmatch(key):
+            return key
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        """Returns the file path for a cache key."""
+        return os.path.join(self.directory, f"{self._name(key)}.opus")
+
+    def _load(self):
+        """Reads the persisted index and keeps the entries whose files still exist."""
+        if not os.path.isdir(self.directory):
+            return
+        try:
+            with open(os.path.join(self.directory, AUDIO_CACHE_INDEX), encoding='utf-8') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            index = {}
+        except (OSError, ValueError) as e:
+            logger.error(f"Error leyendo índice de caché de audio: {e}")
+            index = {}
+
+        self._plays = {key: int(plays) for key, plays in index.get('plays', {}).items()}
+        self._urls = dict(index.get('urls', {}))
+        for key, last_used in index.get('files', {}).items():
+            try:
+                size = os.path.getsize(self._path(key))
+            except OSError:
+                continue
+            self._files[key] = (size, float(last_used))
+            self._size += size
+        self._evict()
+        self._prune()
+
+    def _prune(self):
+        """Forgets play counts and URLs beyond `AUDIO_CACHE_MAX_TRACKED` uncached tracks, least played first.
+
+        Cached and downloading tracks always keep theirs. Call with the lock held (or before sharing).
+        """
+        untracked = [key for key in self._plays if key not in self._files and key not in self._downloading]
+        if len(untracked) > AUDIO_CACHE_MAX_TRACKED:
+            keep = set(heapq.nlargest(AUDIO_CACHE_MAX_TRACKED, untracked, key=self._plays.__getitem__))
+            for key in untracked:
+                if key not in keep:
+                    del self._plays[key]
+        for key in [key for key in self._urls if key not in self._plays and key not in self._files]:
+            del self._urls[key]
+
+    def _save_sync(self):
+        """Writes the index atomically."""
+        with self._lock:
+            self._prune()
+            index = {
+                'plays': dict(self._plays),
+                'urls': dict(self._urls),
+                'files': {key: last_used for key, (_, last_used) in self._files.items()},
+            }
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, AUDIO_CACHE_INDEX)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(path + '.tmp', path)
+
+    async def save(self):
+        """Persists the index off the event loop."""
+        try:
+            await asyncio.to_thread(self._save_sync)
+        except Exception as e:
+            logger.error(f"Error guardando índice de caché de audio: {e}")
+
+    def _score(self, key: str) -> Tuple[int, float]:
+        """Eviction order: fewest plays first, then least recently used. Call with the lock held."""
+        return self._plays.get(key, 0), self._files[key][1]
+
+    def _evict(self, keep: Optional[str] = None):
+        """Removes the coldest unpinned files until the cache fits its budget. Call with the lock held."""
+        while self._size > self.budget:
+            victims = [key for key in self._files if key != keep and key not in self._pinned]
+            if not victims:
+                break
+            key = min(victims, key=self._score)
+            size, _ = self._files.pop(key)
+            self._size -= size
+            self.stats['evicted'] += 1
+            try:
+                os.remove(self._path(key))
+            except OSError as e:
+                logger.error(f"Error eliminando archivo de caché de audio: {e}")
+
+    def open(self, url: str, on_first_packet=None) -> Optional[LocalOpusAudio]:
+        """Returns a local audio source for a cached track, or None on a miss.
+
+        The entry is pinned until the source is cleaned up, so it can't be evicted mid-song.
+        """
+        key = get_cache_key(url)
+        with self._lock:
+            entry = self._files.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._files[key] = (entry[0], time.time())
+            self._pinned[key] = self._pinned.get(key, 0) + 1
+            self.stats['hits'] += 1
+        try:
+            return LocalOpusAudio(self._path(key), on_first_packet=on_first_packet,
+                                  on_cleanup=lambda: self._release(key))
+        except OSError as e:
+            logger.error(f"Error abriendo pista en caché: {e}")
+            self._release(key)
+            self._discard(key)
+            return None
+
+    def _release(self, key: str):
+        """Unpins an entry once its audio source is closed."""
+        with self._lock:
+            count = self._pinned.get(key, 0) - 1
+            if count > 0:
+                self._pinned[key] = count
+            else:
+                self._pinned.pop(key, None)
+
+    def _discard(self, key: str):
+        """Forgets an entry whose file is missing or unreadable."""
+        with self._lock:
+            entry = self._files.pop(key, None)
+            if entry is not None:
+                self._size -= entry[0]
+
+    def __contains__(self, url: str) -> bool:
+        """True if a track is cached."""
+        with self._lock:
+            return get_cache_key(url) in self._files
+
+    def record_play(self, url: str, stream: Optional[Dict[str, Any]] = None):
+        """Counts a play and starts downloading the track once it reaches `min_plays`.
+
+        `stream` is the resolved stream the play used (see `MusicPlayer.resolve_stream`);
+        without it the track waits for the next warming round.
+        """
+        key = get_cache_key(url)
+        with self._lock:
+            self._plays[key] = self._plays.get(key, 0) + 1
+            self._urls[key] = url
+            due = self._plays[key] >= self.min_plays and key not in self._files
+        if due and stream is not None:
+            self._schedule(key, stream)
+
+    def _schedule(self, key: str, stream: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """Starts a background download for a key unless one is already running or the track is too long."""
+        if key in self._downloading or (stream.get('duration') or 0) > MAX_CACHED_DURATION:
+            return None
+        task = asyncio.get_running_loop().create_task(self._download(key, stream))
+        self._downloading[key] = task
+        task.add_done_callback(lambda _: self._downloading.pop(key, None))
+        return task
+
+    async def _download(self, key: str, stream: Dict[str, Any]):
+        """Saves a stream as Ogg/Opus, remuxing Opus sources and encoding anything else once."""
+        if stream.get('acodec') == 'opus':
+            codec = ['-c:a', 'copy']
+        else:
+            codec = ['-c:a', 'libopus', '-b:a', '128k', '-ar', '48000', '-ac', '2']
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path + '.part'
+
+        async with self._download_slot:
+            with self._lock:
+                if key in self._files:
+                    return
+            # Background work: wait for a free slot rather than adding to a saturated host.
+            admission = await transcode_scheduler.admit('copy' if codec[1] == 'copy' else 'transcode', background=True)
+            logger.debug(f"💾 Guardando en caché de audio: {key}")
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    'ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+                    '-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5',
+                    '-i', stream['url'], '-vn', '-map', '0:a:0', *codec, '-f', 'opus', tmp_path,
+                    stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+                )
+            except BaseException:
+                admission.release()
+                raise
+            admission.attach(process.pid)
+            FFMPEG_PROCESSES.inc()
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), timeout=DOWNLOAD_TIMEOUT)
+            except BaseException:
+                process.kill()
+                await process.wait()
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                self.stats['failed'] += 1
+                raise
+            finally:
+                FFMPEG_PROCESSES.dec()
+                admission.release()
+
+        if process.returncode != 0:
+            self.stats['failed'] += 1
+            logger.warning(f"⚠️ No se pudo guardar {key} en caché: {stderr.decode(errors='replace').strip()[:200]}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            old = self._files.get(key)
+            self._size += size - (old[0] if old else 0)
+            self._files[key] = (size, time.time())
+            self.stats['downloaded'] += 1
+            self._evict(keep=key)
+        await self.save()
+
+    async def _playlist_counts(self) -> Tuple[Dict[str, int], Dict[str, str]]:
+        """Counts how many saved playlists contain each track; also returns each track's URL."""
+        from .playlist_manager import get_playlist_manager
+
+        def collect() -> Tuple[Dict[str, int], Dict[str, str]]:
+            """Pages through every playlist in the database; touches no cache state, as it runs in a thread."""
+            manager = get_playlist_manager()
+            counts: Dict[str, int] = {}
+            urls: Dict[str, str] = {}
+            cursor = 0
+            while cursor is not None:
+                items, cursor = manager.list_playlists(after_id=cursor, limit=200)
+                for item in items:
+                    for song in item['songs']:
+                        url = song.get('webpage_url')
+                        if url:
+                            key = get_cache_key(url)
+                            counts[key] = counts.get(key, 0) + 1
+                            urls.setdefault(key, url)
+            return counts, urls
+
+        return await asyncio.to_thread(collect)
+
+    async def warm(self, resolve: StreamResolver, batch: int = WARM_BATCH) -> int:
+        """Downloads the hottest uncached tracks by plays plus playlist appearances; returns how many.
+
+        When the cache is full a candidate is only fetched if it is hotter than the coldest
+        cached track, so warming never churns the cache.
+        """
+        counts, playlist_urls = await self._playlist_counts()
+        with self._lock:
+            scores = {key: self._plays.get(key, 0) + counts.get(key, 0) for key in set(self._plays) | set(counts)}
+            candidates = sorted(
+                (key for key, score in scores.items() if score >= self.min_plays and key not in self._files),
+                key=lambda key: scores[key], reverse=True
+            )[:batch]
+            # Resolved now: a save during the round may prune URLs of tracks that were never played.
+            urls = {key: self._urls.get(key) or playlist_urls.get(key) for key in candidates}
+            coldest = min((scores.get(key, 0) for key in self._files), default=0)
+            # Full means there's no room for another track of average size.
+            full = bool(self._files) and self._size + self._size / len(self._files) > self.budget
+
+        warmed = 0
+        for key in candidates:
+            if full and scores[key] <= coldest:
+                break
+            if not urls[key]:
+                continue
+            try:
+                stream = await resolve(urls[key])
+            except Exception as e:
+                logger.debug(f"No se pudo resolver {key} para la caché de audio: {e}")
+                continue
+            task = self._schedule(key, stream)
+            if task is not None:
+                await asyncio.gather(task, return_exceptions=True)
+                warmed += key in self._files
+        return warmed
+
+    def start_warming(self, resolve: StreamResolver, interval: float = WARM_INTERVAL):
+        """Runs `warm` periodically in the background until `close`."""
+        async def loop():
+            """Warms the cache and saves the index every `interval` seconds."""
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    warmed = await self.warm(resolve)
+                    if warmed:
+                        logger.info(f"💾 Caché de audio: {warmed} pistas precargadas")
+                except Exception as e:
+                    logger.error(f"Error precargando caché de audio: {e}")
+                await self.save()
+
+        if self._warm_task is None:
+            self._warm_task = asyncio.get_running_loop().create_task(loop())
+
+    async def close(self):
+        """Stops warming and running downloads, then saves the index."""
+        tasks = [task for task in [self._warm_task, *self._downloading.values()] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._warm_task = None
+        await self.save()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns hit counters plus the number of files and bytes on disk."""
+        with self._lock:
+            return dict(self.stats, files=len(self._files), bytes=self._size, downloading=len(self._downloading))
+
+
+_audio_cache: Optional[AudioCache] = None
+
+
+def get_audio_cache() -> Optional[AudioCache]:
+    """Returns the process-wide audio cache, or None when it is disabled (the default)."""
+    return _audio_cache
+
+
+def enable_audio_cache(directory: str = AUDIO_CACHE_DIR, budget: int = AUDIO_CACHE_BUDGET,
+                       min_plays: int = AUDIO_CACHE_MIN_PLAYS) -> AudioCache:
+    """Creates the process-wide audio cache; call from inside the event loop."""
+    global _audio_cache
+    _audio_cache = AudioCache(directory, budget, min_plays)
+    logger.info(f"Caché de audio activada en {directory} ({budget // (1024 * 1024)} MB)")
+    return _audio_cache
+
+
+async def disable_audio_cache():
+    """Closes and removes the process-wide audio cache, if enabled."""
+    global _audio_cache
+    cache, _audio_cache = _audio_cache, None
+    if cache is not None:
+        await cache.close()
@@ -1,3 +1,4 @@
+import asyncio
 import discord
 from discord.ext import commands
 import os
@@ -9,6 +10,12 @@ from typing import Optional, Dict
 from dotenv import load_dotenv
 
 from .music_player import MusicPlayer
+from .extraction import extractor_pool, set_extraction_backend, shutdown_extraction_backend
+from .playlist_manager import get_playlist_manager
+from .media_download import media_downloader
+from .media_cache import get_media_cache
+from .track_queue import QUEUE_MAX_SIZE
+from .audio_cache import enable_audio_cache, disable_audio_cache, AUDIO_CACHE_DIR, AUDIO_CACHE_BUDGET, AUDIO_CACHE_MIN_PLAYS
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +44,8 @@ class MusicBot(commands.Bot):
         self.audio_bitrate = 128  # Default bitrate in kbps
         self.audio_sampling_rate = 48000 # Default sampling rate in Hz
         self.audio_channels = 2 # Default audio channels (stereo)
+        self.queue_limit = int(self.config.get('queue_limit', QUEUE_MAX_SIZE)) # Max songs per guild queue
+        self.web_server = None # Set by src.web.init_web, started in setup_hook
         
     @lru_cache(maxsize=CACHE_SIZE)
     async def _get_prefix(self, bot, message):
@@ -72,7 +81,28 @@ class MusicBot(commands.Bot):
 
     async def setup_hook(self):
         """Hook called by discord.py to perform async setup, loads extensions."""
+        set_extraction_backend(
+            self.config.get('extraction_backend', 'thread'),
+            self.config.get('extraction_workers')
+        )
+        # Built here, after main.py's chdir, so the relative cache directory lands next to the bot.
+        await asyncio.to_thread(get_media_cache)
+        if self.config.get('audio_cache'):
+            audio_cache = enable_audio_cache(
+                self.config.get('audio_cache_dir', AUDIO_CACHE_DIR),
+                int(self.config.get('audio_cache_budget_mb', AUDIO_CACHE_BUDGET // (1024 * 1024))) * 1024 * 1024,
+                int(self.config.get('audio_cache_min_plays', AUDIO_CACHE_MIN_PLAYS))
+            )
+            audio_cache.start_warming(MusicPlayer.resolve_stream)
         await self._load_extensions()
+        if self.web_server is not None:
+            try:
+                await self.web_server.start()
+            except OSError as e:
+                # A busy or forbidden port shouldn't keep the bot itself from starting.
+                logger.error(f"❌ No se pudo iniciar el servidor web, el bot seguirá sin él: {e}")
+                await self.web_server.stop()
+                self.web_server = None
         
     async def _load_extensions(self):
         """Loads the command cogs."""
@@ -82,6 +112,18 @@ class MusicBot(commands.Bot):
             logger.error(f"Error cargando extensiones: {e}")
             raise
 
+    async def close(self):
+        """Stops the web server, pooled extractors, HTTP session and audio cache before shutting down the Discord connection."""
+        if self.web_server is not None:
+            await self.web_server.stop()
+        shutdown_extraction_backend()
+        extractor_pool.close()
+        await media_downloader.close()
+        await get_media_cache().save()
+        await disable_audio_cache()
+        get_playlist_manager().flush()
+        await super().close()
+
     async def on_ready(self):
         """Event handler called when the bot is ready and connected."""
         await self._initialize_guild_configs()
@@ -108,6 +150,7 @@ class MusicBot(commands.Bot):
                 if voice_client.guild.id in self.players:
                     player = self.players[voice_client.guild.id]
                     player.queue.clear()
+                    player.invalidate_prefetch()
                     player.is_playing = False
                     player.current = None
                 
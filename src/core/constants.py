@@ -11,6 +11,11 @@ URL_REGEX = re.compile(
 )
 """Regular expression for matching URLs."""
 
+YOUTUBE_ID_REGEX = re.compile(
+    r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|embed/|shorts/|live/)|youtu\.be/)([a-zA-Z0-9_-]{11})'
+)
+"""Regular expression capturing the 11-character video ID from a YouTube URL."""
+
 # Path to the cookies file. Update this with the actual path on your server.
 # Example: '/path/to/your/cookies.txt'
 # Set to None if you are not using a cookies file.
@@ -68,7 +73,8 @@ YTDLP_OPTIONS_PLAYBACK = {
     'no_warnings': True,
     'skip_download': True,
     'force_generic_extractor': False,
-    'ignoreerrors': True,
+    # Errors must raise so the player can tell unavailable tracks from transient failures.
+    'ignoreerrors': False,
     'noplaylist': True,
     'nocheckcertificate': True,
     'logtostderr': False,
@@ -94,8 +100,39 @@ YTDLP_OPTIONS_PLAYBACK = {
 }
 """Options dictionary for yt-dlp when extracting detailed audio/video information for playback."""
 
+YTDLP_OPTIONS_MEDIA = {
+    'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': False,
+    'force_generic_extractor': False,
+    'ignoreerrors': True,
+    'nocheckcertificate': True,
+    'logtostderr': False,
+    'no_color': True,
+    'retries': 10,
+    'fragment_retries': 10,
+    'skip_download': True
+}
+"""Options dictionary for yt-dlp when extracting video media from Twitter/X or YouTube links."""
+
 FFMPEG_OPTIONS_TEMPLATE = {
     'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5 -timeout 10000000 -nostdin -nostats -thread_queue_size 2048',
     'options': '-vn -b:a {bitrate}k -bufsize {bufsize}k -probesize 1M -analyzeduration 1M -ar {sampling_rate} -ac {audio_channels} -max_muxing_queue_size 2048'
 }
-"""Template for FFmpeg audio processing options. Bitrate will be formatted in.""" 
\ No newline at end of file
+"""Template for FFmpeg audio processing options. Bitrate will be formatted in."""
+
+FFMPEG_OPTIONS_PASSTHROUGH = {
+    'before_options': FFMPEG_OPTIONS_TEMPLATE['before_options'],
+    'options': '-vn'
+}
+"""FFmpeg options for Opus sources that are remuxed with codec copy instead of re-encoded."""
+
+FFMPEG_OPTIONS_LIGHT_TEMPLATE = {
+    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5 -timeout 10000000 -nostdin -nostats -thread_queue_size 512',
+    'options': '-vn -b:a {bitrate}k -bufsize {bufsize}k -probesize 1M -analyzeduration 1M -ar {sampling_rate} -ac {audio_channels} -compression_level 0 -max_muxing_queue_size 512'
+}
+"""Cheaper transcoding profile used while the host is under pressure: fastest libopus mode and smaller buffers."""
+
+OPUS_PASSTHROUGH_TOLERANCE = 0.25
+"""How far (as a fraction) an Opus source's bitrate may exceed the requested bitrate and still be copied as is.""" 
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""Pooled, long-lived yt-dlp extractors shared by the bot and the web server."""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+import yt_dlp
+from .constants import (
+    YTDLP_SEARCH_OPTIONS,
+    YTDLP_OPTIONS_PLAYLIST_INFO,
+    YTDLP_OPTIONS_PLAYBACK,
+    YTDLP_OPTIONS_MEDIA
+)
+from .metrics import EXTRACTION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_PROFILES = {
+    'search': YTDLP_SEARCH_OPTIONS,
+    'playlist_info': YTDLP_OPTIONS_PLAYLIST_INFO,
+    'playback': YTDLP_OPTIONS_PLAYBACK,
+    'media': YTDLP_OPTIONS_MEDIA,
+}
+"""yt-dlp option profiles, by name, that extractors can be checked out for."""
+
+EXTRACTOR_POOL_SIZE = 4
+"""Maximum number of live YoutubeDL instances per option profile."""
+
+
+@contextmanager
+def overridden_params(ydl: yt_dlp.YoutubeDL, params: Dict[str, Any]):
+    """Applies per-call yt-dlp options to a long-lived extractor and restores its own afterwards.
+
+    Keys the extractor didn't have are removed again rather than left as None, which yt-dlp
+    would read as an explicit value (e.g. `playliststart=None` breaks later playlist calls).
+    """
+    missing = object()
+    saved = {key: ydl.params.get(key, missing) for key in params}
+    ydl.params.update(params)
+    try:
+        yield ydl
+    finally:
+        for key, value in saved.items():
+            if value is missing:
+                ydl.params.pop(key, None)
+            else:
+                ydl.params[key] = value
+
+
+class ExtractorPool:
+    """Thread-safe pool of reusable YoutubeDL instances, one free list per option profile."""
+    def __init__(self, profiles: Dict[str, dict] = EXTRACTION_PROFILES, size: int = EXTRACTOR_POOL_SIZE):
+        """Initializes empty free lists; extractors are created lazily on first checkout."""
+        self.profiles = profiles
+        self.size = size
+        self._idle: Dict[str, queue.LifoQueue] = {name: queue.LifoQueue() for name in profiles}
+        self._created: Dict[str, int] = {name: 0 for name in profiles}
+        self._lock = threading.Lock()
+        self.stats = {
+            'checkouts': 0,
+            'hits': 0,
+            'created': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+        }
+
+    def _create(self, profile: str) -> yt_dlp.YoutubeDL:
+        """Builds a new extractor for a profile (copying its options so the constant stays untouched)."""
+        logger.debug(f"Creando extractor yt-dlp para el perfil '{profile}'")
+        return yt_dlp.YoutubeDL(dict(self.profiles[profile]))
+
+    def acquire(self, profile: str, timeout: Optional[float] = None) -> yt_dlp.YoutubeDL:
+        """Checks out an extractor, creating one if the profile is below its limit or waiting otherwise."""
+        if profile not in self._idle:
+            raise KeyError(f"Perfil de extracción desconocido: {profile}")
+
+        idle = self._idle[profile]
+        with self._lock:
+            self.stats['checkouts'] += 1
+            try:
+                ydl = idle.get_nowait()
+                self.stats['hits'] += 1
+                return ydl
+            except queue.Empty:
+                pass
+            if self._created[profile] < self.size:
+                self._created[profile] += 1
+                self.stats['created'] += 1
+                create = True
+            else:
+                self.stats['waits'] += 1
+                create = False
+
+        if create:
+            try:
+                return self._create(profile)
+            except Exception:
+                with self._lock:
+                    self._created[profile] -= 1
+                raise
+
+        started = time.perf_counter()
+        try:
+            return idle.get(timeout=timeout)
+        finally:
+            with self._lock:
+                self.stats['wait_time'] += time.perf_counter() - started
+
+    def release(self, profile: str, ydl: yt_dlp.YoutubeDL):
+        """Returns a checked-out extractor to its profile's free list."""
+        self._idle[profile].put(ydl)
+
+    @contextmanager
+    def checkout(self, profile: str, timeout: Optional[float] = None):
+        """Context manager that lends an extractor for the duration of the block."""
+        ydl = self.acquire(profile, timeout=timeout)
+        try:
+            yield ydl
+        finally:
+            self.release(profile, ydl)
+
+    def extract_info(self, url: str, profile: str, **params) -> Optional[Dict[str, Any]]:
+        """Runs a blocking `extract_info` (no download) with a pooled extractor.
+
+        Extra keyword arguments override the profile's yt-dlp options for this call only.
+        """
+        with self.checkout(profile) as ydl:
+            with overridden_params(ydl, params):
+                return ydl.extract_info(url, download=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns a snapshot of the pool counters, including per-profile instance counts."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['instances'] = dict(self._created)
+        stats['hit_rate'] = stats['hits'] / stats['checkouts'] if stats['checkouts'] else 0.0
+        return stats
+
+    def close(self):
+        """Closes every idle extractor, saving cookies and releasing network handles."""
+        for profile, idle in self._idle.items():
+            while True:
+                try:
+                    ydl = idle.get_nowait()
+                except queue.Empty:
+                    break
+                with self._lock:
+                    self._created[profile] -= 1
+                try:
+                    ydl.close()
+                except Exception as e:
+                    logger.error(f"Error cerrando extractor yt-dlp: {e}")
+
+
+extractor_pool = ExtractorPool()
+"""Process-wide extractor pool."""
+
+_backend = None
+
+
+def set_extraction_backend(backend: str = 'thread', workers: Optional[int] = None):
+    """Selects where async extractions run: 'thread' (pooled extractors) or 'process' (worker processes)."""
+    global _backend
+    shutdown_extraction_backend()
+    if backend == 'process':
+        from .process_extraction import ProcessExtractionBackend
+        _backend = ProcessExtractionBackend(EXTRACTION_PROFILES, workers)
+        _backend.warm_up()
+        logger.info(f"Extracción yt-dlp en {_backend.workers} procesos")
+    elif backend != 'thread':
+        raise ValueError(f"Backend de extracción desconocido: {backend}")
+
+
+def install_extraction_backend(backend):
+    """Routes async extractions to any object with `async extract_info(url, profile, **params)` and `shutdown()`.
+
+    Used by the offline benchmarks to plug in a fake extractor; `None` goes back to pooled threads.
+    """
+    global _backend
+    shutdown_extraction_backend()
+    _backend = backend
+
+
+def shutdown_extraction_backend():
+    """Stops the process (or installed) backend, if one is running, and falls back to threads."""
+    global _backend
+    if _backend is not None:
+        _backend.shutdown()
+        _backend = None
+
+
+async def extract_info(url: str, profile: str, **params) -> Optional[Dict[str, Any]]:
+    """Extracts info for a URL or search query off the event loop using the configured backend.
+
+    Extra keyword arguments override the profile's yt-dlp options for this call only.
+    """
+    with EXTRACTION_SECONDS.time(profile=profile):
+        if _backend is not None:
+            try:
+                return await _backend.extract_info(url, profile, **params)
+            except BrokenProcessPool:
+                logger.error("El pool de procesos de extracción falló, volviendo a hilos")
+                shutdown_extraction_backend()
+        return await asyncio.to_thread(extractor_pool.extract_info, url, profile, **params)
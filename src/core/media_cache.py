@@ -0,0 +1,269 @@
+"""Caches for relayed tweet/clip media: resolved URLs, content-addressed files and uploaded attachments."""
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+MEDIA_CACHE_DIR = 'media_cache'
+"""Directory holding cached media files, named by the SHA-256 of their content."""
+
+MEDIA_CACHE_INDEX = 'index.json'
+"""File in the cache directory mapping source keys and upload URLs to content hashes across restarts."""
+
+MEDIA_CACHE_BUDGET = 1024 * 1024 * 1024
+"""Total bytes of cached media kept on disk before the least recently used files are evicted."""
+
+RESOLUTION_CACHE_SIZE = 1024
+"""Maximum number of resolved tweets/clips remembered."""
+
+RESOLUTION_CACHE_TTL = 60 * 60
+"""Seconds a resolved media URL list is reused before resolving the tweet again."""
+
+ATTACHMENT_URL_TTL = 12 * 60 * 60
+"""Seconds an uploaded attachment URL is reused when it carries no `ex=` expiry."""
+
+ATTACHMENT_EXPIRY_MARGIN = 10 * 60
+"""Seconds before an attachment URL's expiry after which it is no longer reused."""
+
+HASH_CHUNK_SIZE = 1024 * 1024
+"""Bytes read per iteration while hashing and copying a download into the cache."""
+
+
+def get_attachment_expiry(url: str) -> Optional[float]:
+    """Reads the expiry timestamp from a Discord CDN URL's hexadecimal `ex=` parameter."""
+    values = parse_qs(urlparse(url).query).get('ex')
+    if not values:
+        return None
+    try:
+        return float(int(values[0], 16))
+    except ValueError:
+        return None
+
+
+class MediaCache:
+    """Thread-safe media caches keyed by a source key such as `tw:<tweet id>#0`.
+
+    Downloads are stored once per distinct content (by SHA-256) under a total size budget
+    with LRU eviction; source keys map onto those files, and the URL of the last upload of
+    each file is kept so later shares can link it instead of uploading again.
+    """
+    def __init__(self, directory: str = MEDIA_CACHE_DIR, budget: int = MEDIA_CACHE_BUDGET,
+                 resolution_size: int = RESOLUTION_CACHE_SIZE, resolution_ttl: float = RESOLUTION_CACHE_TTL):
+        """Initializes the caches and indexes files left in `directory` by a previous run."""
+        self.directory = directory
+        self.budget = budget
+        self.resolution_size = resolution_size
+        self.resolution_ttl = resolution_ttl
+        self._lock = threading.Lock()
+        self._resolutions: "OrderedDict[str, Tuple[float, List[Tuple[str, str]]]]" = OrderedDict()
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._keys: Dict[str, str] = {}
+        self._attachments: Dict[str, Tuple[float, str]] = {}
+        self._size = 0
+        self.stats = {'resolution_hits': 0, 'file_hits': 0, 'attachment_hits': 0, 'stored': 0, 'evicted': 0}
+        self._scan()
+
+    def _path(self, digest: str) -> str:
+        """Returns the file path for a content hash."""
+        return os.path.join(self.directory, f"{digest}.mp4")
+
+    def _scan(self):
+        """Loads existing cache files, oldest first, so eviction order survives restarts, plus the key index."""
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            digest, ext = os.path.splitext(name)
+            if ext != '.mp4':
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append((stat.st_mtime, digest, stat.st_size))
+        for _, digest, size in sorted(entries):
+            self._files[digest] = size
+            self._size += size
+        self._load_index()
+        self._evict()
+
+    def _load_index(self):
+        """Restores the key → file map (and still valid upload URLs) for the files found on disk."""
+        path = os.path.join(self.directory, MEDIA_CACHE_INDEX)
+        try:
+            with open(path, encoding='utf-8') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Índice de caché de medios ilegible, se ignora: {e}")
+            return
+        self._keys = {key: digest for key, digest in index.get('keys', {}).items() if digest in self._files}
+        now = time.time()
+        self._attachments = {
+            digest: (expires_at, url)
+            for digest, (expires_at, url) in index.get('attachments', {}).items()
+            if digest in self._files and expires_at - ATTACHMENT_EXPIRY_MARGIN > now
+        }
+
+    def _save_sync(self):
+        """Writes the index atomically, dropping keys whose files have been evicted."""
+        with self._lock:
+            self._keys = {key: digest for key, digest in self._keys.items() if digest in self._files}
+            index = {
+                'keys': dict(self._keys),
+                'attachments': {digest: list(entry) for digest, entry in self._attachments.items()},
+            }
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.json.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, os.path.join(self.directory, MEDIA_CACHE_INDEX))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    async def save(self):
+        """Persists the key index off the event loop."""
+        try:
+            await asyncio.to_thread(self._save_sync)
+        except OSError as e:
+            logger.error(f"Error guardando índice de caché de medios: {e}")
+
+    def get_resolution(self, key: str) -> Optional[List[Tuple[str, str]]]:
+        """Returns the cached `(media_type, url)` list for a source key, if still fresh."""
+        with self._lock:
+            entry = self._resolutions.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._resolutions[key]
+                return None
+            self._resolutions.move_to_end(key)
+            self.stats['resolution_hits'] += 1
+            return entry[1]
+
+    def put_resolution(self, key: str, media_urls: List[Tuple[str, str]]):
+        """Remembers a resolved media list; empty results are not cached."""
+        if not media_urls:
+            return
+        with self._lock:
+            self._resolutions[key] = (time.monotonic() + self.resolution_ttl, list(media_urls))
+            self._resolutions.move_to_end(key)
+            while len(self._resolutions) > self.resolution_size:
+                self._resolutions.popitem(last=False)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Returns the cached file path for a source key and marks it recently used."""
+        with self._lock:
+            digest = self._keys.get(key)
+            if digest is None or digest not in self._files:
+                return None
+            self._files.move_to_end(digest)
+            self.stats['file_hits'] += 1
+            return self._path(digest)
+
+    def attachment_url(self, key: str) -> Optional[str]:
+        """Returns a previously uploaded attachment URL for a source key while it is still valid."""
+        with self._lock:
+            digest = self._keys.get(key)
+            entry = self._attachments.get(digest) if digest else None
+            if entry is None:
+                return None
+            if entry[0] - ATTACHMENT_EXPIRY_MARGIN <= time.time():
+                del self._attachments[digest]
+                return None
+            self.stats['attachment_hits'] += 1
+            return entry[1]
+
+    def remember_attachment(self, key: str, url: str):
+        """Records the CDN URL of an upload of the file cached for a source key."""
+        expires_at = get_attachment_expiry(url) or time.time() + ATTACHMENT_URL_TTL
+        with self._lock:
+            digest = self._keys.get(key)
+            if digest is not None:
+                self._attachments[digest] = (expires_at, url)
+
+    def _store_sync(self, key: str, fileobj: io.IOBase) -> str:
+        """Hashes and copies a downloaded file into the cache, deduplicating identical content."""
+        os.makedirs(self.directory, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            with self._lock:
+                if digest in self._files:
+                    os.remove(tmp_path)
+                    self._files.move_to_end(digest)
+                else:
+                    os.replace(tmp_path, self._path(digest))
+                    self._files[digest] = size
+                    self._size += size
+                    self.stats['stored'] += 1
+                self._keys[key] = digest
+                self._evict(keep=digest)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        try:
+            self._save_sync()
+        except OSError as e:
+            logger.error(f"Error guardando índice de caché de medios: {e}")
+        return self._path(digest)
+
+    async def store(self, key: str, fileobj: io.IOBase) -> str:
+        """Stores a downloaded file (read from its current position) off the event loop; returns its path."""
+        return await asyncio.to_thread(self._store_sync, key, fileobj)
+
+    def _evict(self, keep: Optional[str] = None):
+        """Removes least recently used files until the cache fits its budget. Call with the lock held."""
+        while self._size > self.budget and self._files:
+            digest, size = next(iter(self._files.items()))
+            if digest == keep:
+                break
+            self._files.popitem(last=False)
+            self._size -= size
+            self._attachments.pop(digest, None)
+            self.stats['evicted'] += 1
+            try:
+                os.remove(self._path(digest))
+            except OSError as e:
+                logger.error(f"Error eliminando archivo de caché: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Returns hit counters plus the number of files and bytes on disk."""
+        with self._lock:
+            return dict(self.stats, files=len(self._files), bytes=self._size)
+
+
+_media_cache: Optional[MediaCache] = None
+_media_cache_lock = threading.Lock()
+
+
+def get_media_cache() -> MediaCache:
+    """Returns the process-wide media cache used by the tweet/clip relay, creating it on first use.
+
+    Created lazily so its relative directory resolves after main.py changes to the bot's directory.
+    """
+    global _media_cache
+    if _media_cache is None:
+        with _media_cache_lock:
+            if _media_cache is None:
+                _media_cache = MediaCache()
+    return _media_cache
@@ -0,0 +1,192 @@
+"""Async, size-capped media downloads that spool into memory before spilling to disk."""
+import asyncio
+import io
+import logging
+import tempfile
+import time
+from typing import Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+MEDIA_SPOOL_THRESHOLD = 8 * 1024 * 1024
+"""Bytes of a download kept in memory before it is moved to a temporary file."""
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+"""Bytes read from the response per iteration."""
+
+DISK_WRITE_BATCH = 1024 * 1024
+"""Bytes of a spilled download gathered in memory before each (threaded) write to its temporary file."""
+
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=120, sock_connect=10, sock_read=30)
+"""Timeouts applied to every media request."""
+
+DOWNLOAD_BANDWIDTH = 8 * 1024 * 1024
+"""Bytes per second shared by all media downloads, so a flood of links can't starve voice streams."""
+
+USER_AGENT = 'Mozilla/5.0 (compatible; GabiBot/1.0)'
+"""User-Agent sent with media and resolver requests."""
+
+
+class MediaDownloadError(Exception):
+    """Raised when a media URL can't be downloaded."""
+
+
+class MediaTooLarge(MediaDownloadError):
+    """Raised as soon as a download is known to exceed its byte budget."""
+    def __init__(self, size: int, limit: int):
+        """Stores the observed (or announced) size and the budget it exceeded."""
+        super().__init__(f"El archivo supera el límite ({size / 1024 / 1024:.1f} MB > {limit / 1024 / 1024:.1f} MB)")
+        self.size = size
+        self.limit = limit
+
+
+class _Spool:
+    """Write buffer that starts as BytesIO and moves to an anonymous temporary file past a threshold.
+
+    Disk work (creating the file, copying the memory buffer, writing) runs in a worker
+    thread, in batches of `DISK_WRITE_BATCH`, so large downloads don't block the event loop.
+    """
+    def __init__(self, threshold: int = MEDIA_SPOOL_THRESHOLD):
+        """Starts with an in-memory buffer."""
+        self.threshold = threshold
+        self.file = io.BytesIO()
+        self.spilled = False
+        self._pending = bytearray()
+
+    @staticmethod
+    def _spill(memory: io.BytesIO) -> io.IOBase:
+        """Copies the in-memory buffer into a new anonymous temporary file; runs in a worker thread."""
+        disk = tempfile.TemporaryFile()
+        disk.write(memory.getbuffer())
+        memory.close()
+        return disk
+
+    async def write(self, data: bytes):
+        """Appends data, spilling to disk the first time the threshold is crossed."""
+        if not self.spilled:
+            if self.file.tell() + len(data) <= self.threshold:
+                self.file.write(data)
+                return
+            self.file = await asyncio.to_thread(self._spill, self.file)
+            self.spilled = True
+        self._pending += data
+        if len(self._pending) >= DISK_WRITE_BATCH:
+            await self._write_pending()
+
+    async def _write_pending(self):
+        """Writes the gathered bytes to the temporary file off the event loop."""
+        data, self._pending = bytes(self._pending), bytearray()
+        await asyncio.to_thread(self.file.write, data)
+
+    async def finish(self) -> io.IOBase:
+        """Writes what is still gathered and rewinds; returns the file positioned at 0."""
+        if self.spilled:
+            if self._pending:
+                await self._write_pending()
+            await asyncio.to_thread(self.file.seek, 0)
+        else:
+            self.file.seek(0)
+        return self.file
+
+
+class _TokenBucket:
+    """Async token bucket limiting the combined byte rate of concurrent downloads."""
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """Allows `rate` bytes per second with bursts of up to `burst` bytes (one second's worth by default)."""
+        self.rate = rate
+        self.capacity = burst or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        # Created on first use: the shared downloader is built at import, before the bot's loop runs.
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def consume(self, amount: int):
+        """Waits until `amount` bytes may be transferred; callers are served in arrival order."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            if self._tokens < 0:
+                await asyncio.sleep(-self._tokens / self.rate)
+
+
+class MediaDownloader:
+    """Streams media over a shared aiohttp session, enforcing a byte budget while downloading."""
+    def __init__(self, spool_threshold: int = MEDIA_SPOOL_THRESHOLD, bandwidth: Optional[float] = DOWNLOAD_BANDWIDTH):
+        """Initializes the downloader; the HTTP session is created on first use inside the event loop.
+
+        `bandwidth` caps the combined bytes per second of all downloads (None disables the cap).
+        """
+        self.spool_threshold = spool_threshold
+        self._bucket = _TokenBucket(bandwidth) if bandwidth else None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared HTTP session, (re)created lazily."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=DOWNLOAD_TIMEOUT, headers={'User-Agent': USER_AGENT})
+        return self._session
+
+    async def fetch(self, url: str, max_bytes: int) -> io.IOBase:
+        """Downloads `url` into a seekable file object positioned at 0.
+
+        Checks `Content-Length` before reading and aborts the transfer as soon as more than
+        `max_bytes` arrive, raising `MediaTooLarge`. The caller owns (and must close) the result.
+        """
+        async with self.session.get(url) as response:
+            if response.status != 200:
+                raise MediaDownloadError(f"Error HTTP {response.status} descargando {url}")
+            if response.content_length is not None and response.content_length > max_bytes:
+                raise MediaTooLarge(response.content_length, max_bytes)
+
+            spool = _Spool(self.spool_threshold)
+            size = 0
+            try:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise MediaTooLarge(size, max_bytes)
+                    await spool.write(chunk)
+                    if self._bucket is not None:
+                        await self._bucket.consume(len(chunk))
+                result = await spool.finish()
+            except BaseException:
+                spool.file.close()
+                raise
+
+        logger.debug(f"Descargados {size / 1024 / 1024:.1f} MB ({'disco' if spool.spilled else 'memoria'})")
+        return result
+
+    async def content_length(self, url: str) -> Optional[int]:
+        """Returns the size announced by a HEAD request, or None if the server doesn't say."""
+        try:
+            async with self.session.head(url, allow_redirects=True) as response:
+                if response.status != 200:
+                    return None
+                return response.content_length
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.debug(f"HEAD falló para {url}: {e}")
+            return None
+
+    async def fetch_text(self, url: str) -> Optional[str]:
+        """Fetches a page as text, returning None on a non-200 response."""
+        async with self.session.get(url) as response:
+            if response.status != 200:
+                return None
+            return await response.text()
+
+    async def close(self):
+        """Closes the shared HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+media_downloader = MediaDownloader()
+"""Process-wide media downloader shared by the media relay commands."""
@@ -0,0 +1,278 @@
+"""Pluggable resolvers turning tweet/clip links into direct media URLs, raced with hedging."""
+import asyncio
+import logging
+import re
+import threading
+import time
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+from .extraction import extract_info
+from .media_download import media_downloader
+
+logger = logging.getLogger(__name__)
+
+MediaList = List[Tuple[str, str]]
+
+HEDGE_DELAY = 1.5
+"""Seconds to wait for the preferred resolver before starting the next one in parallel."""
+
+RESOLVER_TIMEOUT = 20.0
+"""Seconds after which a single resolver attempt is abandoned."""
+
+LATENCY_SMOOTHING = 0.2
+"""Weight of the newest sample in each resolver's moving-average latency."""
+
+DEFAULT_LATENCY = 1.0
+"""Latency (seconds) assumed for a resolver that hasn't succeeded yet."""
+
+TWDOWN_URL = "https://twdown.net/download.php?type=videos&url=https://twitter.com/i/status/{tweet_id}"
+"""twdown.net page listing the MP4 renditions of a tweet."""
+
+TWDOWN_VIDEO_REGEX = re.compile(r'href=[\'"]?([^\'" >]+\.mp4)[\'"]?')
+"""Matches direct MP4 links in the twdown page."""
+
+RESOLUTION_REGEX = re.compile(r'/(\d{2,4})x(\d{2,4})/')
+"""Width and height embedded in Twitter video URLs, e.g. `/vid/1280x720/`."""
+
+TBR_ESTIMATE_HEADROOM = 1.1
+"""Factor applied to bitrate-based size estimates, which tend to run low."""
+
+
+def estimate_size(fmt: Dict[str, Any], duration: Optional[float]) -> Optional[float]:
+    """Best guess of a format's size in bytes from `filesize`, `filesize_approx` or `tbr` × duration."""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return float(size)
+    if fmt.get('tbr') and duration:
+        return fmt['tbr'] * 1000 / 8 * duration * TBR_ESTIMATE_HEADROOM
+    return None
+
+
+def _quality(fmt: Dict[str, Any]) -> Tuple[int, float]:
+    """Sort key preferring resolution, then bitrate."""
+    return (fmt.get('width') or 0) * (fmt.get('height') or 0), fmt.get('tbr') or 0
+
+
+def select_format(formats: List[Dict[str, Any]], duration: Optional[float] = None,
+                  max_bytes: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Picks the best directly downloadable MP4 video format that should fit in `max_bytes`.
+
+    Formats with audio are preferred over video-only ones. Among those whose estimated size
+    fits, the highest resolution wins; if no estimate is available the size is left to the
+    download check, and if nothing fits the smallest format is returned as the best chance.
+    """
+    candidates = [
+        f for f in formats
+        if f.get('ext') == 'mp4' and f.get('vcodec') != 'none' and f.get('url')
+        and f.get('protocol', 'https') in ('http', 'https')
+    ]
+    with_audio = [f for f in candidates if f.get('acodec') != 'none']
+    candidates = with_audio or candidates
+    if not candidates:
+        return None
+    if max_bytes is None:
+        return max(candidates, key=_quality)
+
+    sizes = [(f, estimate_size(f, duration)) for f in candidates]
+    fitting = [f for f, size in sizes if size is not None and size <= max_bytes]
+    if fitting:
+        return max(fitting, key=_quality)
+    unknown = [f for f, size in sizes if size is None]
+    if unknown:
+        return max(unknown, key=_quality)
+    return min(sizes, key=lambda item: item[1])[0]
+
+
+class MediaResolver:
+    """Base class for a strategy that resolves a link to `[(media_type, url), ...]`."""
+    name = 'base'
+
+    def supports(self, url: str) -> bool:
+        """Returns True if this resolver can handle the link."""
+        return True
+
+    async def resolve(self, url: str, max_bytes: Optional[int] = None) -> MediaList:
+        """Returns the media found for a link (empty if none), preferring files under `max_bytes`; may raise."""
+        raise NotImplementedError
+
+
+class TwdownResolver(MediaResolver):
+    """Scrapes the twdown.net download page of a tweet for MP4 links."""
+    name = 'twdown'
+
+    def supports(self, url: str) -> bool:
+        """Only tweets have a twdown page."""
+        return ('twitter.com' in url or 'x.com' in url) and '/status/' in url
+
+    async def resolve(self, url: str, max_bytes: Optional[int] = None) -> MediaList:
+        """Fetches the twdown page and returns its best MP4 link that fits in `max_bytes`."""
+        tweet_id = url.split('/status/')[1].split('/')[0].split('?')[0]
+        api_url = TWDOWN_URL.format(tweet_id=tweet_id)
+        logger.debug(f"Usando TW-Down API: {api_url}")
+        html_content = await media_downloader.fetch_text(api_url)
+        if not html_content:
+            return []
+        video_matches = list(dict.fromkeys(TWDOWN_VIDEO_REGEX.findall(html_content)))
+        if not video_matches:
+            return []
+
+        def area(video_url: str) -> int:
+            """Pixel count parsed from the URL, or 0 if it has none."""
+            match = RESOLUTION_REGEX.search(video_url)
+            return int(match.group(1)) * int(match.group(2)) if match else 0
+
+        # Without a resolution in the URL, keep the page order (twdown lists the best first).
+        video_matches.sort(key=area, reverse=True)
+        best_url = video_matches[0]
+        if max_bytes is not None and len(video_matches) > 1:
+            sizes = await asyncio.gather(*(media_downloader.content_length(u) for u in video_matches))
+            fitting = [u for u, size in zip(video_matches, sizes) if size is None or size <= max_bytes]
+            best_url = fitting[0] if fitting else video_matches[-1]
+        logger.debug(f"URL de video encontrado: {best_url}")
+        return [('video', best_url)]
+
+
+class YtdlpResolver(MediaResolver):
+    """Extracts the best MP4 rendition with yt-dlp (works for tweets and YouTube)."""
+    name = 'ytdlp'
+
+    async def resolve(self, url: str, max_bytes: Optional[int] = None) -> MediaList:
+        """Runs a 'media' extraction and picks the best MP4 format expected to fit in `max_bytes`."""
+        info = await extract_info(url, 'media')
+        if not info:
+            logger.debug("No se encontró información para el URL proporcionado.")
+            return []
+
+        logger.debug(f"Información extraída: {info.get('title', 'Sin título')}")
+        best_format = select_format(info.get('formats') or [], info.get('duration'), max_bytes)
+        if best_format:
+            size = estimate_size(best_format, info.get('duration'))
+            logger.debug(f"Mejor formato encontrado: {best_format.get('format_id')}, "
+                         f"resolución: {best_format.get('width')}x{best_format.get('height')}, "
+                         f"tamaño estimado: {f'{size / 1024 / 1024:.1f} MB' if size else 'desconocido'}")
+            return [('video', best_format['url'])]
+
+        if info.get('url'):
+            logger.debug("Usando URL directo del video")
+            return [('video', info['url'])]
+        return []
+
+
+class ResolverStats:
+    """Attempt/success counters and a moving-average latency for one resolver."""
+    def __init__(self):
+        """Initializes empty counters."""
+        self.attempts = 0
+        self.successes = 0
+        self.cancelled = 0
+        self.latency: Optional[float] = None
+
+    @property
+    def success_rate(self) -> float:
+        """Smoothed success rate, so new resolvers start at 50% rather than 0 or 100%."""
+        return (self.successes + 1) / (self.attempts + 2)
+
+    @property
+    def expected_time(self) -> float:
+        """Expected seconds to a successful result; lower is preferred."""
+        return (self.latency if self.latency is not None else DEFAULT_LATENCY) / self.success_rate
+
+    def record(self, elapsed: float, success: bool):
+        """Records a finished attempt."""
+        self.attempts += 1
+        if success:
+            self.successes += 1
+            self.latency = elapsed if self.latency is None else (
+                LATENCY_SMOOTHING * elapsed + (1 - LATENCY_SMOOTHING) * self.latency
+            )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the stats as a JSON-friendly dict."""
+        return {
+            'attempts': self.attempts,
+            'successes': self.successes,
+            'cancelled': self.cancelled,
+            'success_rate': round(self.success_rate, 3),
+            'latency': round(self.latency, 3) if self.latency is not None else None,
+        }
+
+
+class HedgedResolver:
+    """Runs resolvers best-first, starting the next one if the current is slow or fails.
+
+    The first non-empty result wins and the other attempts are cancelled. Resolvers are
+    ranked by expected time to success, so the faster, more reliable one goes first.
+    """
+    def __init__(self, resolvers: Sequence[MediaResolver], hedge_delay: float = HEDGE_DELAY,
+                 timeout: float = RESOLVER_TIMEOUT):
+        """Initializes the chain; a `hedge_delay` of 0 races every resolver at once."""
+        self.resolvers = list(resolvers)
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.stats: Dict[str, ResolverStats] = {resolver.name: ResolverStats() for resolver in self.resolvers}
+        self._lock = threading.Lock()
+
+    def ranked(self, url: str) -> List[MediaResolver]:
+        """Returns the resolvers that support a link, preferred first (ties keep configured order)."""
+        with self._lock:
+            return sorted(
+                (resolver for resolver in self.resolvers if resolver.supports(url)),
+                key=lambda resolver: self.stats[resolver.name].expected_time
+            )
+
+    async def _attempt(self, resolver: MediaResolver, url: str, max_bytes: Optional[int]) -> MediaList:
+        """Runs one resolver with a timeout, recording its outcome; failures return []."""
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(resolver.resolve(url, max_bytes), timeout=self.timeout)
+        except asyncio.CancelledError:
+            # Losing the race counts against a resolver, so the winner gets preferred.
+            with self._lock:
+                self.stats[resolver.name].cancelled += 1
+                self.stats[resolver.name].attempts += 1
+            raise
+        except Exception as e:
+            logger.debug(f"Resolver {resolver.name} falló: {e}")
+            result = []
+        with self._lock:
+            self.stats[resolver.name].record(time.perf_counter() - started, bool(result))
+        return result
+
+    async def resolve(self, url: str, max_bytes: Optional[int] = None) -> MediaList:
+        """Returns the first non-empty media list produced by the resolver chain, sized for `max_bytes`."""
+        candidates = self.ranked(url)
+        loop = asyncio.get_running_loop()
+        pending = set()
+        names = {}
+        try:
+            for index, resolver in enumerate(candidates):
+                task = loop.create_task(self._attempt(resolver, url, max_bytes))
+                names[task] = resolver.name
+                pending.add(task)
+                last = index == len(candidates) - 1
+                deadline = loop.time() + self.hedge_delay
+                while pending:
+                    timeout = None if last else max(deadline - loop.time(), 0)
+                    done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.result():
+                            logger.debug(f"Medios resueltos con {names[task]}")
+                            return task.result()
+                    if not done:
+                        break  # The hedge delay passed: start the next resolver alongside.
+            return []
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns per-resolver stats, in current preference order."""
+        with self._lock:
+            return {
+                name: stats.to_dict()
+                for name, stats in sorted(self.stats.items(), key=lambda item: item[1].expected_time)
+            }
+
+
+media_resolver = HedgedResolver([TwdownResolver(), YtdlpResolver()])
+"""Process-wide resolver chain used by the tweet/clip relay."""
@@ -0,0 +1,250 @@
+"""In-process counters, gauges and histograms exposed in Prometheus text format."""
+import bisect
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple, Sequence, List
+
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = 'gabi_'
+"""Prefix added to every exported metric name."""
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+"""Histogram upper bounds, in seconds, used when a metric doesn't define its own."""
+
+
+def _format_value(value: float) -> str:
+    """Formats a sample value the way the Prometheus text format expects."""
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    """Escapes backslashes, quotes and newlines in a label value."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """Renders a `{name="value",...}` label set, escaping values."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """Base class holding the name, help text, label names and lock shared by every metric type."""
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        """Initializes an empty metric."""
+        self.name = METRICS_PREFIX + name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """Orders label values by the metric's label names."""
+        if set(labels) != set(self.labels):
+            raise ValueError(f"Etiquetas inválidas para {self.name}: {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _samples(self) -> List[str]:
+        """Returns the exposition lines for the current values."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Returns the metric in Prometheus text format, including HELP and TYPE lines."""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels."""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        """Initializes the counter; an unlabelled counter starts at zero so it is always exported."""
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labels else {(): 0.0}
+
+    def inc(self, amount: float = 1.0, **labels):
+        """Adds `amount` to the counter for the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        """Returns the current value for the given label values."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        """Returns one line per label set."""
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}' for key, value in values]
+
+
+class Gauge(Counter):
+    """Value that can go up and down, optionally split by labels."""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        """Sets the gauge for the given label values."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels):
+        """Subtracts `amount` from the gauge for the given label values."""
+        self.inc(-amount, **labels)
+
+    def replace(self, values: Dict[Tuple[str, ...], float]):
+        """Replaces every labelled value at once, dropping label sets that are gone."""
+        with self._lock:
+            self._values = dict(values)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (usually seconds) over fixed cumulative buckets."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Initializes the histogram with sorted bucket upper bounds plus +Inf."""
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        """Records one observation for the given label values."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then the running sum.
+                series = self._series[key] = [0] * len(self.buckets) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Context manager that observes the wall-clock duration of the block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        """Returns cumulative bucket, sum and count lines per label set."""
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        lines = []
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(values[-1])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Ordered collection of metrics rendered together by the `/metrics` endpoint."""
+    def __init__(self):
+        """Initializes an empty registry."""
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Adds a metric; names must be unique."""
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Returns every metric in Prometheus text format."""
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+registry = MetricsRegistry()
+"""Process-wide metrics registry."""
+
+EXTRACTION_SECONDS = registry.register(Histogram(
+    'ytdlp_extraction_seconds', 'Time spent in yt-dlp extract_info, by option profile.', ['profile']
+))
+PROBE_SECONDS = registry.register(Histogram(
+    'ffmpeg_probe_seconds', 'Time spent probing a stream for FFmpegOpusAudio (codec and bitrate detection).'
+))
+TIME_TO_FIRST_AUDIO_SECONDS = registry.register(Histogram(
+    'time_to_first_audio_seconds', 'Time from a track leaving the queue until its first audio packet is read.'
+))
+SEARCH_SECONDS = registry.register(Histogram(
+    'handle_search_seconds', 'Time from a search command until the results are shown.'
+))
+QUEUE_DEPTH = registry.register(Gauge(
+    'queue_depth', 'Songs waiting in the queue, by guild.', ['guild']
+))
+VOICE_CLIENTS = registry.register(Gauge(
+    'voice_clients', 'Connected voice clients.'
+))
+FFMPEG_PROCESSES = registry.register(Gauge(
+    'ffmpeg_processes', 'Live ffmpeg processes feeding voice clients.'
+))
+AUDIO_STREAMS = registry.register(Counter(
+    'audio_streams_total', 'Audio sources started, by mode (copy = Opus passthrough, transcode, probe, local = audio cache).', ['mode']
+))
+TRANSCODE_SLOTS = registry.register(Gauge(
+    'transcode_slots_in_use', 'Transcoding ffmpeg processes holding a scheduler slot.'
+))
+TRANSCODE_WAITING = registry.register(Gauge(
+    'transcode_waiting', 'Streams queued for a transcoding slot.'
+))
+TRANSCODE_PRESSURE = registry.register(Gauge(
+    'transcode_pressure', 'Higher of transcoding slot usage and host CPU utilisation (1 = saturated).'
+))
+TRANSCODE_ADMISSIONS = registry.register(Counter(
+    'transcode_admissions_total', 'Transcodes admitted by the scheduler, by outcome (ok, degraded, queued, overcommitted).', ['outcome']
+))
+FFMPEG_CPU_CORES = registry.register(Gauge(
+    'ffmpeg_cpu_cores', 'CPU used by live ffmpeg processes, in cores.'
+))
+FFMPEG_RSS_BYTES = registry.register(Gauge(
+    'ffmpeg_rss_bytes', 'Resident memory of live ffmpeg processes.'
+))
+PLAY_NEXT_FAILURES = registry.register(Counter(
+    'play_next_failures_total', 'Tracks that failed to start in play_next, by kind (permanent, transient).', ['kind']
+))
+PLAY_NEXT_RETRIES = registry.register(Counter(
+    'play_next_retries_total', 'Times play_next moved on to the same or the next track after a failure.'
+))
+PLAY_NEXT_SKIPPED = registry.register(Counter(
+    'play_next_skipped_total', 'Times play_next jumped ahead of queued tracks whose source circuit was open.'
+))
+SOURCE_CIRCUIT_STATE = registry.register(Gauge(
+    'source_circuit_state', 'Circuit breaker state per upstream source (0 = closed, 1 = half-open, 2 = open).', ['source']
+))
+
+
+def update_bot_gauges(bot):
+    """Refreshes the gauges that are read from the bot's state rather than updated in place."""
+    QUEUE_DEPTH.replace({(str(guild_id),): len(player.queue) for guild_id, player in list(bot.players.items())})
+    VOICE_CLIENTS.set(sum(1 for vc in bot.voice_clients if vc.is_connected()))
+
+
+def render_metrics(bot=None) -> str:
+    """Renders the registry, refreshing bot-derived gauges first when a bot is given."""
+    if bot is not None:
+        update_bot_gauges(bot)
+    return registry.render()
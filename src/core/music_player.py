@@ -1,127 +1,477 @@
 import asyncio
 import logging
+import math
 import time
-from typing import Dict, Any, Optional
-from collections import deque
-import yt_dlp
+from typing import Dict, Any, Iterable, Optional
 import discord
-from .constants import YTDLP_OPTIONS_PLAYBACK, FFMPEG_OPTIONS_TEMPLATE
+from .audio_cache import get_audio_cache
+from .constants import (
+    FFMPEG_OPTIONS_TEMPLATE,
+    FFMPEG_OPTIONS_LIGHT_TEMPLATE,
+    FFMPEG_OPTIONS_PASSTHROUGH,
+    OPUS_PASSTHROUGH_TOLERANCE
+)
+from .extraction import extract_info
+from .metrics import (
+    AUDIO_STREAMS,
+    PROBE_SECONDS,
+    TIME_TO_FIRST_AUDIO_SECONDS,
+    FFMPEG_PROCESSES,
+    PLAY_NEXT_FAILURES,
+    PLAY_NEXT_RETRIES,
+    PLAY_NEXT_SKIPPED
+)
+from .retry import (
+    TRANSIENT,
+    MAX_CONSECUTIVE_FAILURES,
+    MAX_TRACK_ATTEMPTS,
+    backoff_delay,
+    classify_error,
+    source_breakers,
+    source_of
+)
+from .stream_cache import stream_cache
+from .track import Track
+from .track_queue import TrackQueue, QueueFull, QUEUE_LOW_WATER, QUEUE_MAX_SIZE
+from .transcode_scheduler import transcode_scheduler
 
 logger = logging.getLogger(__name__)
 
+class TrackedOpusAudio(discord.FFmpegOpusAudio):
+    """FFmpegOpusAudio that counts its live ffmpeg process and reports when its first packet is read."""
+    def __init__(self, source, *, on_first_packet=None, admission=None, **kwargs):
+        """Spawns ffmpeg like FFmpegOpusAudio; `on_first_packet` is called once from the player thread.
+
+        `admission` is the transcode scheduler slot held by this process, released on cleanup.
+        """
+        try:
+            super().__init__(source, **kwargs)
+        except Exception:
+            if admission is not None:
+                admission.release()
+            raise
+        FFMPEG_PROCESSES.inc()
+        self._alive = True
+        self._on_first_packet = on_first_packet
+        self._admission = admission
+        if admission is not None:
+            admission.attach(self._process.pid)
+
+    def read(self) -> bytes:
+        """Reads the next Opus packet, firing the first-packet callback once."""
+        data = super().read()
+        if data and self._on_first_packet is not None:
+            callback, self._on_first_packet = self._on_first_packet, None
+            callback()
+        return data
+
+    def cleanup(self):
+        """Kills the ffmpeg process and updates the live process gauge."""
+        super().cleanup()
+        if self._alive:
+            self._alive = False
+            FFMPEG_PROCESSES.dec()
+            if self._admission is not None:
+                self._admission.release()
+
 class MusicPlayer:
     """Manages the music queue and playback for a single guild."""
     def __init__(self, bot):
         """Initializes the player state, queue, and event loop."""
         self.bot = bot
-        self.queue = deque(maxlen=1000)  
-        self.current: Optional[Dict[str, Any]] = None
+        self.queue = TrackQueue(maxlen=getattr(bot, 'queue_limit', QUEUE_MAX_SIZE))
+        self.current: Optional[Track] = None
         self.is_playing = False
         self.is_paused = False
         self.start_time = None
         self.pause_time = None
         self._loop = asyncio.get_event_loop()
+        self._prefetch_song: Optional[Track] = None
+        self._prefetch_task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self._retry_handle: Optional[asyncio.TimerHandle] = None
+
+    async def start_playback(self, ctx):
+        """Starts playing the queue unless playback is already running; safe to call concurrently."""
+        async with self._start_lock:
+            if self.is_playing:
+                self.prefetch_next()
+                return
+            await self.play_next(ctx)
+
+    async def enqueue_many(self, ctx, songs: Iterable[Track]) -> int:
+        """Queues stored track records in one step without re-extracting them, then starts playback once.
+
+        Streams are resolved lazily when each track is about to play. Returns the number of songs
+        queued, which is less than given when the queue fills up.
+        """
+        added = self.queue.extend(song for song in songs if song.key)
+        if added:
+            await self.start_playback(ctx)
+        return added
 
     async def play_next(self, ctx):
-        """Plays the next song in the queue."""
-        if not self.queue or not ctx.voice_client or not ctx.voice_client.is_connected():
-            self.is_playing = False
-            self.current = None
-            return
+        """Plays the next song in the queue, working through failures iteratively.
 
-        try:
-            logger.debug("\n🎵 Intentando reproducir siguiente canción...")
-            self.is_playing = True
-            next_song = self.queue.popleft()
-            self.current = next_song
-            self.start_time = time.time()
-            self.pause_time = None
-
-            url = next_song.get('webpage_url')
-            if not url:
-                logger.error("❌ URL no encontrada en la información de la canción")
-                raise ValueError("URL no encontrada en la información de la canción")
-                
-            logger.debug(f"🔗 URL a procesar: {url}")
-            
-            # Get current audio settings from bot config
-            current_bitrate = self.bot.audio_bitrate
-            current_sampling_rate = self.bot.audio_sampling_rate
-            current_audio_channels = self.bot.audio_channels
-
-            # Prepare YTDLP options (deep copy to avoid modifying global constant)
-            current_ytdlp_options = YTDLP_OPTIONS_PLAYBACK.copy()
-            # Opus is generally VBR, so preferredquality='0' is often best.
-            # If a specific bitrate is desired with Opus, it's typically handled by FFmpeg.
-            # Forcing it here might conflict or be ignored depending on yt-dlp version and Opus.
-            # We will let FFmpeg handle the bitrate precisely.
-
-            logger.debug("⚙️ Extrayendo información con yt-dlp...")
-            with yt_dlp.YoutubeDL(current_ytdlp_options) as ydl:
-                info = await asyncio.to_thread(ydl.extract_info, url, download=False)
-                if not info:
-                    raise ValueError("No se pudo extraer la información del video")
-                
-                formats = info.get('formats', [])
-                logger.debug(f"📋 Encontrados {len(formats)} formatos disponibles")
-                
-                audio_formats = [f for f in formats if f.get('acodec') != 'none']
-                if not audio_formats:
-                    raise ValueError("No se encontraron formatos de audio")
-                
-                best_audio = max(audio_formats, key=lambda f: f.get('abr', 0) if f.get('abr') else 0)
-                stream_url = best_audio.get('url')
-                
-                if not stream_url:
-                    raise ValueError("No se encontró URL de stream")
-                
-                logger.debug(f"✅ Formato seleccionado: {best_audio.get('format_id')} - {best_audio.get('acodec')} - {best_audio.get('abr')}kbps")
+        A permanent error (unavailable, private, region-locked...) skips the track at once; a
+        transient one retries it after an exponential backoff with jitter before skipping it.
+        Tracks whose source circuit is open are jumped over, and when nothing in the queue is
+        playable a retry is scheduled for when the circuit lets a trial through. Gives up
+        after `MAX_CONSECUTIVE_FAILURES` failures in a row.
+        """
+        self._cancel_deferred_retry()
+        failures = 0
+        attempts: Dict[str, int] = {}
+        while True:
+            if self.queue.pending:
+                await self.queue.ensure_loaded(1)
+            if not self.queue or not ctx.voice_client or not ctx.voice_client.is_connected():
+                self.is_playing = False
+                self.current = None
+                return
+
+            index = self._next_playable_index()
+            if index is None:
+                if self.queue.loaded:
+                    await self._defer_retry(ctx)
+                else:
+                    self.is_playing = False
+                    self.current = None
+                return
+            if index:
+                PLAY_NEXT_SKIPPED.inc()
+                logger.debug(f"⏭️ Saltando {index} canciones con la fuente caída")
+            next_song = self.queue.pop(index) if index else self.queue.popleft()
+            url = next_song.webpage_url
+
+            try:
+                if await self._start_song(ctx, next_song):
+                    source_breakers.record_success(url)
+                return
+            except Exception as e:
+                kind = classify_error(e)
+                failures += 1
+                logger.error(f"❌ Error en play_next ({kind}): {str(e)}")
+                PLAY_NEXT_FAILURES.inc(kind=kind)
+                if url:
+                    # A cached stream URL may have been revoked early; force a fresh extraction next time.
+                    stream_cache.invalidate(url)
+                self.is_playing = False
+                self.current = None
+                first_attempt = url not in attempts
+                attempts[url] = attempts.get(url, 0) + 1
+                # A track counts against its source once, however many times it is retried.
+                if kind == TRANSIENT and first_attempt:
+                    source_breakers.record_failure(url)
+                if failures >= MAX_CONSECUTIVE_FAILURES:
+                    await ctx.send("❌ Demasiados errores seguidos, se detiene la reproducción")
+                    return
+
+                if kind == TRANSIENT and url and attempts[url] < MAX_TRACK_ATTEMPTS:
+                    # The song's own slot was just freed, so this only fails if the queue filled meanwhile.
+                    try:
+                        self.queue.appendleft(next_song)
+                    except QueueFull:
+                        await ctx.send(f"⚠️ No se pudo reproducir: {next_song.title}, saltando")
+                else:
+                    await ctx.send(f"⚠️ No se pudo reproducir: {next_song.title}, saltando")
+                if kind == TRANSIENT:
+                    await asyncio.sleep(backoff_delay(failures))
+                PLAY_NEXT_RETRIES.inc()
+
+    def _next_playable_index(self) -> Optional[int]:
+        """Returns the position of the first loaded song that is cached or whose source circuit allows a try, or None."""
+        audio_cache = get_audio_cache()
+        for index, song in enumerate(self.queue):
+            url = song.webpage_url
+            if (audio_cache is not None and url and url in audio_cache) or source_breakers.allow(url):
+                return index
+        return None
+
+    async def _defer_retry(self, ctx):
+        """Stops for now and schedules `start_playback` for when the head's source circuit half-opens."""
+        self.is_playing = False
+        self.current = None
+        url = self.queue[0].webpage_url
+        delay = max(source_breakers.retry_in(url), 1.0)
+        await ctx.send(f"⏳ {source_of(url)} no responde, reintentando en {delay:.0f}s")
+
+        def retry():
+            """Restarts playback from the event loop."""
+            self._retry_handle = None
+            self._loop.create_task(self.start_playback(ctx))
+
+        self._retry_handle = self._loop.call_later(delay, retry)
+
+    def _cancel_deferred_retry(self):
+        """Cancels a scheduled retry, e.g. because playback was restarted by a command."""
+        if self._retry_handle is not None:
+            self._retry_handle.cancel()
+            self._retry_handle = None
+
+    async def _start_song(self, ctx, next_song: Track) -> bool:
+        """Prepares a song's audio source and starts playing it; raises if it can't be started.
+
+        Returns True if the song was streamed from its source rather than the audio cache.
+        """
+        logger.debug("\n🎵 Intentando reproducir siguiente canción...")
+        self.is_playing = True
+        track_started = time.perf_counter()
+        self.current = next_song
+        self.start_time = time.time()
+        self.pause_time = None
+
+        url = next_song.webpage_url
+        if not url:
+            logger.error("❌ URL no encontrada en la información de la canción")
+            raise ValueError("URL no encontrada en la información de la canción")
             
+        logger.debug(f"🔗 URL a procesar: {url}")
+        
+        # Get current audio settings from bot config
+        current_bitrate = self.bot.audio_bitrate
+        current_sampling_rate = self.bot.audio_sampling_rate
+        current_audio_channels = self.bot.audio_channels
+
+        prepared = await self._take_prepared(next_song)
+        if prepared:
+            logger.debug("⚡ Usando fuente preparada de antemano")
+        else:
+            prepared = await self._prepare_song(next_song)
+
+        def on_first_packet():
+            """Records the time from dequeuing the song to its first audio packet."""
+            TIME_TO_FIRST_AUDIO_SECONDS.observe(time.perf_counter() - track_started)
+
+        audio_cache = get_audio_cache()
+        source = None
+        if prepared['codec'] == 'local':
+            source = audio_cache.open(url, on_first_packet=on_first_packet) if audio_cache else None
+            if source is None:
+                # Evicted (or the cache was disabled) since the song was prepared.
+                prepared = await self._prepare_song(next_song, use_cache=False)
+            else:
+                logger.debug("💾 Reproduciendo desde la caché de audio")
+                AUDIO_STREAMS.inc(mode='local')
+        
+        if source is None:
             logger.debug("🎧 Creando fuente de audio...")
-            try:
-                # Format FFMPEG options with the current settings
+            if (prepared['codec'] != 'copy' and self._can_passthrough(prepared['stream'], any_bitrate=True)
+                    and transcode_scheduler.under_pressure()):
+                # Host is busy: copying an Opus source beats re-encoding it to trim its bitrate.
+                logger.debug("🪶 Host bajo presión, copiando Opus sin recodificar")
+                prepared = dict(prepared, codec='copy')
+            admission = await transcode_scheduler.admit('copy' if prepared['codec'] == 'copy' else 'transcode')
+            if prepared['codec'] == 'copy':
+                # Already Opus at the requested profile: remux only, no decode/re-encode.
+                current_ffmpeg_options = FFMPEG_OPTIONS_PASSTHROUGH
+            else:
+                # Format FFMPEG options with the current settings; cheaper ones under pressure.
+                template = FFMPEG_OPTIONS_LIGHT_TEMPLATE if admission.degraded else FFMPEG_OPTIONS_TEMPLATE
                 bufsize = current_bitrate * 2 
                 current_ffmpeg_options = {
-                    'before_options': FFMPEG_OPTIONS_TEMPLATE['before_options'],
-                    'options': FFMPEG_OPTIONS_TEMPLATE['options'].format(
+                    'before_options': template['before_options'],
+                    'options': template['options'].format(
                         bitrate=current_bitrate, 
                         bufsize=bufsize,
                         sampling_rate=current_sampling_rate,
                         audio_channels=current_audio_channels
                     )
                 }
-
-                source_task = asyncio.create_task(
-                    discord.FFmpegOpusAudio.from_probe(
-                        stream_url,
-                        **current_ffmpeg_options, # Use formatted options
-                        method='fallback'
-                    )
-                )
-                source = await asyncio.wait_for(source_task, timeout=30.0)
-            except asyncio.TimeoutError:
-                logger.warning("⚠️ Timeout creando fuente de audio, reintentando...")
-                raise ValueError("Timeout creando fuente de audio")
-            
-            def after_playing(error):
-                if error:
-                    logger.error(f"❌ Error después de reproducir: {error}")
-                asyncio.run_coroutine_threadsafe(
-                    self.handle_song_complete(ctx), 
-                    self._loop
-                )
-            
-            logger.debug("▶️ Iniciando reproducción...")
+            source = TrackedOpusAudio(
+                prepared['stream']['url'],
+                codec=prepared['codec'],
+                bitrate=prepared['bitrate'],
+                on_first_packet=on_first_packet,
+                admission=admission,
+                **current_ffmpeg_options # Use formatted options
+            )
+        
+        def after_playing(error):
+            if error:
+                logger.error(f"❌ Error después de reproducir: {error}")
+            asyncio.run_coroutine_threadsafe(
+                self.handle_song_complete(ctx), 
+                self._loop
+            )
+        
+        logger.debug("▶️ Iniciando reproducción...")
+        try:
             ctx.voice_client.play(source, after=after_playing)
-            await ctx.send(f"🎵 Reproduciendo: {self.current['title']}")
-            logger.info(f"✅ Reproducción iniciada: {self.current['title']}")
-            
+        except Exception:
+            source.cleanup()  # Ends the spawned ffmpeg and frees its transcoding slot.
+            raise
+
+        # The song is playing from here on: failures below must not count against it or its source.
+        try:
+            await self._on_started(ctx, url, prepared)
         except Exception as e:
-            logger.error(f"❌ Error en play_next: {str(e)}")
-            self.is_playing = False
-            self.current = None
-            await asyncio.sleep(2)
-            await self.play_next(ctx)
+            logger.error(f"❌ Error tras iniciar la reproducción de {next_song.title}: {e}")
+        return prepared['codec'] != 'local'
+
+    async def _on_started(self, ctx, url: str, prepared: Dict[str, Any]):
+        """Bookkeeping once a song is playing: audio cache stats, queue refill, prefetch and the announcement."""
+        audio_cache = get_audio_cache()
+        if audio_cache is not None:
+            audio_cache.record_play(url, prepared['stream'])
+        logger.info(f"✅ Reproducción iniciada: {self.current.title}")
+        if self.queue.pending:
+            self._loop.create_task(self._refill_queue())
+        self.prefetch_next()
+        await ctx.send(f"🎵 Reproduciendo: {self.current.title}")
+
+    def _can_passthrough(self, stream: Dict[str, Any], any_bitrate: bool = False) -> bool:
+        """True if a stream is already Opus 48 kHz stereo at (about) the requested bitrate, so ffmpeg can copy it.
+
+        With `any_bitrate` the bitrate isn't checked, for when copying is preferred over matching it.
+        """
+        requested = math.inf if any_bitrate else self.bot.audio_bitrate
+        return (
+            stream.get('acodec') == 'opus'
+            and self.bot.audio_sampling_rate == 48000
+            and self.bot.audio_channels == 2
+            and stream.get('asr') in (48000, None)
+            and stream.get('audio_channels') in (2, None)
+            and (stream.get('abr') or 0) <= requested * (1 + OPUS_PASSTHROUGH_TOLERANCE)
+        )
+
+    def _can_play_local(self) -> bool:
+        """True if cached Ogg/Opus files (48 kHz stereo, source bitrate) suit the requested audio settings."""
+        return self.bot.audio_sampling_rate == 48000 and self.bot.audio_channels == 2
+
+    async def _prepare_song(self, song: Track, use_cache: bool = True) -> Dict[str, Any]:
+        """Resolves the stream for a song and decides how FFmpeg handles it.
+
+        Songs in the audio cache need no stream at all and are played from disk. Opus
+        sources matching the requested profile are copied; other sources whose codec
+        yt-dlp reported are re-encoded directly. Only streams of unknown codec are probed.
+        """
+        audio_cache = get_audio_cache()
+        if use_cache and audio_cache is not None and self._can_play_local() and song.webpage_url in audio_cache:
+            return {'stream': None, 'codec': 'local', 'bitrate': None}
+
+        stream = await self.resolve_stream(song.webpage_url)
+        if self._can_passthrough(stream):
+            AUDIO_STREAMS.inc(mode='copy')
+            return {'stream': stream, 'codec': 'copy', 'bitrate': self.bot.audio_bitrate}
+        if stream.get('acodec'):
+            # codec=None makes FFmpegOpusAudio re-encode with libopus at the given bitrate.
+            AUDIO_STREAMS.inc(mode='transcode')
+            return {'stream': stream, 'codec': None, 'bitrate': self.bot.audio_bitrate}
+
+        AUDIO_STREAMS.inc(mode='probe')
+        try:
+            with PROBE_SECONDS.time():
+                codec, bitrate = await asyncio.wait_for(
+                    discord.FFmpegOpusAudio.probe(stream['url'], method='fallback'),
+                    timeout=30.0
+                )
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Timeout creando fuente de audio, reintentando...")
+            raise ValueError("Timeout creando fuente de audio")
+        if codec in ('opus', 'libopus'):
+            # Same profile check as reported codecs; the probe gives no sample rate or channels.
+            if self._can_passthrough({'acodec': 'opus', 'abr': bitrate}):
+                return {'stream': stream, 'codec': 'copy', 'bitrate': self.bot.audio_bitrate}
+            return {'stream': stream, 'codec': None, 'bitrate': self.bot.audio_bitrate}
+        return {'stream': stream, 'codec': codec, 'bitrate': bitrate}
+
+    def prefetch_next(self):
+        """Starts preparing the head of the queue in the background while the current song plays.
+
+        Safe to call after any queue change: the running preparation is kept if the head
+        is unchanged and discarded otherwise.
+        """
+        song = next(iter(self.queue), None) if self.is_playing else None
+        if song is not None and song is self._prefetch_song:
+            return
+
+        self.invalidate_prefetch()
+        if song is None or not song.key or source_breakers.is_open(song.webpage_url):
+            return
+
+        self._prefetch_song = song
+        self._prefetch_task = self._loop.create_task(self._prepare_song(song))
+        self._prefetch_task.add_done_callback(self._on_prefetch_done)
+        logger.debug(f"🔮 Preparando siguiente canción: {song.title}")
+
+    async def _refill_queue(self):
+        """Loads pending playlist pages ahead of playback, then prefetches the new head."""
+        await self.queue.ensure_loaded(QUEUE_LOW_WATER)
+        self.prefetch_next()
+
+    def _on_prefetch_done(self, task: asyncio.Task):
+        """Logs prefetch failures; play_next will retry the song normally."""
+        if not task.cancelled() and task.exception():
+            logger.debug(f"Fallo preparando la siguiente canción: {task.exception()}")
+
+    def invalidate_prefetch(self):
+        """Discards the prepared next song, e.g. after the queue was reordered or cleared."""
+        if self._prefetch_task and not self._prefetch_task.done():
+            self._prefetch_task.cancel()
+        self._prefetch_task = None
+        self._prefetch_song = None
+
+    async def _take_prepared(self, song: Track) -> Optional[Dict[str, Any]]:
+        """Returns the prefetched preparation for a song if it matches, waiting for it if still running."""
+        task, prefetched = self._prefetch_task, self._prefetch_song
+        self._prefetch_task = None
+        self._prefetch_song = None
+        if task is None or prefetched is not song:
+            if task and not task.done():
+                task.cancel()
+            return None
+        # The task is detached from the player now, so a CancelledError can only be our own.
+        try:
+            return await task
+        except Exception:
+            return None
+
+    @staticmethod
+    async def resolve_stream(url: str) -> Dict[str, Any]:
+        """Resolves the best audio stream for a track URL, reusing the shared stream cache."""
+        cached = stream_cache.get(url)
+        if cached:
+            logger.debug(f"⚡ Stream obtenido de la caché: {cached.get('format_id')}")
+            return cached
+
+        # Opus is generally VBR, so preferredquality='0' is often best.
+        # If a specific bitrate is desired with Opus, it's typically handled by FFmpeg.
+        # Forcing it here might conflict or be ignored depending on yt-dlp version and Opus.
+        # We will let FFmpeg handle the bitrate precisely.
+
+        logger.debug("⚙️ Extrayendo información con yt-dlp...")
+        info = await extract_info(url, 'playback')
+        if not info:
+            raise ValueError("No se pudo extraer la información del video")
+        
+        formats = info.get('formats', [])
+        logger.debug(f"📋 Encontrados {len(formats)} formatos disponibles")
+        
+        audio_formats = [f for f in formats if f.get('acodec') != 'none']
+        if not audio_formats:
+            raise ValueError("No se encontraron formatos de audio")
+        
+        # Prefer Opus (e.g. YouTube's webm format 251) so it can be passed through without re-encoding.
+        best_audio = max(audio_formats, key=lambda f: (f.get('acodec') == 'opus', f.get('abr') or 0))
+        stream_url = best_audio.get('url')
+        
+        if not stream_url:
+            raise ValueError("No se encontró URL de stream")
+        
+        logger.debug(f"✅ Formato seleccionado: {best_audio.get('format_id')} - {best_audio.get('acodec')} - {best_audio.get('abr')}kbps")
+
+        stream = {
+            'url': stream_url,
+            'format_id': best_audio.get('format_id'),
+            'acodec': best_audio.get('acodec'),
+            'abr': best_audio.get('abr'),
+            'asr': best_audio.get('asr'),
+            'audio_channels': best_audio.get('audio_channels'),
+            'duration': info.get('duration', 0)
+        }
+        stream_cache.put(url, stream)
+        return stream
 
     async def handle_song_complete(self, ctx):
         """Called when a song finishes; plays the next or stops if queue is empty."""
@@ -136,15 +486,26 @@ class MusicPlayer:
         if not self.current:
             return "0:00/0:00"
             
-        total_duration = int(float(self.current.get('duration', 0)))
-        
-        if self.pause_time:
-            current_time = int(self.pause_time - self.start_time)
-        else:
-            current_time = int(time.time() - self.start_time)
+        total_duration = self.current.duration
+        current_time = self.get_elapsed()
             
         return f"{self.format_duration(current_time)}/{self.format_duration(total_duration)}"
 
+    def get_elapsed(self) -> int:
+        """Returns the seconds played of the current song, not counting time paused."""
+        if not self.current or self.start_time is None:
+            return 0
+        if self.pause_time:
+            return int(self.pause_time - self.start_time)
+        return int(time.time() - self.start_time)
+
+    def get_remaining_time(self) -> int:
+        """Returns the seconds left of the current song plus every loaded song in the queue, without scanning it."""
+        remaining = self.queue.total_duration
+        if self.current:
+            remaining += max(self.current.duration - self.get_elapsed(), 0)
+        return remaining
+
     @staticmethod
     def format_duration(duration: int) -> str:
         """Formats a duration in seconds into H:MM:SS or M:SS format."""
@@ -1,75 +1,403 @@
 import json
 import logging
 import os
-from typing import Dict, List, Optional
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .track import Track
 
 logger = logging.getLogger(__name__)
 
+PLAYLISTS_DB = 'playlists.db'
+"""SQLite database holding every user's playlists."""
+
+LEGACY_PLAYLISTS_FILE = 'playlists.json'
+"""Pre-SQLite storage file, imported once by `migrate_json_playlists`."""
+
+WRITE_BEHIND_DELAY = 0.5
+"""Seconds queued song additions wait so a burst of them is committed in one transaction."""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS playlists (
+    id INTEGER PRIMARY KEY,
+    owner_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (owner_id, name)
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    webpage_url TEXT UNIQUE,
+    title TEXT NOT NULL,
+    duration INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS playlist_tracks (
+    playlist_id INTEGER NOT NULL REFERENCES playlists(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    track_id INTEGER NOT NULL REFERENCES tracks(id),
+    PRIMARY KEY (playlist_id, position)
+) WITHOUT ROWID;
+"""
+"""Normalized schema: playlists are looked up by (owner_id, name), songs by (playlist_id, position)."""
+
+
+def _split_legacy_key(key: str):
+    """Splits a legacy `"{user_id}_{name}"` key into its owner ID and playlist name."""
+    owner, _, name = key.partition('_')
+    return int(owner), name
+
+
+def migrate_json_playlists(conn: sqlite3.Connection, json_path: str = LEGACY_PLAYLISTS_FILE) -> int:
+    """Imports playlists from the legacy JSON file into an empty database, then renames the file.
+
+    Returns the number of playlists imported. Does nothing if the database already has playlists.
+    """
+    if not os.path.exists(json_path):
+        return 0
+    if conn.execute("SELECT 1 FROM playlists LIMIT 1").fetchone():
+        return 0
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        legacy = json.load(f)
+
+    imported = 0
+    with conn:
+        for key, songs in legacy.items():
+            try:
+                owner_id, name = _split_legacy_key(key)
+            except ValueError:
+                logger.warning(f"Clave de playlist no válida ignorada en la migración: {key}")
+                continue
+            playlist_id = conn.execute(
+                "INSERT INTO playlists (owner_id, name) VALUES (?, ?)", (owner_id, name)
+            ).lastrowid
+            for position, song in enumerate(songs or []):
+                if song:
+                    _insert_track(conn, playlist_id, position, Track.from_dict(song))
+            imported += 1
+
+    os.replace(json_path, json_path + '.migrated')
+    logger.info(f"Migradas {imported} playlists de {json_path} a SQLite")
+    return imported
+
+
+def _upsert_track(conn: sqlite3.Connection, song: Track) -> int:
+    """Returns the track row ID for a song, inserting it if needed.
+
+    The row is shared by every playlist holding the URL, so an existing title is never
+    overwritten: one user's add mustn't rename the song in everyone else's lists.
+    """
+    url = song.webpage_url or None
+    title, duration = song.title, song.duration
+    if url is None:
+        return conn.execute(
+            "INSERT INTO tracks (webpage_url, title, duration) VALUES (NULL, ?, ?)", (title, duration)
+        ).lastrowid
+
+    conn.execute(
+        "INSERT INTO tracks (webpage_url, title, duration) VALUES (?, ?, ?) "
+        "ON CONFLICT (webpage_url) DO UPDATE SET duration = MAX(tracks.duration, excluded.duration)",
+        (url, title, duration)
+    )
+    return conn.execute("SELECT id FROM tracks WHERE webpage_url = ?", (url,)).fetchone()[0]
+
+
+def _insert_track(conn: sqlite3.Connection, playlist_id: int, position: int, song: Track):
+    """Links a song into a playlist at the given position."""
+    track_id = _upsert_track(conn, song)
+    conn.execute(
+        "INSERT INTO playlist_tracks (playlist_id, position, track_id) VALUES (?, ?, ?)",
+        (playlist_id, position, track_id)
+    )
+
+
 class PlaylistManager:
-    """Manages user playlists stored in playlists.json."""
-    def __init__(self):
-        """Initializes the manager and loads playlists from the file."""
-        self.playlists: Dict[str, List[Dict]] = {}
-        self.load_playlists()
-
-    def load_playlists(self):
-        """Loads playlists from the playlists.json file."""
+    """Manages user playlists stored in an indexed SQLite database (playlists.db).
+
+    Safe to share between the event loop and the web server thread. Song additions are
+    written behind: they are visible to readers immediately and committed together after
+    `WRITE_BEHIND_DELAY`. Use `get_playlist_manager()` rather than creating instances.
+    """
+    def __init__(self, db_path: str = PLAYLISTS_DB, legacy_path: Optional[str] = LEGACY_PLAYLISTS_FILE,
+                 write_delay: float = WRITE_BEHIND_DELAY):
+        """Opens (or creates) the database in WAL mode and imports the legacy JSON file once."""
+        self._lock = threading.RLock()
+        self.write_delay = write_delay
+        self.version = 0
+        self._pending: List[Tuple[int, Track]] = []
+        self._flush_timer: Optional[threading.Timer] = None
+        self._listeners: List[Callable[[str, int, str], None]] = []
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        if legacy_path:
+            try:
+                migrate_json_playlists(self._conn, legacy_path)
+            except Exception as e:
+                logger.error(f"Error migrando playlists: {e}")
+
+    def subscribe(self, listener: Callable[[str, int, str], None]):
+        """Registers `listener(event, user_id, name)`, called after every change.
+
+        Events are 'create', 'add' and 'remove'. Listeners may run on any thread.
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[str, int, str], None]):
+        """Removes a listener registered with `subscribe`."""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, event: str, user_id: int, name: str):
+        """Bumps the version counter and calls every listener, logging their failures."""
+        with self._lock:
+            self.version += 1
+        for listener in list(self._listeners):
+            try:
+                listener(event, user_id, name)
+            except Exception as e:
+                logger.error(f"Error notificando cambio de playlists: {e}")
+
+    def _schedule_flush(self):
+        """Starts the write-behind timer unless one is already pending. Caller holds the lock."""
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.write_delay, self._flush_from_timer)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _flush_locked(self):
+        """Commits every pending song addition in a single transaction. Caller holds the lock."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
         try:
-            if os.path.exists('playlists.json'):
-                with open('playlists.json', 'r', encoding='utf-8') as f:
-                    self.playlists = json.load(f)
+            self._insert_pending(pending)
+            logger.debug(f"Guardadas {len(pending)} canciones en playlists")
+            return
         except Exception as e:
-            logger.error(f"Error cargando playlists: {e}")
-            self.playlists = {}
+            logger.warning(f"⚠️ Error guardando {len(pending)} canciones en bloque, reintentando una a una: {e}")
+
+        # Isolate the failure so one bad song doesn't lose everyone else's additions.
+        retry: List[Tuple[int, Track]] = []
+        for entry in pending:
+            try:
+                self._insert_pending([entry])
+            except sqlite3.OperationalError as e:
+                # Locked or I/O errors may clear up: keep the song for the next flush.
+                retry.append(entry)
+                error = e
+            except Exception as e:
+                logger.error(f"Error guardando '{entry[1].title}' en playlist, se descarta: {e}")
+        if retry:
+            self._pending[:0] = retry
+            logger.error(f"Error guardando playlists, {len(retry)} canciones siguen pendientes: {error}")
+            self._schedule_flush()
 
-    def save_playlists(self):
-        """Saves the current playlists to the playlists.json file."""
+    def _insert_pending(self, pending: List[Tuple[int, Track]]):
+        """Appends songs to their playlists in one transaction; nothing is kept if it raises."""
+        with self._conn:
+            next_positions: Dict[int, int] = {}
+            for playlist_id, song in pending:
+                if playlist_id not in next_positions:
+                    next_positions[playlist_id] = self._conn.execute(
+                        "SELECT COALESCE(MAX(position) + 1, 0) FROM playlist_tracks WHERE playlist_id = ?",
+                        (playlist_id,)
+                    ).fetchone()[0]
+                _insert_track(self._conn, playlist_id, next_positions[playlist_id], song)
+                next_positions[playlist_id] += 1
+
+    def _flush_from_timer(self):
+        """Write-behind timer target; nothing may escape into the timer thread."""
         try:
-            with open('playlists.json', 'w', encoding='utf-8') as f:
-                json.dump(self.playlists, f, indent=2, ensure_ascii=False)
+            self.flush()
         except Exception as e:
-            logger.error(f"Error guardando playlists: {e}")
+            logger.error(f"Error en la escritura diferida de playlists: {e}")
+
+    def flush(self):
+        """Writes pending song additions to the database now."""
+        with self._lock:
+            self._flush_locked()
+
+    def _playlist_id(self, user_id: int, name: str) -> Optional[int]:
+        """Looks up a playlist's row ID through the (owner_id, name) index."""
+        row = self._conn.execute(
+            "SELECT id FROM playlists WHERE owner_id = ? AND name = ?", (user_id, name)
+        ).fetchone()
+        return row[0] if row else None
+
+    @property
+    def playlists(self) -> Dict[str, List[Dict]]:
+        """Every playlist keyed by `"{user_id}_{name}"`, as the legacy JSON file was laid out."""
+        with self._lock:
+            self._flush_locked()
+            result: Dict[str, List[Dict]] = {
+                f"{owner_id}_{name}": []
+                for owner_id, name in self._conn.execute(
+                    "SELECT owner_id, name FROM playlists ORDER BY id"
+                )
+            }
+            rows = self._conn.execute(
+                "SELECT p.owner_id, p.name, t.webpage_url, t.title, t.duration "
+                "FROM playlist_tracks pt JOIN playlists p ON p.id = pt.playlist_id "
+                "JOIN tracks t ON t.id = pt.track_id ORDER BY pt.playlist_id, pt.position"
+            )
+            for owner_id, name, url, title, duration in rows:
+                result[f"{owner_id}_{name}"].append(
+                    {'webpage_url': url or '', 'title': title, 'duration': duration}
+                )
+        return result
+
+    def list_playlists(self, after_id: int = 0, limit: int = 50, owner_id: Optional[int] = None,
+                       include_songs: bool = True) -> Tuple[List[Dict], Optional[int]]:
+        """Returns one page of playlists ordered by ID, plus the cursor for the next page (or None).
+
+        Each item has `id`, `owner_id`, `name`, `key` (`"{owner_id}_{name}"`) and `count`,
+        and `songs` unless `include_songs` is False.
+        """
+        where, params = "p.id > ?", [after_id]
+        if owner_id is not None:
+            where += " AND p.owner_id = ?"
+            params.append(owner_id)
+
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(
+                "SELECT p.id, p.owner_id, p.name, "
+                "(SELECT COUNT(*) FROM playlist_tracks pt WHERE pt.playlist_id = p.id) "
+                f"FROM playlists p WHERE {where} ORDER BY p.id LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+            next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+            items = [
+                {'id': playlist_id, 'owner_id': owner, 'name': name, 'key': f"{owner}_{name}", 'count': count}
+                for playlist_id, owner, name, count in rows[:limit]
+            ]
+
+            if include_songs and items:
+                by_id = {item['id']: item for item in items}
+                for item in items:
+                    item['songs'] = []
+                placeholders = ','.join('?' * len(by_id))
+                songs = self._conn.execute(
+                    "SELECT pt.playlist_id, t.webpage_url, t.title, t.duration FROM playlist_tracks pt "
+                    "JOIN tracks t ON t.id = pt.track_id "
+                    f"WHERE pt.playlist_id IN ({placeholders}) ORDER BY pt.playlist_id, pt.position",
+                    list(by_id)
+                )
+                for playlist_id, url, title, duration in songs:
+                    by_id[playlist_id]['songs'].append(
+                        {'webpage_url': url or '', 'title': title, 'duration': duration}
+                    )
+        return items, next_cursor
 
     def create_playlist(self, user_id: int, name: str) -> bool:
         """Creates a new empty playlist for a user."""
-        key = f"{user_id}_{name}"
-        if key in self.playlists:
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("INSERT INTO playlists (owner_id, name) VALUES (?, ?)", (user_id, name))
+        except sqlite3.IntegrityError:
+            return False
+        except sqlite3.Error as e:
+            logger.error(f"Error guardando playlists: {e}")
             return False
-        self.playlists[key] = []
-        self.save_playlists()
+        self._notify('create', user_id, name)
         return True
 
-    def add_to_playlist(self, user_id: int, name: str, song: dict) -> bool:
-        """Adds a song dictionary to a user's playlist."""
-        key = f"{user_id}_{name}"
-        if key not in self.playlists:
-            return False
-        self.playlists[key].append(song)
-        self.save_playlists()
+    def add_to_playlist(self, user_id: int, name: str, song: Track) -> bool:
+        """Adds a track to a user's playlist; the write is committed shortly after."""
+        with self._lock:
+            playlist_id = self._playlist_id(user_id, name)
+            if playlist_id is None:
+                return False
+            self._pending.append((playlist_id, song))
+            self._schedule_flush()
+        self._notify('add', user_id, name)
         return True
 
     def remove_from_playlist(self, user_id: int, name: str, index: int) -> bool:
         """Removes a song from a user's playlist by its 1-based index."""
-        key = f"{user_id}_{name}"
-        if key not in self.playlists:
+        if index < 1:
             return False
         try:
-            self.playlists[key].pop(index - 1)
-            self.save_playlists()
-            return True
-        except IndexError:
+            with self._lock:
+                self._flush_locked()
+            with self._lock, self._conn:
+                playlist_id = self._playlist_id(user_id, name)
+                if playlist_id is None:
+                    return False
+                # Positions may have gaps after removals; the index counts rows in order.
+                row = self._conn.execute(
+                    "SELECT position FROM playlist_tracks WHERE playlist_id = ? "
+                    "ORDER BY position LIMIT 1 OFFSET ?",
+                    (playlist_id, index - 1)
+                ).fetchone()
+                if row is None:
+                    return False
+                self._conn.execute(
+                    "DELETE FROM playlist_tracks WHERE playlist_id = ? AND position = ?",
+                    (playlist_id, row[0])
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Error guardando playlists: {e}")
             return False
+        self._notify('remove', user_id, name)
+        return True
 
-    def get_playlist(self, user_id: int, name: str) -> List[Dict]:
-        """Retrieves the list of song dictionaries for a user's playlist."""
-        key = f"{user_id}_{name}"
-        return self.playlists.get(key, [])
+    def get_playlist(self, user_id: int, name: str, offset: int = 0, limit: Optional[int] = None) -> List[Track]:
+        """Retrieves the tracks of a user's playlist, in order; `offset`/`limit` select one page."""
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(
+                "SELECT t.webpage_url, t.title, t.duration FROM playlists p "
+                "JOIN playlist_tracks pt ON pt.playlist_id = p.id "
+                "JOIN tracks t ON t.id = pt.track_id "
+                "WHERE p.owner_id = ? AND p.name = ? ORDER BY pt.position LIMIT ? OFFSET ?",
+                (user_id, name, -1 if limit is None else limit, offset)
+            ).fetchall()
+        return [Track(url, title, duration) for url, title, duration in rows]
+
+    def get_playlist_summary(self, user_id: int, name: str) -> Optional[Tuple[int, int]]:
+        """Returns (song count, total seconds) of a user's playlist without loading its songs, or None if it doesn't exist."""
+        with self._lock:
+            self._flush_locked()
+            row = self._conn.execute(
+                "SELECT p.id, COUNT(pt.track_id), COALESCE(SUM(t.duration), 0) FROM playlists p "
+                "LEFT JOIN playlist_tracks pt ON pt.playlist_id = p.id "
+                "LEFT JOIN tracks t ON t.id = pt.track_id "
+                "WHERE p.owner_id = ? AND p.name = ? GROUP BY p.id",
+                (user_id, name)
+            ).fetchone()
+        return (row[1], row[2]) if row else None
 
     def get_user_playlists(self, user_id: int) -> List[str]:
         """Retrieves a list of playlist names owned by a user."""
-        prefix = f"{user_id}_"
-        return [
-            name.replace(prefix, '') 
-            for name in self.playlists.keys() 
-            if name.startswith(prefix)
-        ]
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name FROM playlists WHERE owner_id = ? ORDER BY id", (user_id,)
+            ).fetchall()
+        return [name for name, in rows]
+
+    def close(self):
+        """Writes pending changes and closes the database connection."""
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+
+_shared_manager: Optional[PlaylistManager] = None
+_shared_manager_lock = threading.Lock()
+
+
+def get_playlist_manager() -> PlaylistManager:
+    """Returns the process-wide PlaylistManager shared by the bot commands and the web server."""
+    global _shared_manager
+    if _shared_manager is None:
+        with _shared_manager_lock:
+            if _shared_manager is None:
+                _shared_manager = PlaylistManager()
+    return _shared_manager
@@ -0,0 +1,98 @@
+"""Optional yt-dlp extraction backend running in a pool of worker processes."""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional
+
+from .extraction import overridden_params
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROCESS_WORKERS = min(4, os.cpu_count() or 1)
+"""Default number of extraction worker processes."""
+
+INFO_FIELDS = (
+    '_type', 'id', 'title', 'duration', 'webpage_url', 'url', 'extractor',
+    'playlist_count', 'thumbnail', 'channel'
+)
+"""Top-level info fields kept when sending extraction results back from a worker."""
+
+FORMAT_FIELDS = (
+    'format_id', 'url', 'ext', 'acodec', 'vcodec', 'abr', 'tbr', 'asr',
+    'audio_channels', 'width', 'height', 'filesize', 'filesize_approx', 'protocol'
+)
+"""Per-format fields kept for format selection in the parent process."""
+
+_worker_extractors: Dict[str, Any] = {}
+
+
+def trim_info(info: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Reduces a yt-dlp info dict to the fields the bot reads, so results pickle cheaply."""
+    if not info:
+        return info
+
+    trimmed = {key: info[key] for key in INFO_FIELDS if key in info}
+    if 'formats' in info:
+        trimmed['formats'] = [
+            {key: fmt[key] for key in FORMAT_FIELDS if key in fmt}
+            for fmt in info['formats'] or []
+        ]
+    if 'entries' in info:
+        trimmed['entries'] = [trim_info(entry) for entry in info['entries'] or []]
+    return trimmed
+
+
+def _init_worker(profiles: Dict[str, dict]):
+    """Worker initializer: builds one warm extractor per option profile."""
+    import yt_dlp
+    for name, options in profiles.items():
+        _worker_extractors[name] = yt_dlp.YoutubeDL(dict(options))
+
+
+def _extract_in_worker(url: str, profile: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Runs `extract_info` inside a worker process and returns the trimmed result."""
+    from yt_dlp.utils import DownloadError
+    with overridden_params(_worker_extractors[profile], params) as ydl:
+        try:
+            return trim_info(ydl.extract_info(url, download=False))
+        except DownloadError as e:
+            # The original carries a traceback, which can't be pickled back to the bot.
+            raise DownloadError(str(e)) from None
+
+
+def _ping() -> int:
+    """No-op task used to force worker processes to start."""
+    return os.getpid()
+
+
+class ProcessExtractionBackend:
+    """Runs yt-dlp extractions in a bounded ProcessPoolExecutor to keep parsing off the GIL."""
+    def __init__(self, profiles: Dict[str, dict], workers: Optional[int] = None):
+        """Creates the worker pool; workers use the spawn start method to stay safe alongside threads."""
+        self.profiles = profiles
+        self.workers = workers or DEFAULT_PROCESS_WORKERS
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(profiles,)
+        )
+
+    def warm_up(self):
+        """Starts every worker now so the first extraction doesn't pay for process start-up."""
+        for _ in range(self.workers):
+            self._executor.submit(_ping)
+
+    async def extract_info(self, url: str, profile: str, **params) -> Optional[Dict[str, Any]]:
+        """Extracts info for a URL in a worker process. Raises BrokenProcessPool if the pool died."""
+        if profile not in self.profiles:
+            raise KeyError(f"Perfil de extracción desconocido: {profile}")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, _extract_in_worker, url, profile, params)
+
+    def shutdown(self):
+        """Stops the worker processes without waiting for queued extractions."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
@@ -0,0 +1,216 @@
+"""Failure handling for playback: error classification, backoff with jitter and per-source circuit breakers."""
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from .metrics import SOURCE_CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+PERMANENT = 'permanent'
+"""Failures that retrying the same track can't fix (unavailable, private, region-locked...)."""
+
+TRANSIENT = 'transient'
+"""Failures that may succeed later (timeouts, throttling, network or upstream errors)."""
+
+RETRY_BASE_DELAY = 0.5
+"""Seconds before the first retry; each consecutive failure doubles it."""
+
+RETRY_MAX_DELAY = 8.0
+"""Upper bound for a single backoff delay, in seconds."""
+
+MAX_TRACK_ATTEMPTS = 2
+"""Times a track is tried when it keeps failing transiently, before it is skipped."""
+
+MAX_CONSECUTIVE_FAILURES = 10
+"""Failures in a row after which play_next stops instead of working through the queue."""
+
+BREAKER_THRESHOLD = 3
+"""Consecutive transient failures from one source that open its circuit."""
+
+BREAKER_COOLDOWN = 30.0
+"""Seconds an opened circuit rejects tracks before letting a single trial through."""
+
+BREAKER_MAX_COOLDOWN = 300.0
+"""Upper bound for the cooldown, which doubles each time a trial fails."""
+
+PERMANENT_ERROR_PATTERNS = (
+    'video unavailable',
+    'private video',
+    'not available in your country',
+    'not made this video available',
+    'confirm your age',
+    'members-only',
+    'has been removed',
+    'account associated with this video has been terminated',
+    'copyright',
+    'unsupported url',
+    'is not a valid url',
+    'http error 404',
+    'http error 410',
+    'no se encontraron formatos',
+    'url no encontrada',
+    'no se encontró url de stream',
+)
+"""Lower-case fragments of yt-dlp (and our own) error messages that mark a track as unplayable."""
+
+SOURCE_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+"""Numeric circuit states exported by the `source_circuit_state` gauge."""
+
+_HOST_ALIASES = {'youtu.be': 'youtube.com'}
+
+
+def classify_error(error: BaseException) -> str:
+    """Returns PERMANENT or TRANSIENT for an exception raised while starting a track."""
+    message = str(error).lower()
+    if any(pattern in message for pattern in PERMANENT_ERROR_PATTERNS):
+        return PERMANENT
+    return TRANSIENT
+
+
+def backoff_delay(failures: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Exponential backoff with full jitter: a random delay up to `base * 2**(failures - 1)`, capped."""
+    return random.uniform(0, min(cap, base * 2 ** max(failures - 1, 0)))
+
+
+def source_of(url: Optional[str]) -> str:
+    """Groups a track URL by the upstream that serves it, e.g. `youtube.com` for any YouTube host."""
+    host = (urlparse(url or '').hostname or '').lower()
+    for prefix in ('www.', 'm.', 'music.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    return _HOST_ALIASES.get(host, host) or 'unknown'
+
+
+class CircuitBreaker:
+    """Closed → open after `threshold` consecutive transient failures → half-open trial after a cooldown."""
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        """Starts closed."""
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.consecutive = 0
+        self.failures = 0
+        self.successes = 0
+        self.opened = 0
+        self.retry_at = 0.0
+
+    def allow(self, now: float) -> bool:
+        """True if a track may be tried; an expired open circuit lets exactly one trial through."""
+        if self.state == 'closed':
+            return True
+        if now < self.retry_at:
+            return False
+        # Half-open: one trial at a time; a trial that never reports back expires after a cooldown.
+        self.state = 'half_open'
+        self.retry_at = now + self.cooldown
+        return True
+
+    def record_success(self):
+        """Closes the circuit."""
+        self.successes += 1
+        self.consecutive = 0
+        self.state = 'closed'
+        self.cooldown = self.base_cooldown
+
+    def record_failure(self, now: float) -> bool:
+        """Counts a transient failure; returns True if this opened the circuit."""
+        self.failures += 1
+        self.consecutive += 1
+        if self.state == 'half_open':
+            self.cooldown = min(self.cooldown * 2, BREAKER_MAX_COOLDOWN)
+        elif self.state == 'open' or self.consecutive < self.threshold:
+            return False
+        self.state = 'open'
+        self.opened += 1
+        self.retry_at = now + self.cooldown
+        return True
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        """Returns the breaker state as a JSON-friendly dict."""
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive,
+            'failures': self.failures,
+            'successes': self.successes,
+            'opened': self.opened,
+            'retry_in': round(max(self.retry_at - now, 0.0), 1) if self.state != 'closed' else 0.0,
+        }
+
+
+class SourceBreakers:
+    """Process-wide circuit breakers keyed by source, so one guild hitting an outage spares the others."""
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        """Initializes an empty registry."""
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, source: str) -> CircuitBreaker:
+        """Returns the breaker for a source, creating it closed. Call with the lock held."""
+        breaker = self._breakers.get(source)
+        if breaker is None:
+            breaker = self._breakers[source] = CircuitBreaker(self.threshold, self.cooldown)
+        return breaker
+
+    def _publish(self, source: str, breaker: CircuitBreaker):
+        """Exports a breaker's state to the metrics gauge."""
+        SOURCE_CIRCUIT_STATE.set(SOURCE_STATES[breaker.state], source=source)
+
+    def allow(self, url: Optional[str]) -> bool:
+        """True if a track from this URL's source may be tried now."""
+        source = source_of(url)
+        with self._lock:
+            breaker = self._get(source)
+            allowed = breaker.allow(time.monotonic())
+            self._publish(source, breaker)
+        return allowed
+
+    def is_open(self, url: Optional[str]) -> bool:
+        """True while a source rejects tracks, without using up a half-open trial."""
+        with self._lock:
+            breaker = self._breakers.get(source_of(url))
+            return breaker is not None and breaker.state != 'closed' and time.monotonic() < breaker.retry_at
+
+    def retry_in(self, url: Optional[str]) -> float:
+        """Seconds until a source's circuit lets a trial through (0 if it already would)."""
+        with self._lock:
+            breaker = self._breakers.get(source_of(url))
+            if breaker is None or breaker.state == 'closed':
+                return 0.0
+            return max(breaker.retry_at - time.monotonic(), 0.0)
+
+    def record_success(self, url: Optional[str]):
+        """Records a track that started fine."""
+        source = source_of(url)
+        with self._lock:
+            breaker = self._get(source)
+            breaker.record_success()
+            self._publish(source, breaker)
+
+    def record_failure(self, url: Optional[str]):
+        """Records a transient failure, logging when it opens the source's circuit."""
+        source = source_of(url)
+        with self._lock:
+            breaker = self._get(source)
+            opened = breaker.record_failure(time.monotonic())
+            self._publish(source, breaker)
+            cooldown = breaker.cooldown
+        if opened:
+            logger.warning(f"🔌 Circuito abierto para {source}: {self.threshold} fallos seguidos, pausa de {cooldown:g}s")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns every source's breaker state and failure counts."""
+        now = time.monotonic()
+        with self._lock:
+            return {source: breaker.to_dict(now) for source, breaker in self._breakers.items()}
+
+
+source_breakers = SourceBreakers()
+"""Process-wide circuit breakers used by every guild's player."""
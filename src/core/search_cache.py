@@ -0,0 +1,159 @@
+"""YouTube search with a shared LRU+TTL result cache and single-flight deduplication."""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Any, List, Tuple, Callable, Awaitable
+
+from .extraction import extract_info
+
+logger = logging.getLogger(__name__)
+
+SEARCH_RESULTS = 5
+"""Number of results fetched per search."""
+
+SEARCH_CACHE_SIZE = 256
+"""Maximum number of distinct queries kept in the cache."""
+
+SEARCH_CACHE_TTL = 15 * 60
+"""Seconds a cached result list stays valid."""
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes a search query so trivially different spellings share a cache entry."""
+    return ' '.join(query.casefold().split())
+
+
+def _parse_results(info) -> List[Dict[str, Any]]:
+    """Builds the result list shared by the Discord and web search paths from yt-dlp output."""
+    if not info or not info.get('entries'):
+        return []
+
+    results = []
+    for entry in list(info['entries'])[:SEARCH_RESULTS]:
+        if entry:
+            results.append({
+                'title': entry.get('title', 'Sin título'),
+                'url': entry.get('url', ''),
+                'webpage_url': entry.get('webpage_url') or entry.get('url', ''),
+                'thumbnail': entry.get('thumbnail', ''),
+                'duration': entry.get('duration', 0),
+                'channel': entry.get('channel', 'Desconocido')
+            })
+    return results
+
+
+class SearchCache:
+    """Thread-safe LRU+TTL cache of search results where concurrent identical misses share one fetch.
+
+    Works from both the event loop (`get`) and plain threads (`get_sync`); in-flight fetches are
+    tracked as `concurrent.futures.Future` objects so either kind of caller can wait on them.
+    """
+    def __init__(self, maxsize: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL):
+        """Initializes an empty cache."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+    def _claim(self, key: str):
+        """Returns ('hit', results), ('wait', future) or ('load', future) for a normalized query."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return 'hit', entry[1]
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return 'wait', future
+
+            future = Future()
+            self._inflight[key] = future
+            self.stats['misses'] += 1
+            return 'load', future
+
+    def _settle(self, key: str, future: Future, results=None, error: BaseException = None):
+        """Stores a finished fetch (only non-empty results are cached) and wakes any waiters."""
+        with self._lock:
+            self._inflight.pop(key, None)
+            if error is None and results:
+                self._entries[key] = (time.monotonic() + self.ttl, results)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(results)
+
+    async def get(self, query: str, loader: Callable[[str], Awaitable[List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """Returns cached results for a query, awaiting `loader(query)` at most once per miss."""
+        key = normalize_query(query)
+        state, value = self._claim(key)
+        if state == 'hit':
+            return value
+        if state == 'wait':
+            # Shield so a cancelled waiter doesn't cancel the fetch other callers share.
+            return await asyncio.shield(asyncio.wrap_future(value))
+
+        try:
+            results = await loader(key)
+        except BaseException as e:
+            self._settle(key, value, error=e)
+            raise
+        self._settle(key, value, results)
+        return results
+
+    def get_sync(self, query: str, loader: Callable[[str], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Blocking variant of `get` for callers running outside the event loop."""
+        key = normalize_query(query)
+        state, value = self._claim(key)
+        if state == 'hit':
+            return value
+        if state == 'wait':
+            return value.result()
+
+        try:
+            results = loader(key)
+        except BaseException as e:
+            self._settle(key, value, error=e)
+            raise
+        self._settle(key, value, results)
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns hit/miss/coalesced counters, the hit rate and the current size."""
+        with self._lock:
+            stats = dict(self.stats, size=len(self._entries))
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = (stats['hits'] + stats['coalesced']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Drops every cached result."""
+        with self._lock:
+            self._entries.clear()
+
+
+search_cache = SearchCache()
+"""Process-wide search cache shared by the Discord commands and the web API."""
+
+
+async def _load_search(query: str) -> List[Dict[str, Any]]:
+    """Runs an uncached search through the configured extraction backend."""
+    return _parse_results(await extract_info(f"ytsearch{SEARCH_RESULTS}:{query}", 'search'))
+
+
+async def search_youtube(query: str) -> List[Dict[str, Any]]:
+    """Searches YouTube for a query, going through the shared cache."""
+    return await search_cache.get(query, _load_search)
@@ -0,0 +1,104 @@
+"""Shared cache of resolved audio stream URLs, keyed by video ID."""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse, parse_qs
+
+from .constants import YOUTUBE_ID_REGEX
+
+logger = logging.getLogger(__name__)
+
+STREAM_CACHE_SIZE = 512
+"""Maximum number of resolved streams kept in the cache."""
+
+STREAM_CACHE_DEFAULT_TTL = 30 * 60
+"""Lifetime in seconds for stream URLs that carry no `expire=` parameter."""
+
+STREAM_EXPIRY_MARGIN = 5 * 60
+"""Seconds of validity a stream URL must still have beyond the track duration to be reused."""
+
+_EXPIRE_PATH_REGEX = re.compile(r'/expire/(\d+)')
+
+
+def get_cache_key(url: str) -> str:
+    """Returns the video ID for YouTube URLs, or the URL itself for anything else."""
+    match = YOUTUBE_ID_REGEX.search(url or '')
+    return match.group(1) if match else url
+
+
+def get_stream_expiry(stream_url: str) -> Optional[float]:
+    """Extracts the `expire` timestamp from a signed googlevideo URL, if present."""
+    try:
+        parsed = urlparse(stream_url)
+        values = parse_qs(parsed.query).get('expire')
+        if values:
+            return float(values[0])
+        match = _EXPIRE_PATH_REGEX.search(parsed.path)
+        if match:
+            return float(match.group(1))
+    except ValueError:
+        pass
+    return None
+
+
+class StreamCache:
+    """Thread-safe LRU cache of picked audio formats that honours stream URL expiry."""
+    def __init__(self, maxsize: int = STREAM_CACHE_SIZE, default_ttl: float = STREAM_CACHE_DEFAULT_TTL):
+        """Initializes an empty cache with the given size limit and fallback TTL."""
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached stream for a track URL, or None if missing or about to expire."""
+        key = get_cache_key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            margin = STREAM_EXPIRY_MARGIN + float(entry.get('duration') or 0)
+            if entry['expires_at'] - margin <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                logger.debug(f"Stream caducado eliminado de la caché: {key}")
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, url: str, stream: Dict[str, Any]):
+        """Stores a resolved stream (url, acodec, abr, duration) for a track URL."""
+        expires_at = get_stream_expiry(stream['url']) or time.time() + self.default_ttl
+        entry = dict(stream, expires_at=expires_at)
+        key = get_cache_key(url)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, url: str):
+        """Drops the cached stream for a track URL, e.g. after playback of it failed."""
+        with self._lock:
+            self._entries.pop(get_cache_key(url), None)
+
+    def clear(self):
+        """Removes every cached stream."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+stream_cache = StreamCache()
+"""Process-wide stream cache shared by every guild's MusicPlayer."""
@@ -0,0 +1,88 @@
+"""Compact, immutable record of a queued, saved or played song."""
+import logging
+import sys
+from typing import Any, Dict, Optional
+
+from .stream_cache import get_cache_key
+
+logger = logging.getLogger(__name__)
+
+YOUTUBE_WATCH_URL = 'https://www.youtube.com/watch?v='
+"""Prefix that rebuilds a YouTube track's URL from its stored video ID."""
+
+UNKNOWN_TITLE = 'No disponible'
+"""Title given to songs whose source reported none."""
+
+
+def _to_seconds(duration: Any) -> int:
+    """Normalizes a yt-dlp or JSON duration (int, float, numeric string or None) to whole seconds."""
+    try:
+        return int(float(duration or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+class Track:
+    """A song as the queue, playlists and player see it: a key, an interned title and a duration.
+
+    `key` is the YouTube video ID, or the full URL for other sites, so the common case
+    doesn't keep a ~45 character URL per entry; `webpage_url` rebuilds it on demand.
+    Titles are interned, so the same song queued in many guilds shares one string.
+    Instances are slotted and immutable, which also makes them safe to share between
+    guild queues and the web server thread.
+    """
+    __slots__ = ('key', 'title', 'duration')
+
+    def __init__(self, webpage_url: Optional[str], title: Optional[str] = None, duration: Any = 0):
+        """Creates a track from its page URL (or bare video ID), title and duration in seconds."""
+        object.__setattr__(self, 'key', get_cache_key(webpage_url or ''))
+        object.__setattr__(self, 'title', sys.intern(str(title or UNKNOWN_TITLE)))
+        object.__setattr__(self, 'duration', _to_seconds(duration))
+
+    @classmethod
+    def from_entry(cls, entry: Dict[str, Any], fallback_url: str = '') -> 'Track':
+        """Builds a track from a (possibly flat) yt-dlp playlist entry or video info."""
+        return cls(entry.get('webpage_url') or entry.get('url') or fallback_url, entry.get('title'), entry.get('duration'))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Track':
+        """Builds a track from its `to_dict` form, as stored in JSON or sent by the web UI."""
+        return cls(data.get('webpage_url'), data.get('title'), data.get('duration'))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the JSON form: `webpage_url`, `title` and `duration`."""
+        return {'webpage_url': self.webpage_url, 'title': self.title, 'duration': self.duration}
+
+    @property
+    def webpage_url(self) -> str:
+        """The track's page URL, rebuilt from the video ID for YouTube tracks."""
+        key = self.key
+        if not key or '/' in key:
+            return key
+        return YOUTUBE_WATCH_URL + key
+
+    def __setattr__(self, name, value):
+        """Tracks are immutable; build a new one instead."""
+        raise AttributeError("Track es inmutable")
+
+    def __delattr__(self, name):
+        """Tracks are immutable."""
+        raise AttributeError("Track es inmutable")
+
+    def __reduce__(self):
+        """Pickles (and copies) through the constructor, since attributes can't be set afterwards."""
+        return Track, (self.key, self.title, self.duration)
+
+    def __eq__(self, other) -> bool:
+        """Tracks are equal when key, title and duration all match."""
+        if not isinstance(other, Track):
+            return NotImplemented
+        return (self.key, self.title, self.duration) == (other.key, other.title, other.duration)
+
+    def __hash__(self) -> int:
+        """Hashes the same fields `__eq__` compares."""
+        return hash((self.key, self.title, self.duration))
+
+    def __repr__(self) -> str:
+        """Debug representation."""
+        return f"Track({self.key!r}, {self.title!r}, {self.duration})"
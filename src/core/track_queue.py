@@ -0,0 +1,468 @@
+"""Guild playback queue that can hold lazily fetched playlist pages."""
+import asyncio
+import logging
+import random
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .extraction import extract_info
+from .stream_cache import get_cache_key
+from .track import Track
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_PAGE_SIZE = 50
+"""Number of playlist entries fetched per page."""
+
+QUEUE_LOW_WATER = 10
+"""Loaded tracks kept ahead of playback before the next playlist page is fetched."""
+
+QUEUE_MAX_SIZE = 1000
+"""Default maximum number of songs in a guild queue; further additions are rejected."""
+
+
+class PlaylistCursor:
+    """Placeholder for the part of a playlist that has not been fetched yet."""
+    def __init__(self, url: str, start: int, total: Optional[int] = None, shuffle: bool = False):
+        """Creates a cursor that will fetch `url` from the 1-based entry `start` onwards."""
+        self.url = url
+        self.start = start
+        self.total = total
+        self.shuffle = shuffle
+
+    @property
+    def remaining(self) -> int:
+        """Number of entries still to fetch, or 0 when the playlist size is unknown."""
+        if self.total is None:
+            return 0
+        return max(self.total - self.start + 1, 0)
+
+    async def fetch_page(self, page_size: int = PLAYLIST_PAGE_SIZE) -> List[Track]:
+        """Fetches the next page of entries and advances the cursor past them."""
+        end = self.start + page_size - 1
+        info = await extract_info(self.url, 'playlist_info', playliststart=self.start, playlistend=end)
+        entries = [entry for entry in (info or {}).get('entries') or [] if entry]
+        logger.debug(f"Página de playlist {self.start}-{end}: {len(entries)} entradas")
+
+        if len(entries) < page_size:
+            self.total = self.start + len(entries) - 1
+        self.start = end + 1
+        songs = [Track.from_entry(entry, self.url) for entry in entries]
+        if self.shuffle:
+            random.shuffle(songs)
+        return songs
+
+    @property
+    def exhausted(self) -> bool:
+        """True once every entry of the playlist has been fetched."""
+        return self.total is not None and self.start > self.total
+
+
+QueueItem = Union[Track, PlaylistCursor]
+
+
+class QueueFull(Exception):
+    """Raised when a song is added to a queue that already holds `maxlen` songs."""
+    def __init__(self, maxlen: int):
+        """Stores the limit that was hit."""
+        super().__init__(f"La cola está llena (máximo {maxlen} canciones)")
+        self.maxlen = maxlen
+
+
+def _duration(item: QueueItem) -> int:
+    """Seconds an item adds to the queue's running total; cursors count as 0."""
+    return 0 if isinstance(item, PlaylistCursor) else item.duration
+
+
+class _Node:
+    """Implicit treap node: position is given by subtree sizes, balance by random heap priorities."""
+    __slots__ = ('item', 'priority', 'left', 'right', 'size', 'cursors', 'own_duration', 'duration')
+
+    def __init__(self, item: QueueItem):
+        """Creates a leaf holding one song or cursor."""
+        self.item = item
+        self.priority = random.random()
+        self.left: Optional['_Node'] = None
+        self.right: Optional['_Node'] = None
+        self.size = 1
+        self.cursors = 1 if isinstance(item, PlaylistCursor) else 0
+        self.own_duration = _duration(item)
+        self.duration = self.own_duration
+
+
+def _size(node: Optional[_Node]) -> int:
+    """Number of items in a subtree."""
+    return node.size if node is not None else 0
+
+
+def _update(node: _Node):
+    """Recomputes a node's subtree size, cursor count and duration from its children."""
+    size, cursors, duration = 1, isinstance(node.item, PlaylistCursor), node.own_duration
+    for child in (node.left, node.right):
+        if child is not None:
+            size += child.size
+            cursors += child.cursors
+            duration += child.duration
+    node.size, node.cursors, node.duration = size, int(cursors), duration
+
+
+def _split(node: Optional[_Node], count: int):
+    """Splits a subtree into its first `count` items and the rest."""
+    if node is None:
+        return None, None
+    left_size = _size(node.left)
+    if count <= left_size:
+        first, node.left = _split(node.left, count)
+        _update(node)
+        return first, node
+    node.right, rest = _split(node.right, count - left_size - 1)
+    _update(node)
+    return node, rest
+
+
+def _merge(first: Optional[_Node], second: Optional[_Node]) -> Optional[_Node]:
+    """Concatenates two subtrees, keeping every item of `first` in front."""
+    if first is None:
+        return second
+    if second is None:
+        return first
+    if first.priority > second.priority:
+        first.right = _merge(first.right, second)
+        _update(first)
+        return first
+    second.left = _merge(first, second.left)
+    _update(second)
+    return second
+
+
+def _build(items: Iterable[QueueItem]) -> Optional[_Node]:
+    """Builds a treap from items in order in O(n), using the right-spine stack construction."""
+    stack: List[_Node] = []
+    for item in items:
+        node = _Node(item)
+        last = None
+        while stack and stack[-1].priority < node.priority:
+            last = stack.pop()
+            _update(last)
+        node.left = last
+        if stack:
+            stack[-1].right = node
+        stack.append(node)
+    for node in reversed(stack):
+        _update(node)
+    return stack[0] if stack else None
+
+
+def _iter_nodes(root: Optional[_Node], start: int = 0) -> Iterator[_Node]:
+    """Yields nodes in queue order from position `start`, seeking there in O(log n)."""
+    stack: List[_Node] = []
+    node = root
+    while node is not None:
+        left_size = _size(node.left)
+        if start < left_size:
+            stack.append(node)
+            node = node.left
+        elif start == left_size:
+            stack.append(node)
+            break
+        else:
+            start -= left_size + 1
+            node = node.right
+    while stack:
+        node = stack.pop()
+        yield node
+        child = node.right
+        while child is not None:
+            stack.append(child)
+            child = child.left
+
+
+class TrackQueue:
+    """Guild song queue backed by an implicit treap, so positional operations are O(log n).
+
+    Items are songs or `PlaylistCursor` placeholders. Iteration, indexing and `popleft`
+    only see the loaded songs in front of the first cursor; `ensure_loaded` expands cursors
+    page by page as playback approaches them, so huge playlists start immediately. Each
+    subtree keeps its size, cursor count and total duration, and a key → count map answers
+    "already queued?" in O(1). Songs beyond `maxlen` are rejected rather than dropping
+    older ones.
+    """
+    def __init__(self, items: Iterable[QueueItem] = (), maxlen: int = QUEUE_MAX_SIZE):
+        """Initializes the queue with optional items (songs or cursors), up to `maxlen` songs."""
+        self.maxlen = maxlen
+        self._root: Optional[_Node] = None
+        self._keys: Dict[str, int] = {}
+        self._fetch_lock = asyncio.Lock()
+        self.extend(items)
+
+    def _add_keys(self, items: Iterable[QueueItem]):
+        """Counts songs in the membership map."""
+        for item in items:
+            if not isinstance(item, PlaylistCursor):
+                key = item.key
+                self._keys[key] = self._keys.get(key, 0) + 1
+
+    def _drop_key(self, song: Track):
+        """Uncounts a removed song from the membership map."""
+        key = song.key
+        count = self._keys.get(key, 0) - 1
+        if count > 0:
+            self._keys[key] = count
+        else:
+            self._keys.pop(key, None)
+
+    @property
+    def songs(self) -> int:
+        """Songs held in the queue, not counting unfetched playlist entries."""
+        return _size(self._root) - (self._root.cursors if self._root else 0)
+
+    @property
+    def free(self) -> int:
+        """Songs that can still be added before the queue is full."""
+        return max(self.maxlen - self.songs, 0)
+
+    def _cursor_nodes(self) -> Iterator[Tuple[int, _Node]]:
+        """Yields (position, node) for every cursor, visiting only subtrees that contain one."""
+        stack = [(self._root, 0)] if self._root is not None and self._root.cursors else []
+        found = []
+        while stack:
+            node, offset = stack.pop()
+            position = offset + _size(node.left)
+            if isinstance(node.item, PlaylistCursor):
+                found.append((position, node))
+            if node.left is not None and node.left.cursors:
+                stack.append((node.left, offset))
+            if node.right is not None and node.right.cursors:
+                stack.append((node.right, position + 1))
+        return iter(sorted(found, key=lambda entry: entry[0]))
+
+    def __len__(self) -> int:
+        """Total songs in the queue, counting the known unfetched remainder of playlists."""
+        return self.songs + sum(node.item.remaining for _, node in self._cursor_nodes())
+
+    def __bool__(self) -> bool:
+        """True while the queue holds songs or pending playlist pages."""
+        return self._root is not None
+
+    def __contains__(self, song: Union[str, Track]) -> bool:
+        """O(1) check whether a song (or URL) is already queued."""
+        key = get_cache_key(song) if isinstance(song, str) else song.key
+        return key in self._keys
+
+    def __iter__(self) -> Iterator[Track]:
+        """Iterates over the loaded songs in front of the first pending playlist cursor."""
+        for node in _iter_nodes(self._root):
+            if isinstance(node.item, PlaylistCursor):
+                return
+            yield node.item
+
+    def __getitem__(self, index: Union[int, slice]):
+        """Returns the loaded song at a 0-based index, or a list of loaded songs for a slice.
+
+        Slices only walk the requested range, so showing one page of a long queue is O(log n + page).
+        """
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.loaded)
+            if step != 1:
+                return list(self)[index]
+            songs = []
+            for node in _iter_nodes(self._root, start):
+                if len(songs) >= stop - start:
+                    break
+                songs.append(node.item)
+            return songs
+        size = _size(self._root)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("Índice fuera de la cola")
+        item = next(_iter_nodes(self._root, index)).item
+        if isinstance(item, PlaylistCursor):
+            raise IndexError("La posición todavía no está cargada")
+        return item
+
+    @property
+    def loaded(self) -> int:
+        """Number of songs available before the first pending playlist cursor."""
+        node, offset = self._root, 0
+        while node is not None:
+            if node.left is not None and node.left.cursors:
+                node = node.left
+            elif isinstance(node.item, PlaylistCursor):
+                return offset + _size(node.left)
+            elif node.cursors:
+                offset += _size(node.left) + 1
+                node = node.right
+            else:
+                return offset + node.size
+        return offset
+
+    @property
+    def pending(self) -> bool:
+        """True if the queue still holds playlist entries that haven't been fetched."""
+        return self._root is not None and self._root.cursors > 0
+
+    @property
+    def total_duration(self) -> int:
+        """Seconds of every loaded song, kept as a running aggregate."""
+        return self._root.duration if self._root is not None else 0
+
+    def duration_before(self, index: int) -> int:
+        """Seconds of the songs in front of a position, in O(log n)."""
+        node, total = self._root, 0
+        while node is not None:
+            left_size = _size(node.left)
+            if index <= left_size:
+                node = node.left
+                continue
+            total += (node.left.duration if node.left else 0) + node.own_duration
+            index -= left_size + 1
+            node = node.right
+        return total
+
+    def _accept(self, items: Iterable[QueueItem]) -> Tuple[List[QueueItem], int]:
+        """Splits items into those that fit under `maxlen` and the number of songs rejected."""
+        free = self.free
+        accepted: List[QueueItem] = []
+        rejected = 0
+        for item in items:
+            if isinstance(item, PlaylistCursor):
+                if free > 0:
+                    accepted.append(item)
+            elif free > 0:
+                free -= 1
+                accepted.append(item)
+            else:
+                rejected += 1
+        return accepted, rejected
+
+    def insert(self, index: int, item: QueueItem):
+        """Inserts a song or cursor before a position; raises `QueueFull` if no song fits."""
+        if not isinstance(item, PlaylistCursor) and self.free <= 0:
+            raise QueueFull(self.maxlen)
+        self._insert(index, item)
+
+    def _insert(self, index: int, item: QueueItem):
+        """Inserts without the capacity check."""
+        first, rest = _split(self._root, max(0, min(index, _size(self._root))))
+        self._root = _merge(_merge(first, _Node(item)), rest)
+        self._add_keys((item,))
+
+    def append(self, item: QueueItem):
+        """Adds a song or playlist cursor at the end of the queue; raises `QueueFull` if no song fits."""
+        self.insert(_size(self._root), item)
+
+    def appendleft(self, item: QueueItem):
+        """Adds a song or playlist cursor at the front of the queue; raises `QueueFull` if no song fits."""
+        self.insert(0, item)
+
+    def extend(self, items: Iterable[QueueItem]) -> int:
+        """Appends songs or cursors and returns how many songs were accepted.
+
+        Songs beyond `maxlen` are left out (and logged) rather than evicting queued ones.
+        Another TrackQueue is moved in whole, emptying it, in O(log n) when it fits.
+        """
+        if isinstance(items, TrackQueue):
+            other = items
+            if other.songs <= self.free:
+                accepted = other.songs
+                self._root = _merge(self._root, other._root)
+                for key, count in other._keys.items():
+                    self._keys[key] = self._keys.get(key, 0) + count
+                other.clear()
+                return accepted
+            items = [node.item for node in _iter_nodes(other._root)]
+            other.clear()
+        accepted, rejected = self._accept(items)
+        if rejected:
+            logger.warning(f"⚠️ Cola llena: {rejected} canciones no se añadieron (máximo {self.maxlen})")
+        if accepted:
+            self._root = _merge(self._root, _build(accepted))
+            self._add_keys(accepted)
+        return sum(1 for item in accepted if not isinstance(item, PlaylistCursor))
+
+    def _remove(self, index: int) -> QueueItem:
+        """Removes and returns the item at a position."""
+        first, rest = _split(self._root, index)
+        node, rest = _split(rest, 1)
+        self._root = _merge(first, rest)
+        if not isinstance(node.item, PlaylistCursor):
+            self._drop_key(node.item)
+        return node.item
+
+    def popleft(self) -> Track:
+        """Removes and returns the first song. Call `ensure_loaded(1)` first if cursors may be in front."""
+        if self._root is None:
+            raise IndexError("La cola está vacía")
+        return self.pop(0)
+
+    def pop(self, index: int) -> Track:
+        """Removes and returns the loaded song at a 0-based index."""
+        loaded = self.loaded
+        if index < 0:
+            index += loaded
+        if not 0 <= index < loaded:
+            raise IndexError("La siguiente canción todavía no está cargada" if index == 0 else "Índice fuera de la cola")
+        return self._remove(index)
+
+    def move(self, index: int, to: int = 0) -> Track:
+        """Moves the loaded song at `index` to position `to` (the front by default) and returns it."""
+        song = self.pop(index)
+        self._insert(to, song)
+        return song
+
+    def clear(self):
+        """Removes every song and pending playlist."""
+        self._root = None
+        self._keys = {}
+
+    def detach(self) -> 'TrackQueue':
+        """Moves every item into a new queue in O(1), leaving this one empty."""
+        other = TrackQueue(maxlen=self.maxlen)
+        other._root, other._keys = self._root, self._keys
+        self.clear()
+        return other
+
+    def shuffle(self):
+        """Shuffles the loaded songs; pages fetched later for pending playlists arrive shuffled too."""
+        items = [node.item for node in _iter_nodes(self._root)]
+        slots = [i for i, item in enumerate(items) if not isinstance(item, PlaylistCursor)]
+        songs = [items[i] for i in slots]
+        random.shuffle(songs)
+        for i, song in zip(slots, songs):
+            items[i] = song
+        for item in items:
+            if isinstance(item, PlaylistCursor):
+                item.shuffle = True
+        self._root = _build(items)
+
+    async def ensure_loaded(self, count: int):
+        """Fetches playlist pages until at least `count` songs are loaded, or no cursors remain in the way."""
+        async with self._fetch_lock:
+            while self.loaded < count:
+                first = next(self._cursor_nodes(), None)
+                if first is None:
+                    return
+                cursor = first[1].item
+                try:
+                    songs = await cursor.fetch_page()
+                except Exception as e:
+                    logger.error(f"Error cargando página de playlist: {e}")
+                    songs = []
+                    cursor.total = cursor.start - 1
+
+                # The queue may have changed while fetching; find the cursor again.
+                position = next((pos for pos, node in self._cursor_nodes() if node.item is cursor), None)
+                if position is None:
+                    continue
+                free = self.free
+                if len(songs) > free:
+                    logger.warning(f"⚠️ Cola llena: se descarta el resto de la playlist ({len(songs) - free}+ canciones)")
+                    songs = songs[:free]
+                    cursor.total = cursor.start - 1
+                before, rest = _split(self._root, position)
+                cursor_node, after = _split(rest, 1)
+                middle = _build(songs)
+                if not cursor.exhausted:
+                    middle = _merge(middle, cursor_node)
+                self._root = _merge(_merge(before, middle), after)
+                self._add_keys(songs)
@@ -0,0 +1,262 @@
+"""Process-wide admission control for ffmpeg processes, so many guilds can't oversubscribe the host."""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .metrics import (
+    FFMPEG_CPU_CORES,
+    FFMPEG_RSS_BYTES,
+    TRANSCODE_ADMISSIONS,
+    TRANSCODE_PRESSURE,
+    TRANSCODE_SLOTS,
+    TRANSCODE_WAITING
+)
+
+try:
+    import psutil
+except ImportError:  # Optional: /proc (Linux) or load average is used instead.
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+TRANSCODES_PER_CORE = 8
+"""Concurrent libopus transcodes allowed per CPU core before new ones have to wait."""
+
+DEGRADE_THRESHOLD = 0.75
+"""Pressure (fraction of slots in use, or host CPU utilisation) above which new streams use a cheaper profile."""
+
+ADMISSION_TIMEOUT = 5.0
+"""Seconds a stream waits for a transcoding slot before it is let in anyway on the cheapest profile."""
+
+SAMPLE_INTERVAL = 2.0
+"""Minimum seconds between CPU/RSS samples of the live ffmpeg processes."""
+
+
+def _read_process(pid: int) -> Optional[Tuple[float, int]]:
+    """Returns (CPU seconds, resident bytes) for a process via psutil or /proc, or None if unavailable."""
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            times = process.cpu_times()
+            return times.user + times.system, process.memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # Fields after the parenthesised command name: state is [0], utime [11], stime [12], rss [21].
+            fields = f.read().rsplit(')', 1)[1].split()
+        ticks = os.sysconf('SC_CLK_TCK')
+        return (int(fields[11]) + int(fields[12])) / ticks, int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IndexError, ValueError, AttributeError):
+        return None
+
+
+def _host_cpu(cpu_count: int) -> Optional[float]:
+    """Returns host CPU utilisation as a fraction (load average per core without psutil), or None."""
+    if psutil is not None:
+        return psutil.cpu_percent(interval=None) / 100
+    try:
+        return os.getloadavg()[0] / cpu_count
+    except (AttributeError, OSError):
+        return None
+
+
+class Admission:
+    """A stream let in by the scheduler; `release` must be called once its ffmpeg process is gone."""
+    def __init__(self, scheduler: 'TranscodeScheduler', mode: str, degraded: bool, waited: float):
+        """Records how the stream was admitted."""
+        self.scheduler = scheduler
+        self.mode = mode
+        self.degraded = degraded
+        self.waited = waited
+        self.pid: Optional[int] = None
+        self._released = False
+
+    def attach(self, pid: int):
+        """Associates the ffmpeg process, so its CPU and memory are sampled."""
+        self.pid = pid
+        self.scheduler._track(pid)
+
+    def release(self):
+        """Frees the slot; safe to call more than once and from any thread."""
+        if not self._released:
+            self._released = True
+            self.scheduler._release(self)
+
+
+class TranscodeScheduler:
+    """Caps concurrent transcodes at `per_core` × CPU cores and reports host pressure.
+
+    Remuxing (`copy`) is cheap and always admitted. A transcode takes a slot; when none is
+    free it queues (FIFO) for up to `timeout` seconds and is then let in over the cap rather
+    than failing, so playback slows down instead of breaking. Streams admitted under
+    pressure are marked `degraded` so the player can pick a cheaper ffmpeg profile.
+    """
+    def __init__(self, per_core: int = TRANSCODES_PER_CORE, cpu_count: Optional[int] = None,
+                 timeout: float = ADMISSION_TIMEOUT, degrade_threshold: float = DEGRADE_THRESHOLD):
+        """Initializes the scheduler for this host's core count."""
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self.limit = max(1, per_core * self.cpu_count)
+        self.timeout = timeout
+        self.degrade_threshold = degrade_threshold
+        self._lock = threading.Lock()
+        self._transcodes = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._processes: Dict[int, Optional[Tuple[float, float]]] = {}
+        self._sampled_at = 0.0
+        self._cpu_cores = 0.0
+        self._rss = 0
+        self._host_cpu: Optional[float] = None
+        if psutil is not None:
+            psutil.cpu_percent(interval=None)  # The first call only primes the counter.
+
+    @property
+    def pressure(self) -> float:
+        """The higher of slot usage and host CPU utilisation; 1.0 or more means saturated."""
+        with self._lock:
+            slots = self._transcodes / self.limit
+        return max(slots, self._host_cpu or 0.0)
+
+    def under_pressure(self) -> bool:
+        """True if new streams should use a cheaper profile."""
+        self.sample()
+        return self.pressure >= self.degrade_threshold
+
+    async def admit(self, mode: str, background: bool = False) -> Admission:
+        """Admits a stream of `mode` ('copy' or 'transcode'), waiting for a slot if transcodes are at the cap.
+
+        Background work (e.g. audio cache downloads) waits as long as it takes instead of
+        being let in over the cap.
+        """
+        if mode != 'transcode':
+            return Admission(self, mode, False, 0.0)
+        degraded = self.under_pressure()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        waiter: Optional[asyncio.Future] = None
+        outcome = 'degraded' if degraded else 'ok'
+        woken = False
+        try:
+            while True:
+                with self._lock:
+                    if waiter is not None and waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                    # Newcomers don't jump the queue; a woken waiter may take the freed slot.
+                    if self._transcodes < self.limit and (waiter is not None or not self._waiters):
+                        self._transcodes += 1
+                        woken = waiter is not None
+                        break
+                    waiter = loop.create_future()
+                    self._waiters.append(waiter)
+                    TRANSCODE_WAITING.set(len(self._waiters))
+                outcome = 'queued'
+                remaining = None if background else started + self.timeout - loop.time()
+                try:
+                    await asyncio.wait_for(waiter, remaining)
+                except asyncio.TimeoutError:
+                    with self._lock:
+                        self._transcodes += 1
+                    outcome = 'overcommitted'
+                    logger.warning(f"⚠️ Sin huecos de transcodificación tras {self.timeout:g}s, admitiendo en modo ligero")
+                    break
+        finally:
+            if waiter is not None:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                    TRANSCODE_WAITING.set(len(self._waiters))
+                # Woken for a freed slot but cancelled (or timed out) before taking it: pass the wake-up on.
+                if not woken and waiter.done() and not waiter.cancelled():
+                    self._wake_next()
+
+        waited = loop.time() - started
+        if outcome in ('queued', 'overcommitted'):
+            degraded = True
+            logger.debug(f"⏳ Transcodificación en cola durante {waited:.2f}s")
+        TRANSCODE_ADMISSIONS.inc(outcome=outcome)
+        with self._lock:
+            TRANSCODE_SLOTS.set(self._transcodes)
+        return Admission(self, mode, degraded, waited)
+
+    def _track(self, pid: int):
+        """Starts sampling a process."""
+        with self._lock:
+            self._processes[pid] = None
+
+    def _release(self, admission: Admission):
+        """Returns a slot and wakes the next waiter; called from player threads."""
+        with self._lock:
+            if admission.pid is not None:
+                self._processes.pop(admission.pid, None)
+            if admission.mode != 'transcode':
+                return
+            self._transcodes -= 1
+            TRANSCODE_SLOTS.set(self._transcodes)
+            loop = self._waiters[0].get_loop() if self._waiters else None
+        if loop is not None:
+            loop.call_soon_threadsafe(self._wake_next)
+
+    def _wake_next(self):
+        """Resolves the oldest waiter that hasn't given up yet; runs on the event loop."""
+        with self._lock:
+            waiter = next((w for w in self._waiters if not w.done()), None)
+        if waiter is not None:
+            waiter.set_result(None)
+
+    def sample(self, force: bool = False):
+        """Refreshes ffmpeg CPU/RSS and host CPU at most every `SAMPLE_INTERVAL` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._sampled_at < SAMPLE_INTERVAL:
+                return
+            self._sampled_at = now
+            previous = dict(self._processes)
+
+        cpu_cores, rss, current = 0.0, 0, {}
+        for pid, last in previous.items():
+            reading = _read_process(pid)
+            if reading is None:
+                continue
+            cpu_seconds, process_rss = reading
+            current[pid] = (cpu_seconds, now)
+            rss += process_rss
+            if last is not None and now > last[1]:
+                cpu_cores += max(cpu_seconds - last[0], 0.0) / (now - last[1])
+        host_cpu = _host_cpu(self.cpu_count)
+
+        with self._lock:
+            for pid, value in current.items():
+                if pid in self._processes:
+                    self._processes[pid] = value
+            self._cpu_cores = cpu_cores
+            self._rss = rss
+            if host_cpu is not None:
+                self._host_cpu = host_cpu
+        FFMPEG_CPU_CORES.set(round(cpu_cores, 3))
+        FFMPEG_RSS_BYTES.set(rss)
+        TRANSCODE_PRESSURE.set(round(self.pressure, 3))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns slot usage, queue length, sampled resource use and the current pressure."""
+        self.sample()
+        with self._lock:
+            stats = {
+                'transcodes': self._transcodes,
+                'limit': self.limit,
+                'waiting': len(self._waiters),
+                'processes': len(self._processes),
+                'ffmpeg_cpu_cores': round(self._cpu_cores, 3),
+                'ffmpeg_rss_bytes': self._rss,
+                'host_cpu': round(self._host_cpu, 3) if self._host_cpu is not None else None,
+            }
+        stats['pressure'] = round(self.pressure, 3)
+        stats['degraded'] = stats['pressure'] >= self.degrade_threshold
+        return stats
+
+
+transcode_scheduler = TranscodeScheduler()
+"""Process-wide scheduler shared by every guild's player."""
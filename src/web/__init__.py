@@ -1,3 +1,3 @@
-from .app import create_app, init_web
+from .app import create_app, init_web, WebServer
 
-__all__ = ['create_app', 'init_web'] 
\ No newline at end of file
+__all__ = ['create_app', 'init_web', 'WebServer'] 
\ No newline at end of file
@@ -1,143 +1,231 @@
+import asyncio
 import os
-import threading
-import json
-import requests
-from flask import Flask, render_template, request, jsonify
-import yt_dlp
-from ..core.constants import YTDLP_SEARCH_OPTIONS
-from ..core.playlist_manager import PlaylistManager
+import uuid
+from aiohttp import web
+from ..core.extraction import extractor_pool
+from ..core.search_cache import search_cache, search_youtube
+from ..core.playlist_manager import get_playlist_manager
+from ..core.metrics import render_metrics
+from ..core.media_cache import get_media_cache
+from ..core.media_resolvers import media_resolver
+from ..core.audio_cache import get_audio_cache
+from ..core.transcode_scheduler import transcode_scheduler
+from ..core.retry import source_breakers
+from ..core.track import Track
 import logging
 
 logger = logging.getLogger(__name__)
 
-def create_app(bot=None):
-    """Creates and configures the Flask web application."""
-    app = Flask(__name__)
-    app.config['bot'] = bot
-    playlist_manager = PlaylistManager()
-    
-    @app.route('/')
-    def index():
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+PLAYLISTS_PAGE_SIZE = 50
+PLAYLISTS_MAX_PAGE_SIZE = 200
+PLAYLISTS_CACHE_SIZE = 64
+BOT_KEY = web.AppKey('bot', object)
+
+def create_app(bot=None) -> web.Application:
+    """Creates and configures the aiohttp web application."""
+    app = web.Application()
+    app[BOT_KEY] = bot
+    routes = web.RouteTableDef()
+    playlist_manager = get_playlist_manager()
+    # Distinguishes ETags across restarts, since the manager's version counter starts at 0.
+    instance_tag = uuid.uuid4().hex[:8]
+    playlist_pages = {}
+
+    def on_playlists_changed(event, user_id, name):
+        """Drops cached /api/playlists pages when the shared manager reports a change."""
+        playlist_pages.clear()
+
+    playlist_manager.subscribe(on_playlists_changed)
+
+    @routes.get('/')
+    async def index(request):
         """Serves the main HTML page."""
-        return render_template('index.html')
-    
-    @app.route('/api/status')
-    def status():
+        return web.FileResponse(os.path.join(TEMPLATES_DIR, 'index.html'))
+
+    @routes.get('/api/status')
+    async def status(request):
         """Obtener el estado del bot"""
-        if app.config['bot'] is None:
-            return jsonify({"error": "Bot no disponible"}), 404
-            
+        if app[BOT_KEY] is None:
+            return web.json_response({"error": "Bot no disponible"}, status=404)
+
         status_data = {
-            "connected": app.config['bot'].is_ready(),
-            "guilds": len(app.config['bot'].guilds),
-            "uptime": "Desconocido"
+            "connected": app[BOT_KEY].is_ready(),
+            "guilds": len(app[BOT_KEY].guilds),
+            "uptime": "Desconocido",
+            "extractors": extractor_pool.get_stats(),
+            "search_cache": search_cache.get_stats(),
+            "media_cache": get_media_cache().get_stats(),
+            "media_resolvers": media_resolver.get_stats(),
+            "audio_cache": get_audio_cache().get_stats() if get_audio_cache() else None,
+            "transcoding": transcode_scheduler.get_stats(),
+            "sources": source_breakers.get_stats()
         }
-        return jsonify(status_data)
-    
-    @app.route('/api/playlists')
-    def playlists():
-        """Obtener todas las listas de reproducción"""
-        all_playlists = playlist_manager.playlists
-        return jsonify(all_playlists)
-    
-    @app.route('/api/search')
-    def search():
+        return web.json_response(status_data)
+
+    @routes.get('/metrics')
+    async def metrics(request):
+        """Exports playback pipeline metrics in Prometheus text format."""
+        transcode_scheduler.sample()
+        return web.Response(
+            body=render_metrics(app[BOT_KEY]).encode('utf-8'),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
+
+    @routes.get('/api/playlists')
+    async def playlists(request):
+        """Obtener una página de listas de reproducción.
+
+        Parámetros: `cursor` (de `next_cursor`), `limit`, `owner` (ID de usuario) y
+        `summary=1` para devolver solo nombres y número de canciones. Responde 304 si
+        el `If-None-Match` coincide con la versión actual.
+        """
+        version = playlist_manager.version
+        etag = f'"{instance_tag}-{version}"'
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag in request.headers.get('If-None-Match', ''):
+            return web.Response(status=304, headers=headers)
+
+        try:
+            after_id = int(request.query.get('cursor') or 0)
+            limit = min(max(int(request.query.get('limit') or PLAYLISTS_PAGE_SIZE), 1), PLAYLISTS_MAX_PAGE_SIZE)
+            owner = request.query.get('owner')
+            owner_id = int(owner) if owner else None
+        except ValueError:
+            return web.json_response({"error": "Parámetros de paginación inválidos"}, status=400)
+        summary = request.query.get('summary', '').lower() in ('1', 'true', 'yes')
+
+        cache_key = (after_id, limit, owner_id, summary)
+        payload = playlist_pages.get(cache_key)
+        if payload is None or payload['version'] != version:
+            # SQLite work runs off the bot's loop so a heavy page can't stall the gateway or voice.
+            items, next_cursor = await asyncio.to_thread(
+                playlist_manager.list_playlists,
+                after_id=after_id, limit=limit, owner_id=owner_id, include_songs=not summary
+            )
+            payload = {
+                "items": items,
+                "next_cursor": str(next_cursor) if next_cursor is not None else None,
+                "version": version
+            }
+            # Don't cache a page that a concurrent change may already have outdated.
+            if playlist_manager.version == version:
+                if len(playlist_pages) >= PLAYLISTS_CACHE_SIZE:
+                    playlist_pages.clear()
+                playlist_pages[cache_key] = payload
+        return web.json_response(payload, headers=headers)
+
+    @routes.get('/api/search')
+    async def search(request):
         """Buscar canciones en YouTube"""
-        query = request.args.get('q', '')
+        query = request.query.get('q', '')
         if not query:
-            return jsonify({"error": "Consulta vacía"}), 400
-            
+            return web.json_response({"error": "Consulta vacía"}, status=400)
+
         try:
-            search_url = f"ytsearch5:{query}"
-            with yt_dlp.YoutubeDL(YTDLP_SEARCH_OPTIONS) as ydl:
-                info = ydl.extract_info(search_url, download=False)
-                
-            if not info or 'entries' not in info:
-                return jsonify([])
-                
-            results = []
-            for entry in info['entries']:
-                if entry:
-                    results.append({
-                        "title": entry.get('title', 'Sin título'),
-                        "url": entry.get('url', ''),
-                        "webpage_url": entry.get('webpage_url', ''),
-                        "thumbnail": entry.get('thumbnail', ''),
-                        "duration": entry.get('duration', 0),
-                        "channel": entry.get('channel', 'Desconocido')
-                    })
-            
-            return jsonify(results)
+            return web.json_response(await search_youtube(query))
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
-    
-    @app.route('/api/playlist/add', methods=['POST'])
-    def add_to_playlist():
+            return web.json_response({"error": str(e)}, status=500)
+
+    @routes.post('/api/playlist/add')
+    async def add_to_playlist(request):
         """Añadir una canción a una playlist"""
-        data = request.json
-        
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+
         if not data:
-            return jsonify({"error": "Datos no proporcionados"}), 400
-            
+            return web.json_response({"error": "Datos no proporcionados"}, status=400)
+
         playlist_name = data.get('playlist')
         song_data = data.get('song')
-        
-        if not playlist_name or not song_data:
-            return jsonify({"error": "Nombre de lista o canción no especificado"}), 400
+
+        if not playlist_name or not isinstance(song_data, dict):
+            return web.json_response({"error": "Nombre de lista o canción no especificado"}, status=400)
 
         WEB_USER_ID = 0
+        song = Track.from_dict(song_data)
 
-        if not playlist_manager.get_playlist(WEB_USER_ID, playlist_name):
-            playlist_manager.create_playlist(WEB_USER_ID, playlist_name)
+        def store():
+            """Creates the playlist if needed and adds the song unless its title is there; runs in a worker thread.
 
-        existing_playlist_songs = playlist_manager.get_playlist(WEB_USER_ID, playlist_name)
-        song_exists = any(s.get('title') == song_data.get('title') for s in existing_playlist_songs)
+            Returns None if the song was already in the list, otherwise whether it was added.
+            """
+            existing_playlist_songs = playlist_manager.get_playlist(WEB_USER_ID, playlist_name)
+            if not existing_playlist_songs:
+                playlist_manager.create_playlist(WEB_USER_ID, playlist_name)
+            if any(s.title == song.title for s in existing_playlist_songs):
+                return None
+            return playlist_manager.add_to_playlist(WEB_USER_ID, playlist_name, song)
 
-        if not song_exists:
-            if playlist_manager.add_to_playlist(WEB_USER_ID, playlist_name, song_data):
-                return jsonify({"success": True, "message": f"Canción añadida a la lista {playlist_name}"})
-            else:
-                return jsonify({"error": "Error añadiendo canción a la lista"}), 500
-        else:
-            return jsonify({"success": False, "message": "La canción ya existe en la lista"})
-                
-    @app.route('/api/audio_config', methods=['POST'])
-    def audio_config():
+        added = await asyncio.to_thread(store)
+        if added is None:
+            return web.json_response({"success": False, "message": "La canción ya existe en la lista"})
+        if added:
+            return web.json_response({"success": True, "message": f"Canción añadida a la lista {playlist_name}"})
+        return web.json_response({"error": "Error añadiendo canción a la lista"}, status=500)
+
+    @routes.post('/api/audio_config')
+    async def audio_config(request):
         """Configurar la calidad de audio."""
-        data = request.json
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+
+        if not isinstance(data, dict):
+            return web.json_response({"error": "Datos no proporcionados"}, status=400)
+
         bitrate = data.get('bitrate')
         sampling_rate = data.get('sampling_rate')
         audio_channels = data.get('audio_channels')
 
         if bitrate is None or sampling_rate is None or audio_channels is None:
-            return jsonify({"error": "Parámetros de audio incompletos (bitrate, sampling_rate, audio_channels)"}), 400
+            return web.json_response({"error": "Parámetros de audio incompletos (bitrate, sampling_rate, audio_channels)"}, status=400)
 
-        if app.config['bot'] and hasattr(app.config['bot'], 'set_audio_quality'):
-            success = app.config['bot'].set_audio_quality(
+        if app[BOT_KEY] and hasattr(app[BOT_KEY], 'set_audio_quality'):
+            success = app[BOT_KEY].set_audio_quality(
                 bitrate=bitrate,
                 sampling_rate=sampling_rate,
                 audio_channels=audio_channels
             )
             if success:
-                return jsonify({"success": True, "message": f"Configuración de audio aplicada: Bitrate {bitrate}kbps, SR {sampling_rate}Hz, Canales {audio_channels}"})
+                return web.json_response({"success": True, "message": f"Configuración de audio aplicada: Bitrate {bitrate}kbps, SR {sampling_rate}Hz, Canales {audio_channels}"})
             else:
-                return jsonify({"error": f"Valores de configuración de audio inválidos."}), 400
+                return web.json_response({"error": f"Valores de configuración de audio inválidos."}, status=400)
         else:
             logger.error("Bot no disponible o el método set_audio_quality no existe.")
-            return jsonify({"error": "No se pudo configurar el audio en el bot."}), 500
+            return web.json_response({"error": "No se pudo configurar el audio en el bot."}, status=500)
 
+    app.add_routes(routes)
     return app
 
+class WebServer:
+    """Serves the dashboard app on the bot's own event loop."""
+    def __init__(self, bot, host='0.0.0.0', port=5000):
+        """Stores the bind address; the server starts with `start()` once the loop is running."""
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def start(self):
+        """Binds the listening socket and starts serving requests."""
+        self._runner = web.AppRunner(create_app(self.bot), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        logger.info(f"Servidor web iniciado en http://{self.host}:{self.port}")
+
+    async def stop(self):
+        """Stops accepting requests and closes open connections."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
 def init_web(bot, host='0.0.0.0', port=5000):
-    """Initializes and starts the Flask web server in a separate thread."""
-    app = create_app(bot)
-    
-    def run_app():
-        """Function to run the Flask app, used by the thread."""
-        app.run(host=host, port=port, debug=False, use_reloader=False)
-    
-    web_thread = threading.Thread(target=run_app, daemon=True)
-    web_thread.start()
-    
-    print(f"Servidor web iniciado en http://{host}:{port}")
-    return web_thread
\ No newline at end of file
+    """Attaches a WebServer to the bot; it is started from the bot's setup_hook."""
+    server = WebServer(bot, host=host, port=port)
+    bot.web_server = server
+    return server